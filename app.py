@@ -24,22 +24,25 @@ Data: Dezembro/2025
 ================================================================================
 """
 
+from __future__ import annotations
+
 import streamlit as st
-import pandas as pd
-import tempfile
+import hashlib
 import os
 import sys
+from collections import Counter
 from datetime import datetime
-from io import BytesIO
+from operator import itemgetter
+from typing import TYPE_CHECKING
 
 # Adiciona o diretório src ao path para imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-# Imports dos módulos do RevFinder (sem IA - lazy loading)
-from src.core.parser import NFeParser
-from src.core.ncm_database import NCMDatabase
-from src.utils.exporter import ReportGenerator
-# FiscalAuditorAgent é importado sob demanda em initialize_ai_agent()
+# Módulos pesados (xlsxwriter, parser, banco de NCMs, IA) são importados sob
+# demanda dentro das funções que os usam: a tela de login não precisa deles.
+if TYPE_CHECKING:
+    from src.core.ncm_database import NCMDatabase
+    from src.core.parser import ItemNFe
 
 # =============================================================================
 # CONFIGURAÇÃO DA PÁGINA
@@ -52,6 +55,62 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# =============================================================================
+# TEXTOS FIXOS DA INTERFACE
+# =============================================================================
+
+# Blocos HTML/Markdown estáticos: criados uma vez na importação do módulo,
+# não reconstruídos a cada rerun dentro das funções que os exibem
+
+# Cartão da tela de login (primeira entrada e senha incorreta)
+LOGIN_CARD_HTML = """
+<div style="display: flex; justify-content: center; align-items: center; height: 60vh;">
+    <div style="text-align: center; padding: 40px; background: linear-gradient(135deg, #1e3a5f 0%, #2d5a87 100%); 
+                border-radius: 20px; box-shadow: 0 10px 40px rgba(0,0,0,0.3);">
+        <h1 style="color: white; margin-bottom: 10px;">🚀 RevFinder AI</h1>
+        <p style="color: #a0c4e8; margin-bottom: 30px;">Sistema de Recuperação Tributária</p>
+    </div>
+</div>
+"""
+
+# Cabeçalho da página principal
+HEADER_HTML = """
+<div class="main-header">
+    <h1>🚀 RevFinder AI</h1>
+    <p>Sistema Inteligente de Recuperação Tributária - PIS/COFINS Monofásico</p>
+</div>
+"""
+
+# Aviso exibido junto ao relatório, antes de solicitar restituição
+DISCLAIMER_MD = """
+### 📋 Este relatório identifica o **POTENCIAL** de recuperação
+
+O valor apresentado representa produtos com tributação **monofásica** de PIS/COFINS.
+
+**Antes de solicitar restituição, verifique com seu contador:**
+
+---
+
+#### ✅ Se o contador **JÁ SEGREGA** monofásicos no PGDAS-D:
+- Sua empresa já está pagando corretamente
+- **NÃO há valores a recuperar**
+- Este relatório serve apenas como conferência
+
+---
+
+#### 💰 Se o contador **NÃO SEGREGA** monofásicos:
+- Há valores a recuperar dos últimos **5 anos**
+- Solicite a retificação das declarações
+- Peça restituição ou compensação via **PER/DCOMP**
+
+---
+
+#### 📜 Base Legal:
+- Lei nº 13.097/2015, arts. 14 a 36
+- Decreto nº 8.442/2015
+- Solução de Consulta COSIT nº 99002/2024
+"""
+
 # =============================================================================
 # AUTENTICAÇÃO
 # =============================================================================
@@ -72,15 +131,7 @@ def check_password():
 
     # Primeira execução ou não logado
     if "password_correct" not in st.session_state:
-        st.markdown("""
-        <div style="display: flex; justify-content: center; align-items: center; height: 60vh;">
-            <div style="text-align: center; padding: 40px; background: linear-gradient(135deg, #1e3a5f 0%, #2d5a87 100%); 
-                        border-radius: 20px; box-shadow: 0 10px 40px rgba(0,0,0,0.3);">
-                <h1 style="color: white; margin-bottom: 10px;">🚀 RevFinder AI</h1>
-                <p style="color: #a0c4e8; margin-bottom: 30px;">Sistema de Recuperação Tributária</p>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(LOGIN_CARD_HTML, unsafe_allow_html=True)
         
         col1, col2, col3 = st.columns([1, 1, 1])
         with col2:
@@ -95,15 +146,7 @@ def check_password():
     
     # Senha errada
     elif not st.session_state["password_correct"]:
-        st.markdown("""
-        <div style="display: flex; justify-content: center; align-items: center; height: 60vh;">
-            <div style="text-align: center; padding: 40px; background: linear-gradient(135deg, #1e3a5f 0%, #2d5a87 100%); 
-                        border-radius: 20px; box-shadow: 0 10px 40px rgba(0,0,0,0.3);">
-                <h1 style="color: white; margin-bottom: 10px;">🚀 RevFinder AI</h1>
-                <p style="color: #a0c4e8; margin-bottom: 30px;">Sistema de Recuperação Tributária</p>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(LOGIN_CARD_HTML, unsafe_allow_html=True)
         
         col1, col2, col3 = st.columns([1, 1, 1])
         with col2:
@@ -124,239 +167,379 @@ def check_password():
 # CSS CUSTOMIZADO
 # =============================================================================
 
-st.markdown("""
-<style>
-    /* Cards de métricas */
-    .metric-card {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        padding: 20px;
-        border-radius: 10px;
-        color: white;
-        text-align: center;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-    }
-    
-    .metric-card h2 {
-        margin: 0;
-        font-size: 2.5rem;
-        font-weight: bold;
-    }
-    
-    .metric-card p {
-        margin: 5px 0 0 0;
-        opacity: 0.9;
-    }
-    
-    /* Header */
-    .main-header {
-        background: linear-gradient(90deg, #1a1a2e 0%, #16213e 100%);
-        padding: 20px;
-        border-radius: 10px;
-        margin-bottom: 20px;
-        color: white;
-    }
-    
-    /* Tabela de resultados */
-    .dataframe {
-        font-size: 14px;
-    }
-    
-    /* Botão de análise */
-    .stButton > button {
-        width: 100%;
-        background: linear-gradient(90deg, #11998e 0%, #38ef7d 100%);
-        color: white;
-        font-weight: bold;
-        padding: 15px;
-        font-size: 18px;
-        border: none;
-        border-radius: 10px;
-    }
-    
-    .stButton > button:hover {
-        background: linear-gradient(90deg, #38ef7d 0%, #11998e 100%);
-    }
-    
-    /* Upload area */
-    .uploadedFile {
-        background-color: #f0f2f6;
-        border-radius: 5px;
-        padding: 10px;
-    }
-    
-    /* Success/Error messages */
-    .success-box {
-        background-color: #d4edda;
-        border: 1px solid #c3e6cb;
-        color: #155724;
-        padding: 15px;
-        border-radius: 5px;
-        margin: 10px 0;
-    }
-    
-    .error-box {
-        background-color: #f8d7da;
-        border: 1px solid #f5c6cb;
-        color: #721c24;
-        padding: 15px;
-        border-radius: 5px;
-        margin: 10px 0;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Servido como arquivo estático (ver .streamlit/config.toml): cada rerun emite
+# só esta tag <link> e o navegador reaproveita a folha de estilo em cache.
+# A tag precisa ser emitida em todo rerun - o Streamlit remove da página os
+# elementos que não foram redesenhados.
+CSS_URL = "app/static/app.css"
+
+st.markdown(f'<link rel="stylesheet" href="{CSS_URL}">', unsafe_allow_html=True)
 
 
 # =============================================================================
 # FUNÇÕES AUXILIARES
 # =============================================================================
 
+# Colunas da aba principal do Excel: (chave do erro, título, largura)
+EXCEL_COLUMNS = [
+    ("chave_acesso", "Chave de Acesso", 50),
+    ("numero_nota", "Nº Nota", 12),
+    ("data_emissao", "Data Emissão", 12),
+    ("cnpj_emitente", "CNPJ Emitente", 18),
+    ("nome_emitente", "Emitente", 25),
+    ("produto", "Produto", 40),
+    ("ncm", "NCM Atual", 12),
+    ("ncm_correto", "NCM Correto", 12),
+    ("imposto_recuperavel", "Valor (R$)", 12),
+    ("motivo", "Motivo", 30),
+    ("origem_analise", "Fonte", 15),
+    ("base_legal", "Base Legal", 35),
+    ("confianca", "Confiança", 12)
+]
+
+# Colunas da tabela de erros na tela: (chave em erros, título exibido)
+DISPLAY_COLUMNS = (
+    ("produto", "Produto"),
+    ("ncm", "NCM Atual"),
+    ("ncm_correto", "NCM Correto"),
+    ("imposto_recuperavel", "Valor (R$)"),
+    ("origem_analise", "Fonte"),
+    ("numero_nota", "Nota")
+)
+
+# Chave do dicionário de stats -> valor de "origem_analise" (coluna Fonte)
+FONTES_ANALISE = {
+    'banco_dados': "Banco de Dados",
+    'keywords': "Keywords",
+    'cache_ia': "Cache IA",
+    'ia': "Agente IA"
+}
+
+
 @st.cache_resource
 def load_database():
     """Carrega o banco de dados de NCMs (com cache do Streamlit)."""
+    from src.core.ncm_database import get_ncm_database
+    
     db_path = os.path.join(os.path.dirname(__file__), "src", "database", "ncm_rules.json")
-    return NCMDatabase(db_path)
+    return get_ncm_database(db_path)
+
+
+@st.cache_data(show_spinner=False)
+def load_database_stats(db_version: str, _ncm_db: NCMDatabase) -> dict:
+    """
+    Estatísticas fixas do banco de NCMs (totais, base legal) para a sidebar.
+    
+    A sidebar é redesenhada a cada rerun, mas NCMs e keywords não mudam
+    enquanto a versão do banco for a mesma - não há por que recontar.
+    Os campos do cache de aprendizado mudam durante a análise: para eles
+    use ncm_db.get_estatisticas_cache(), que não é cacheado.
+    
+    Args:
+        db_version: Versão das regras de NCM - chave do cache
+        _ncm_db: Banco de NCMs (prefixo "_" = fora da chave do cache)
+    
+    Returns:
+        dict: Resultado de ncm_db.get_estatisticas()
+    """
+    return _ncm_db.get_estatisticas()
 
 
-def load_ai_agent():
+def _create_ai_agent():
     """
-    Carrega o agente de IA com lazy loading.
+    Importa o CrewAI e cria o FiscalAuditorAgent.
     
-    Só inicializa quando realmente precisar, evitando warnings
-    do CrewAI no startup do Streamlit.
+    O CrewAI registra handlers de signal no import, o que falha fora da
+    thread principal (caso do Streamlit). O auditor só importa o CrewAI
+    ao ser criado, então o shim de signal.signal envolve a criação; ele só
+    é aplicado enquanto o crewai não está em sys.modules e é sempre
+    restaurado no finally.
     """
-    # Usa session_state para cache manual (evita reload)
-    if 'ia_agent' not in st.session_state:
-        st.session_state.ia_agent = None
-        st.session_state.ia_checked = False
+    if "crewai" in sys.modules:
+        from src.agents.auditor import FiscalAuditorAgent
+        return FiscalAuditorAgent()
+    
+    import warnings
+    import logging
+    import signal
+    
+    # Silencia TODOS os warnings e logs do CrewAI
+    warnings.filterwarnings("ignore")
+    logging.getLogger("crewai").setLevel(logging.CRITICAL)
+    logging.getLogger("langchain").setLevel(logging.CRITICAL)
+    
+    # Suprime o erro de signal (o problema principal)
+    original_signal = signal.signal
+    def dummy_signal(*args, **kwargs):
+        return None
+    signal.signal = dummy_signal
     
-    return st.session_state.ia_agent
+    try:
+        # LAZY IMPORT - só importa quando precisa
+        from src.agents.auditor import FiscalAuditorAgent
+        return FiscalAuditorAgent()
+    finally:
+        # Restaura o signal original
+        signal.signal = original_signal
 
 
-def initialize_ai_agent():
-    """Inicializa o agente de IA (chamado só quando necessário)."""
-    if st.session_state.get('ia_agent') is None and not st.session_state.get('ia_checked'):
-        try:
-            import warnings
-            import logging
-            
-            # Silencia TODOS os warnings e logs do CrewAI
-            warnings.filterwarnings("ignore")
-            logging.getLogger("crewai").setLevel(logging.CRITICAL)
-            logging.getLogger("langchain").setLevel(logging.CRITICAL)
-            
-            # Suprime o erro de signal (o problema principal)
-            import signal
-            original_signal = signal.signal
-            def dummy_signal(*args, **kwargs):
-                return None
-            signal.signal = dummy_signal
-            
-            try:
-                # LAZY IMPORT - só importa quando precisa
-                from src.agents.auditor import FiscalAuditorAgent
-                st.session_state.ia_agent = FiscalAuditorAgent()
-            finally:
-                # Restaura o signal original
-                signal.signal = original_signal
-            
-            st.session_state.ia_checked = True
-        except Exception as e:
-            st.session_state.ia_agent = None
-            st.session_state.ia_checked = True
+@st.cache_resource(show_spinner=False)
+def get_ai_agent():
+    """
+    Retorna o agente de IA, compartilhado por todas as sessões.
     
-    return st.session_state.ia_agent
+    Inicializado só quando realmente precisar (lazy loading). O
+    cache_resource garante uma única construção por processo - inclusive
+    com sessões simultâneas - e guarda None se a IA não estiver disponível
+    (ex: sem OPENAI_API_KEY). O objeto retornado não deve ser modificado.
+    """
+    try:
+        return _create_ai_agent()
+    except Exception:
+        return None
 
 
-def analyze_item(item: dict, ncm_db: NCMDatabase, stats: dict) -> dict | None:
+def _linha_erro(
+    item: ItemNFe,
+    ncm_correto: str,
+    motivo: str,
+    origem_analise: str,
+    base_legal: str,
+    confianca: str
+) -> dict:
+    """
+    Monta a linha de erro de um item identificado como monofásico.
+    
+    Compartilhada pelos caminhos do banco de dados e da IA, que só
+    diferem nos campos da análise. Um único dicionário literal, já com
+    todas as chaves: sem montar metade da linha e completá-la com
+    update(**campos), que criaria um segundo dicionário só para os
+    argumentos nomeados.
+    
+    Args:
+        item: Dados do item da NF-e
+        ncm_correto: NCM monofásico correto
+        motivo: Justificativa da identificação
+        origem_analise: Quem identificou (ver FONTES_ANALISE)
+        base_legal: Fundamentação legal
+        confianca: Confiança da identificação (alta, media...)
+    
+    Returns:
+        dict: Dados da nota + dados do item e da análise
+    """
+    return {
+        # Dados da nota (v2.1)
+        "chave_acesso": item.chave_acesso,
+        "numero_nota": item.numero_nota,
+        "data_emissao": item.data_emissao,
+        "cnpj_emitente": item.cnpj_emitente,
+        "nome_emitente": item.nome_emitente,
+        # Dados do item
+        "produto": item.produto,
+        "ncm": item.ncm,
+        "ncm_correto": ncm_correto,
+        "imposto_recuperavel": item.imposto_total,
+        "motivo": motivo,
+        "origem_analise": origem_analise,
+        "base_legal": base_legal,
+        "confianca": confianca
+    }
+
+
+def analyze_item(
+    item: ItemNFe,
+    ncm_db: NCMDatabase,
+    stats: dict,
+    pendentes_ia: list | None = None
+) -> dict | None:
     """
     Analisa um item da nota fiscal.
     
     Replica a lógica do main.py para uso no Streamlit.
     A IA só é carregada se realmente precisar (lazy loading).
-    """
-    # Se não pagou imposto, não tem o que recuperar
-    if item.get('imposto_total', 0) <= 0:
-        return None
     
+    Args:
+        item: Dados do item da NF-e
+        ncm_db: Banco de dados de NCMs
+        stats: Dicionário para acumular estatísticas
+        pendentes_ia: Se informado, itens que precisariam da IA são
+                      adicionados aqui em vez de consultados na hora
+                      (ver analyze_pending_ia para a consulta em lote).
+    
+    Note:
+        Só recebe itens com imposto pago (item.imposto_total > 0): o
+        filtro é feito antes, em process_xml_files.
+    """
     # Verificação pelo Banco de Dados (NCM + Keywords + Cache)
-    resultado_db = ncm_db.verificar_item(item['ncm'], item['produto'])
+    resultado_db = ncm_db.verificar_item(item.ncm, item.produto)
     
     if resultado_db['is_monofasico']:
         # Determina a fonte
         if resultado_db['fonte'] == 'banco_dados':
-            stats['banco_dados'] = stats.get('banco_dados', 0) + 1
+            stats['banco_dados'] += 1
             origem = "Banco de Dados"
-            motivo = f"NCM {item['ncm']} é monofásico - {resultado_db['descricao']}"
+            motivo = f"NCM {item.ncm} é monofásico - {resultado_db['descricao']}"
         elif resultado_db['fonte'] == 'cache_ia':
-            stats['cache_ia'] = stats.get('cache_ia', 0) + 1
-            stats['ia_economizada'] = stats.get('ia_economizada', 0) + 1
+            stats['cache_ia'] += 1
+            stats['ia_economizada'] += 1
             origem = "Cache IA"
             motivo = f"Aprendizado anterior - {resultado_db['descricao']}"
         else:
-            stats['keywords'] = stats.get('keywords', 0) + 1
-            stats['ia_economizada'] = stats.get('ia_economizada', 0) + 1
+            stats['keywords'] += 1
+            stats['ia_economizada'] += 1
             origem = "Keywords"
             keyword = resultado_db.get('keyword_encontrada', '')
             motivo = f"Keyword '{keyword}' - {resultado_db['descricao']}"
         
-        return {
-            "chave_acesso": item.get('chave_acesso', ''),
-            "numero_nota": item.get('numero_nota', ''),
-            "data_emissao": item.get('data_emissao', ''),
-            "cnpj_emitente": item.get('cnpj_emitente', ''),
-            "nome_emitente": item.get('nome_emitente', ''),
-            "produto": item['produto'],
-            "ncm": item['ncm'],
-            "ncm_correto": resultado_db['ncm_correto'],
-            "imposto_recuperavel": item['imposto_total'],
-            "motivo": motivo,
-            "origem_analise": origem,
-            "base_legal": resultado_db['base_legal'],
-            "confianca": resultado_db.get('confianca', 'alta')
-        }
+        return _linha_erro(
+            item,
+            resultado_db['ncm_correto'],
+            motivo,
+            origem,
+            resultado_db['base_legal'],
+            resultado_db.get('confianca', 'alta')
+        )
     
     # Se já tem no cache (não monofásico), não chama IA
     if resultado_db.get('fonte') == 'cache_ia':
-        stats['ia_economizada'] = stats.get('ia_economizada', 0) + 1
+        stats['ia_economizada'] += 1
+        return None
+    
+    # Consulta em lote feita depois, por analyze_pending_ia()
+    if pendentes_ia is not None:
+        pendentes_ia.append(item)
         return None
     
     # Consulta IA (último recurso) - LAZY LOADING
     # Só carrega a IA agora, quando realmente precisa
-    ia_auditor = initialize_ai_agent()
+    ia_auditor = get_ai_agent()
     
     if ia_auditor:
         resultado_ia = ia_auditor.analyze_item(
-            descricao=item['produto'],
-            ncm_errado=item['ncm'],
-            valor_item=item['valor_total']
+            descricao=item.produto,
+            ncm_errado=item.ncm,
+            valor_item=item.valor_total
         )
+        return _registrar_resultado_ia(item, resultado_ia, ncm_db, stats)
+    
+    return None
+
+
+def analyze_pending_ia(
+    pendentes: list,
+    ncm_db: NCMDatabase,
+    stats: dict,
+    ao_concluir_lote=None
+) -> list:
+    """
+    Consulta a IA em lote para os itens que não foram identificados.
+    
+    Cada produto distinto é enviado uma única vez (FiscalAuditorAgent
+    .analyze_batch agrupa vários produtos por chamada). Repetições do
+    mesmo produto são reanalisadas depois que o aprendizado foi salvo,
+    e por isso saem do cache da IA - como no fluxo item a item. Nomes que
+    só diferem em maiúsculas ou espaços nas pontas contam como o mesmo
+    produto (normalização do cache de aprendizado).
+    
+    Args:
+        pendentes: Itens coletados por analyze_item(..., pendentes_ia=...)
+        ncm_db: Banco de dados de NCMs
+        stats: Dicionário para acumular estatísticas
+        ao_concluir_lote: Repassado a analyze_batch - chamado com
+                          (concluidos, total) a cada lote respondido
+    
+    Returns:
+        list: Erros encontrados entre os itens pendentes
+    """
+    if not pendentes:
+        return []
+    
+    ia_auditor = get_ai_agent()
+    if not ia_auditor:
+        return []
+    
+    primeiros = {}
+    repetidos = []
+    for item in pendentes:
+        # Mesma chave do cache de aprendizado (ver salvar_aprendizado_ia)
+        nome = item.produto.upper().strip()
+        if nome in primeiros:
+            repetidos.append(item)
+        else:
+            primeiros[nome] = item
+    
+    resultados_ia = ia_auditor.analyze_batch(
+        [(item.produto, item.ncm, item.valor_total) for item in primeiros.values()],
+        ao_concluir_lote=ao_concluir_lote
+    )
+    
+    # Todo o lote vai para o cache de aprendizado de uma vez (uma escrita
+    # no arquivo, não uma por produto). Falhas da IA (rede, resposta
+    # ilegível) ficam de fora: o produto volta a ser consultado depois
+    from src.agents.auditor import resultado_com_erro
+    ncm_db.salvar_aprendizados_ia([
+        (item.produto, resultado_ia[0] == True, resultado_ia[1], resultado_ia[2])
+        for item, resultado_ia in zip(primeiros.values(), resultados_ia, strict=True)
+        if not resultado_com_erro(resultado_ia)
+    ])
+    
+    erros = []
+    for item, resultado_ia in zip(primeiros.values(), resultados_ia, strict=True):
+        erro = _registrar_resultado_ia(item, resultado_ia, ncm_db, stats, salvar=False)
+        if erro:
+            erros.append(erro)
+    
+    for item in repetidos:
+        erro = analyze_item(item, ncm_db, stats)
+        if erro:
+            erros.append(erro)
+    
+    return erros
+
+
+def _registrar_resultado_ia(
+    item: ItemNFe,
+    resultado_ia: list,
+    ncm_db: NCMDatabase,
+    stats: dict,
+    salvar: bool = True
+) -> dict | None:
+    """
+    Salva o aprendizado da IA e monta o erro se o item for monofásico.
+    
+    Args:
+        item: Dados do item da NF-e
+        resultado_ia: [is_monofasico, ncm_correto, motivo] retornado pela IA
+        ncm_db: Banco de dados de NCMs
+        stats: Dicionário para acumular estatísticas
+        salvar: Se False, o aprendizado já foi salvo por quem chama (em
+                lote, com ncm_db.salvar_aprendizados_ia)
+    
+    Returns:
+        dict | None: Erro encontrado ou None
+    """
+    # Salva aprendizado (falhas da IA não: são passageiras)
+    if salvar:
+        from src.agents.auditor import resultado_com_erro
+        if not resultado_com_erro(resultado_ia):
+            ncm_db.salvar_aprendizado_ia(
+                nome_produto=item.produto,
+                is_monofasico=(resultado_ia[0] == True),
+                ncm_sugerido=resultado_ia[1],
+                motivo=resultado_ia[2]
+            )
+    
+    if resultado_ia[0] == True:
+        stats['ia'] += 1
         
-        # Salva aprendizado
-        ncm_db.salvar_aprendizado_ia(
-            nome_produto=item['produto'],
-            is_monofasico=(resultado_ia[0] == True),
-            ncm_sugerido=resultado_ia[1],
-            motivo=resultado_ia[2]
+        return _linha_erro(
+            item,
+            resultado_ia[1],
+            resultado_ia[2],
+            "Agente IA",
+            ncm_db.get_base_legal(),
+            "media"
         )
-        
-        if resultado_ia[0] == True:
-            stats['ia'] = stats.get('ia', 0) + 1
-            
-            return {
-                "chave_acesso": item.get('chave_acesso', ''),
-                "numero_nota": item.get('numero_nota', ''),
-                "data_emissao": item.get('data_emissao', ''),
-                "cnpj_emitente": item.get('cnpj_emitente', ''),
-                "nome_emitente": item.get('nome_emitente', ''),
-                "produto": item['produto'],
-                "ncm": item['ncm'],
-                "ncm_correto": resultado_ia[1],
-                "imposto_recuperavel": item['imposto_total'],
-                "motivo": resultado_ia[2],
-                "origem_analise": "Agente IA",
-                "base_legal": ncm_db.get_base_legal(),
-                "confianca": "media"
-            }
     
     return None
 
@@ -367,53 +550,58 @@ def process_xml_files(uploaded_files, ncm_db: NCMDatabase) -> tuple:
     
     A IA só é carregada se realmente precisar (lazy loading).
     
+    Um digest do conteúdo dos arquivos é a chave do cache de
+    _analyze_bytes(): reenviar os mesmos XMLs não reprocessa nada - e,
+    nesse caso, nem copia o conteúdo dos uploads.
+    
+    A consulta à IA fica fora do cache: ela salva aprendizados e pode
+    falhar (rede, resposta ilegível), e um resultado cacheado repetiria
+    a falha por até 30 minutos sem que a IA fosse consultada de novo.
+    
+    A barra de progresso também é criada aqui, fora do cache: elementos
+    criados dentro de uma função cacheada são reexibidos a cada acerto
+    do cache, e ela não pode atualizar elementos criados fora dela.
+    
     Returns:
         tuple: (lista_erros, stats, total_itens, total_notas)
     """
-    parser = NFeParser()
-    erros_encontrados = []
-    stats = {
-        'banco_dados': 0,
-        'keywords': 0,
-        'cache_ia': 0,
-        'ia': 0,
-        'ia_economizada': 0
-    }
-    total_itens = 0
-    total_notas = 0
-    ia_auditor = None  # Lazy loading - só carrega se precisar
-    
     # Barra de progresso
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    for idx, uploaded_file in enumerate(uploaded_files):
-        # Atualiza progresso
-        progress = (idx + 1) / len(uploaded_files)
-        progress_bar.progress(progress)
-        status_text.text(f"📂 Processando: {uploaded_file.name}...")
-        
-        # Salva arquivo temporário
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xml') as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            tmp_path = tmp_file.name
+    # -----------------------------------------------------------------
+    # ETAPAS 1 e 2: Parsing e análise pelo banco (primeira metade da barra)
+    # -----------------------------------------------------------------
+    status_text.text(f"📂 Lendo e analisando {len(uploaded_files)} arquivo(s)...")
+    db_version = ncm_db.metadata.get("versao", "")
+    erros_encontrados, stats, total_itens, total_notas, pendentes_ia = _analyze_bytes(
+        _digest_uploads(uploaded_files), db_version, uploaded_files, ncm_db
+    )
+    progress_bar.progress(0.5)
+    
+    # -----------------------------------------------------------------
+    # ETAPA 3: IA em lote para os itens não identificados
+    # -----------------------------------------------------------------
+    if pendentes_ia:
+        # O resultado pode vir do cache, de antes de aprendizados salvos
+        # depois dele: o que o cache da IA já conhece não volta para a IA
+        ainda_pendentes = []
+        for item in pendentes_ia:
+            erro = analyze_item(item, ncm_db, stats, pendentes_ia=ainda_pendentes)
+            if erro:
+                erros_encontrados.append(erro)
         
-        try:
-            # Parseia XML
-            itens_nota = parser.parse(tmp_path)
+        if ainda_pendentes:
+            status_text.text(f"🤖 Consultando IA para {len(ainda_pendentes)} item(ns)...")
+            
+            # Progresso atualizado a cada lote respondido, não só no fim
+            def progresso_ia(concluidos: int, total: int) -> None:
+                progress_bar.progress(0.5 + concluidos / total / 2)
+                status_text.text(f"🤖 Consultando IA: {concluidos}/{total} produto(s) analisado(s)...")
             
-            if itens_nota:
-                total_notas += 1
-                total_itens += len(itens_nota)
-                
-                # Analisa cada item
-                for item in itens_nota:
-                    erro = analyze_item(item, ncm_db, stats)
-                    if erro:
-                        erros_encontrados.append(erro)
-        finally:
-            # Remove arquivo temporário
-            os.unlink(tmp_path)
+            erros_encontrados.extend(
+                analyze_pending_ia(ainda_pendentes, ncm_db, stats, ao_concluir_lote=progresso_ia)
+            )
     
     # Limpa barra de progresso
     progress_bar.empty()
@@ -422,95 +610,188 @@ def process_xml_files(uploaded_files, ncm_db: NCMDatabase) -> tuple:
     return erros_encontrados, stats, total_itens, total_notas
 
 
-def create_excel_download(erros: list, total_recuperavel: float) -> bytes:
+def _digest_uploads(uploaded_files) -> str:
+    """
+    Calcula um digest curto do conteúdo dos arquivos, na ordem do upload.
+    
+    Usado como chave de cache no lugar dos bytes: o Streamlit passa a
+    comparar 32 caracteres em vez de re-hashear todo o upload com o seu
+    próprio hasher. blake2b é mais rápido que sha256 e resistência a
+    colisão proposital não é requisito aqui.
+    
+    O hash lê o buffer de cada upload direto da memória (getbuffer),
+    sem a cópia que getvalue() faria.
+    
+    Args:
+        uploaded_files: Arquivos do st.file_uploader
+    
+    Returns:
+        str: Digest hexadecimal de 128 bits
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for f in uploaded_files:
+        with f.getbuffer() as conteudo:
+            # Tamanho antes do conteúdo: arquivos diferentes concatenados
+            # não podem produzir a mesma sequência de bytes
+            h.update(len(conteudo).to_bytes(8, "little"))
+            h.update(conteudo)
+    return h.hexdigest()
+
+
+@st.cache_data(max_entries=16, ttl="30m", show_spinner=False)
+def _analyze_bytes(
+    digest: str,
+    db_version: str,
+    _uploaded_files: list,
+    _ncm_db: NCMDatabase
+) -> tuple:
+    """
+    Parseia e classifica os XMLs enviados (função cacheada pelo Streamlit).
+    
+    Só banco de NCMs, keywords e cache da IA: os itens que precisariam
+    da IA voltam em pendentes_ia, consultados fora do cache por
+    process_xml_files().
+    
+    Args:
+        digest: Digest do conteúdo dos arquivos (ver _digest_uploads)
+        db_version: Versão das regras de NCM - invalida o cache se mudar
+        _uploaded_files: Arquivos do st.file_uploader (lidos só aqui,
+                         ou seja, só quando o cache não tem o resultado)
+        _ncm_db: Banco de NCMs (prefixo "_" = fora da chave do cache)
+    
+    Returns:
+        tuple: (lista_erros, stats, total_itens, total_notas, pendentes_ia)
+    
+    Note:
+        Não cria nem atualiza elementos da página: o Streamlit reexibiria
+        a cada acerto do cache o que fosse criado aqui dentro. O
+        progresso é mostrado por process_xml_files().
+    """
+    from src.core.parser import iter_xml_bytes
+    
+    arquivos = [(f.name, f.getvalue()) for f in _uploaded_files]
+    ncm_db = _ncm_db
+    
+    erros_encontrados = []
+    # Counter: chave ausente vale 0, então cada contagem é só `+= 1`
+    stats = Counter(banco_dados=0, keywords=0, cache_ia=0, ia=0, ia_economizada=0)
+    total_itens = 0
+    total_notas = 0
+    pendentes_ia = []  # Itens não identificados - consultados na IA em lote, fora do cache
+    
+    # -----------------------------------------------------------------
+    # ETAPA 1: Parsing
+    # -----------------------------------------------------------------
+    # iter_xml_bytes decide entre o próprio processo e um pool (mesma
+    # regra da CLI: poucos arquivos ou um único núcleo não sobem o pool).
+    # Os resultados saem na ordem do upload, e a análise começa pelo
+    # primeiro arquivo enquanto os demais ainda estão sendo lidos.
+    itens_por_arquivo = iter_xml_bytes(
+        [conteudo for _, conteudo in arquivos],
+        [nome for nome, _ in arquivos]
+    )
+    
+    # -----------------------------------------------------------------
+    # ETAPA 2: Análise sequencial, na ordem do upload (stats determinístico)
+    # -----------------------------------------------------------------
+    for itens_nota in itens_por_arquivo:
+        if itens_nota:
+            total_notas += 1
+            total_itens += len(itens_nota)
+            
+            # Analisa só os itens com PIS/COFINS pago - os demais não têm o
+            # que recuperar e nem chegam a entrar em analyze_item()
+            com_imposto = [item for item in itens_nota if item.imposto_total > 0]
+            for item in com_imposto:
+                erro = analyze_item(item, ncm_db, stats, pendentes_ia)
+                if erro:
+                    erros_encontrados.append(erro)
+    
+    return erros_encontrados, stats, total_itens, total_notas, pendentes_ia
+
+
+@st.cache_data(max_entries=8, ttl="1h", show_spinner=False)
+def create_excel_download(erros: list, total_recuperavel: float, stats: dict) -> bytes | None:
     """
     Cria arquivo Excel para download com disclaimer.
     
+    Chamada só no clique em "Baixar" (data do st.download_button é um
+    callable). O resultado fica em cache do Streamlit: cliques seguintes
+    com os mesmos erros não regeram o workbook inteiro.
+    
+    Usa xlsxwriter (mais rápido que openpyxl para planilhas formatadas)
+    em modo constant_memory: as linhas são gravadas em streaming, sem
+    manter a árvore de células em memória. Os formatos são criados uma
+    única vez no workbook e reaproveitados, em vez de um por célula.
+    
     Args:
         erros: Lista de erros encontrados
         total_recuperavel: Valor total recuperável
+        stats: Contagem por fonte de identificação (de process_xml_files)
     
     Returns:
-        bytes: Arquivo Excel em bytes
+        bytes | None: Arquivo Excel em bytes, ou None se não há erros
     """
     if not erros:
         return None
     
-    # Importa openpyxl para formatação avançada
-    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-    from openpyxl.utils.dataframe import dataframe_to_rows
-    
-    df = pd.DataFrame(erros)
-    
-    # Renomeia colunas
-    column_mapping = {
-        "chave_acesso": "Chave de Acesso",
-        "numero_nota": "Nº Nota",
-        "data_emissao": "Data Emissão",
-        "cnpj_emitente": "CNPJ Emitente",
-        "nome_emitente": "Emitente",
-        "produto": "Produto",
-        "ncm": "NCM Atual",
-        "ncm_correto": "NCM Correto",
-        "imposto_recuperavel": "Valor (R$)",
-        "motivo": "Motivo",
-        "origem_analise": "Fonte",
-        "base_legal": "Base Legal"
-    }
+    import xlsxwriter
+    from io import BytesIO
     
-    df = df.rename(columns=column_mapping)
+    # Lê de cada erro as chaves das colunas, em ordem, com uma chamada em
+    # C. Toda linha vem de _linha_erro(), sempre com todas as chaves: não
+    # há coluna faltando a completar com .get(chave, '') célula a célula
+    ler_linha = itemgetter(*(chave for chave, _, _ in EXCEL_COLUMNS))
+    ultima_coluna = len(EXCEL_COLUMNS) - 1
     
     # Cria Excel em memória
+    # constant_memory: cada linha é gravada e liberada assim que a próxima
+    # começa, então as linhas precisam ser escritas em ordem crescente.
     output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+    with xlsxwriter.Workbook(output, {'constant_memory': True}) as workbook:
         # Aba principal com dados
-        df.to_excel(writer, index=False, sheet_name='Produtos Monofasicos', startrow=4)
+        ws = workbook.add_worksheet('Produtos Monofasicos')
         
-        # Acessa a planilha para formatação
-        ws = writer.sheets['Produtos Monofasicos']
+        # --- FORMATOS (criados uma vez, reutilizados em todas as células) ---
+        title_fmt = workbook.add_format({
+            'bold': True, 'font_size': 16, 'font_color': '#FFFFFF',
+            'bg_color': '#1F4E79', 'align': 'center', 'valign': 'vcenter'
+        })
+        total_fmt = workbook.add_format({
+            'bold': True, 'font_size': 14, 'font_color': '#008000', 'align': 'center'
+        })
+        info_fmt = workbook.add_format({'italic': True, 'font_size': 10, 'align': 'center'})
+        header_fmt = workbook.add_format({
+            'bold': True, 'font_color': '#FFFFFF', 'bg_color': '#4472C4',
+            'align': 'center', 'text_wrap': True
+        })
+        money_fmt = workbook.add_format({'num_format': 'R$ #,##0.00'})
         
         # --- CABEÇALHO ---
-        ws.merge_cells('A1:L1')
-        ws['A1'] = '🚀 REVFINDER AI - Relatório de Recuperação Tributária'
-        ws['A1'].font = Font(bold=True, size=16, color='FFFFFF')
-        ws['A1'].fill = PatternFill(start_color='1F4E79', end_color='1F4E79', fill_type='solid')
-        ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
-        
-        ws.merge_cells('A2:L2')
-        ws['A2'] = f'Total Potencial de Recuperação: R$ {total_recuperavel:,.2f}'
-        ws['A2'].font = Font(bold=True, size=14, color='008000')
-        ws['A2'].alignment = Alignment(horizontal='center')
-        
-        ws.merge_cells('A3:L3')
-        ws['A3'] = f'Gerado em: {datetime.now().strftime("%d/%m/%Y às %H:%M")} | {len(erros)} produtos identificados'
-        ws['A3'].font = Font(italic=True, size=10)
-        ws['A3'].alignment = Alignment(horizontal='center')
-        
-        # --- FORMATA CABEÇALHO DA TABELA ---
-        header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-        header_font = Font(bold=True, color='FFFFFF')
-        
-        for cell in ws[5]:  # Linha 5 é o cabeçalho (startrow=4 + 1)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', wrap_text=True)
+        ws.merge_range(0, 0, 0, ultima_coluna, '🚀 REVFINDER AI - Relatório de Recuperação Tributária', title_fmt)
+        ws.merge_range(1, 0, 1, ultima_coluna, f'Total Potencial de Recuperação: R$ {total_recuperavel:,.2f}', total_fmt)
+        ws.merge_range(
+            2, 0, 2, ultima_coluna,
+            f'Gerado em: {datetime.now().strftime("%d/%m/%Y às %H:%M")} | {len(erros)} produtos identificados',
+            info_fmt
+        )
         
         # --- AJUSTA LARGURA DAS COLUNAS ---
-        ws.column_dimensions['A'].width = 50  # Chave de Acesso
-        ws.column_dimensions['B'].width = 12  # Nº Nota
-        ws.column_dimensions['C'].width = 12  # Data
-        ws.column_dimensions['D'].width = 18  # CNPJ
-        ws.column_dimensions['E'].width = 25  # Emitente
-        ws.column_dimensions['F'].width = 40  # Produto
-        ws.column_dimensions['G'].width = 12  # NCM Atual
-        ws.column_dimensions['H'].width = 12  # NCM Correto
-        ws.column_dimensions['I'].width = 12  # Valor
-        ws.column_dimensions['J'].width = 30  # Motivo
-        ws.column_dimensions['K'].width = 15  # Fonte
-        ws.column_dimensions['L'].width = 35  # Base Legal
+        # O valor recebe formato monetário na coluna: o Excel formata os
+        # números e nenhuma string é montada em Python linha a linha
+        for col_idx, (chave, _, largura) in enumerate(EXCEL_COLUMNS):
+            fmt = money_fmt if chave == 'imposto_recuperavel' else None
+            ws.set_column(col_idx, col_idx, largura, fmt)
+        
+        # --- CABEÇALHO DA TABELA (linha 5 no Excel, índice 4) ---
+        ws.write_row(4, 0, [titulo for _, titulo, _ in EXCEL_COLUMNS], header_fmt)
+        
+        # --- DADOS (streaming direto dos dicionários, uma linha por vez) ---
+        for row_idx, erro in enumerate(erros, start=5):
+            ws.write_row(row_idx, 0, ler_linha(erro))
         
         # --- ABA DE DISCLAIMER ---
-        ws_disclaimer = writer.book.create_sheet('⚠️ IMPORTANTE')
+        ws_disclaimer = workbook.add_worksheet('⚠️ IMPORTANTE')
         
         disclaimer_texts = [
             ('⚠️ AVISO IMPORTANTE', True, 16),
@@ -556,16 +837,22 @@ def create_excel_download(erros: list, total_recuperavel: float) -> bytes:
             ('Desenvolvido por Grande Mestre - 2025', False, 9),
         ]
         
-        for idx, (text, is_bold, size) in enumerate(disclaimer_texts, start=1):
-            cell = ws_disclaimer.cell(row=idx, column=1, value=text)
-            cell.font = Font(bold=is_bold, size=size)
-            if is_bold and size >= 12:
-                cell.fill = PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid')
+        # Um formato por combinação (negrito, tamanho) - evita criar um por célula
+        disclaimer_fmts = {}
+        for text, is_bold, size in disclaimer_texts:
+            if (is_bold, size) not in disclaimer_fmts:
+                props = {'bold': is_bold, 'font_size': size}
+                if is_bold and size >= 12:
+                    props['bg_color'] = '#FFF2CC'
+                disclaimer_fmts[(is_bold, size)] = workbook.add_format(props)
+        
+        for idx, (text, is_bold, size) in enumerate(disclaimer_texts):
+            ws_disclaimer.write(idx, 0, text, disclaimer_fmts[(is_bold, size)])
         
-        ws_disclaimer.column_dimensions['A'].width = 80
+        ws_disclaimer.set_column('A:A', 80)
         
         # --- ABA DE RESUMO ---
-        ws_resumo = writer.book.create_sheet('📊 Resumo')
+        ws_resumo = workbook.add_worksheet('📊 Resumo')
         
         resumo_data = [
             ('RESUMO DA ANÁLISE', '', ''),
@@ -576,20 +863,17 @@ def create_excel_download(erros: list, total_recuperavel: float) -> bytes:
             ('Por Fonte de Identificação:', '', ''),
         ]
         
-        # Conta por fonte
-        fonte_count = df['Fonte'].value_counts().to_dict() if 'Fonte' in df.columns else {}
-        for fonte, count in fonte_count.items():
-            resumo_data.append((f'  • {fonte}', count, 'produtos'))
+        # Conta por fonte (já contabilizado durante a análise)
+        for chave, fonte in FONTES_ANALISE.items():
+            if stats[chave] > 0:
+                resumo_data.append((f'  • {fonte}', stats[chave], 'produtos'))
         
-        for idx, (col1, col2, col3) in enumerate(resumo_data, start=1):
-            ws_resumo.cell(row=idx, column=1, value=col1)
-            ws_resumo.cell(row=idx, column=2, value=col2)
-            ws_resumo.cell(row=idx, column=3, value=col3)
-            if idx == 1:
-                ws_resumo.cell(row=idx, column=1).font = Font(bold=True, size=14)
+        resumo_title_fmt = workbook.add_format({'bold': True, 'font_size': 14})
+        for idx, row in enumerate(resumo_data):
+            ws_resumo.write_row(idx, 0, row, resumo_title_fmt if idx == 0 else None)
         
-        ws_resumo.column_dimensions['A'].width = 35
-        ws_resumo.column_dimensions['B'].width = 20
+        ws_resumo.set_column('A:A', 35)
+        ws_resumo.set_column('B:B', 20)
     
     return output.getvalue()
 
@@ -598,6 +882,157 @@ def create_excel_download(erros: list, total_recuperavel: float) -> bytes:
 # INTERFACE PRINCIPAL
 # =============================================================================
 
+def render_analysis(uploaded_files: list, ncm_db: NCMDatabase) -> None:
+    """
+    Processa os XMLs e exibe métricas, tabela e download do relatório.
+    
+    O resultado fica em st.session_state["last_result"], de onde o
+    fragmento render_results() o lê - inclusive nas suas reexecuções.
+    
+    Args:
+        uploaded_files: Arquivos do st.file_uploader
+        ncm_db: Banco de NCMs
+    """
+    with st.spinner("🔄 Analisando notas fiscais..."):
+        st.session_state["last_result"] = process_xml_files(uploaded_files, ncm_db)
+    
+    render_results()
+
+
+@st.fragment
+def render_results() -> None:
+    """
+    Exibe métricas, tabela e download da última análise.
+    
+    Roda como fragmento: interações dentro dele (ex: baixar o relatório)
+    reexecutam só este bloco em vez do script inteiro. Os dados vêm de
+    st.session_state["last_result"] - a reexecução não refaz o hash dos
+    uploads nem desserializa o resultado do cache de process_xml_files,
+    e o resto da página (header, sidebar, CSS) não é reprocessado.
+    """
+    erros, stats, total_itens, total_notas = st.session_state["last_result"]
+    
+    total_recuperavel = sum(e['imposto_recuperavel'] for e in erros)
+    
+    # -----------------------------------------------------------------
+    # MÉTRICAS
+    # -----------------------------------------------------------------
+    st.header("📊 Resultado da Análise")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric(
+            label="💰 Total Recuperável",
+            value=f"R$ {total_recuperavel:.2f}"
+        )
+    
+    with col2:
+        st.metric(
+            label="📄 Notas Analisadas",
+            value=total_notas
+        )
+    
+    with col3:
+        st.metric(
+            label="🚨 Erros Encontrados",
+            value=len(erros)
+        )
+    
+    with col4:
+        total_consultas = stats['banco_dados'] + stats['keywords'] + stats['cache_ia'] + stats['ia']
+        economia = (stats['ia_economizada'] / max(total_consultas, 1)) * 100
+        st.metric(
+            label="🧠 Economia IA",
+            value=f"{economia:.0f}%"
+        )
+    
+    st.divider()
+    
+    # -----------------------------------------------------------------
+    # ESTATÍSTICAS DETALHADAS
+    # -----------------------------------------------------------------
+    st.subheader("📈 Estatísticas de Identificação")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.info(f"🗄️ Banco de Dados: **{stats['banco_dados']}**")
+    
+    with col2:
+        st.info(f"🔤 Keywords: **{stats['keywords']}**")
+    
+    with col3:
+        st.info(f"🧠 Cache IA: **{stats['cache_ia']}**")
+    
+    with col4:
+        st.info(f"🤖 IA Nova: **{stats['ia']}**")
+    
+    st.divider()
+    
+    # -----------------------------------------------------------------
+    # TABELA DE RESULTADOS
+    # -----------------------------------------------------------------
+    if erros:
+        st.subheader("📋 Detalhamento dos Erros")
+        
+        # pyarrow já vem como dependência do próprio Streamlit
+        import pyarrow as pa
+        
+        # Monta a tabela Arrow direto por coluna: o st.dataframe serializa
+        # Arrow de qualquer forma, então passar um pa.Table evita criar um
+        # DataFrame pandas (e seu índice) só para convertê-lo em seguida
+        tabela = pa.table({
+            titulo: [e[chave] for e in erros]
+            for chave, titulo in DISPLAY_COLUMNS
+        })
+        
+        # Formata valores no próprio componente (sem converter cada linha
+        # para string em Python) - a coluna continua numérica e ordenável
+        st.dataframe(
+            tabela,
+            hide_index=True,
+            column_config={
+                'Valor (R$)': st.column_config.NumberColumn(format="R$ %.2f")
+            }
+        )
+        
+        st.divider()
+        
+        # -----------------------------------------------------------------
+        # DOWNLOAD DO RELATÓRIO
+        # -----------------------------------------------------------------
+        st.subheader("📥 Exportar Relatório")
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"Relatorio_Recuperacao_{timestamp}.xlsx"
+        
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            # O workbook só é gerado quando o usuário clica (o Streamlit
+            # chama o callable numa thread à parte); quem analisa e só
+            # confere a tabela não paga a montagem do xlsx
+            st.download_button(
+                label="📥 BAIXAR RELATÓRIO EXCEL",
+                data=lambda: create_excel_download(erros, total_recuperavel, stats),
+                file_name=filename,
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+        
+        st.success(f"✅ Relatório pronto! {len(erros)} registros | Total: R$ {total_recuperavel:.2f}")
+        
+        # -----------------------------------------------------------------
+        # DISCLAIMER NA INTERFACE
+        # -----------------------------------------------------------------
+        st.divider()
+        
+        with st.expander("⚠️ AVISO IMPORTANTE - Leia antes de solicitar restituição", expanded=False):
+            st.markdown(DISCLAIMER_MD)
+    
+    else:
+        st.success("✅ Nenhum erro encontrado! Todas as notas estão corretas.")
+
+
 def main():
     """Função principal da aplicação."""
     
@@ -610,12 +1045,7 @@ def main():
     # -----------------------------------------------------------------
     # HEADER
     # -----------------------------------------------------------------
-    st.markdown("""
-    <div class="main-header">
-        <h1>🚀 RevFinder AI</h1>
-        <p>Sistema Inteligente de Recuperação Tributária - PIS/COFINS Monofásico</p>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(HEADER_HTML, unsafe_allow_html=True)
     
     # -----------------------------------------------------------------
     # SIDEBAR
@@ -625,7 +1055,7 @@ def main():
         
         # Carrega banco de dados
         ncm_db = load_database()
-        db_stats = ncm_db.get_estatisticas()
+        db_stats = load_database_stats(ncm_db.metadata.get("versao", ""), ncm_db)
         
         st.success(f"✅ Base carregada")
         st.caption(f"📊 {db_stats['total_ncms']} NCMs | {db_stats['total_keywords']} keywords")
@@ -703,162 +1133,7 @@ def main():
     # -----------------------------------------------------------------
     
     if analyze_button and uploaded_files:
-        
-        with st.spinner("🔄 Analisando notas fiscais..."):
-            erros, stats, total_itens, total_notas = process_xml_files(
-                uploaded_files, ncm_db
-            )
-        
-        total_recuperavel = sum(e['imposto_recuperavel'] for e in erros)
-        
-        # -----------------------------------------------------------------
-        # MÉTRICAS
-        # -----------------------------------------------------------------
-        st.header("📊 Resultado da Análise")
-        
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric(
-                label="💰 Total Recuperável",
-                value=f"R$ {total_recuperavel:.2f}"
-            )
-        
-        with col2:
-            st.metric(
-                label="📄 Notas Analisadas",
-                value=total_notas
-            )
-        
-        with col3:
-            st.metric(
-                label="🚨 Erros Encontrados",
-                value=len(erros)
-            )
-        
-        with col4:
-            total_consultas = stats['banco_dados'] + stats['keywords'] + stats['cache_ia'] + stats['ia']
-            economia = (stats['ia_economizada'] / max(total_consultas, 1)) * 100
-            st.metric(
-                label="🧠 Economia IA",
-                value=f"{economia:.0f}%"
-            )
-        
-        st.divider()
-        
-        # -----------------------------------------------------------------
-        # ESTATÍSTICAS DETALHADAS
-        # -----------------------------------------------------------------
-        st.subheader("📈 Estatísticas de Identificação")
-        
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.info(f"🗄️ Banco de Dados: **{stats['banco_dados']}**")
-        
-        with col2:
-            st.info(f"🔤 Keywords: **{stats['keywords']}**")
-        
-        with col3:
-            st.info(f"🧠 Cache IA: **{stats['cache_ia']}**")
-        
-        with col4:
-            st.info(f"🤖 IA Nova: **{stats['ia']}**")
-        
-        st.divider()
-        
-        # -----------------------------------------------------------------
-        # TABELA DE RESULTADOS
-        # -----------------------------------------------------------------
-        if erros:
-            st.subheader("📋 Detalhamento dos Erros")
-            
-            # Cria DataFrame para exibição
-            df_display = pd.DataFrame(erros)
-            
-            # Seleciona e renomeia colunas para exibição
-            columns_display = {
-                'produto': 'Produto',
-                'ncm': 'NCM Atual',
-                'ncm_correto': 'NCM Correto',
-                'imposto_recuperavel': 'Valor (R$)',
-                'origem_analise': 'Fonte',
-                'numero_nota': 'Nota'
-            }
-            
-            df_show = df_display[[c for c in columns_display.keys() if c in df_display.columns]]
-            df_show = df_show.rename(columns=columns_display)
-            
-            # Formata valores
-            if 'Valor (R$)' in df_show.columns:
-                df_show['Valor (R$)'] = df_show['Valor (R$)'].apply(lambda x: f"R$ {x:.2f}")
-            
-            st.dataframe(
-                df_show,
-                hide_index=True
-            )
-            
-            st.divider()
-            
-            # -----------------------------------------------------------------
-            # DOWNLOAD DO RELATÓRIO
-            # -----------------------------------------------------------------
-            st.subheader("📥 Exportar Relatório")
-            
-            excel_data = create_excel_download(erros, total_recuperavel)
-            
-            if excel_data:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"Relatorio_Recuperacao_{timestamp}.xlsx"
-                
-                col1, col2, col3 = st.columns([1, 2, 1])
-                with col2:
-                    st.download_button(
-                        label="📥 BAIXAR RELATÓRIO EXCEL",
-                        data=excel_data,
-                        file_name=filename,
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
-                
-                st.success(f"✅ Relatório pronto! {len(erros)} registros | Total: R$ {total_recuperavel:.2f}")
-                
-                # -----------------------------------------------------------------
-                # DISCLAIMER NA INTERFACE
-                # -----------------------------------------------------------------
-                st.divider()
-                
-                with st.expander("⚠️ AVISO IMPORTANTE - Leia antes de solicitar restituição", expanded=False):
-                    st.markdown("""
-                    ### 📋 Este relatório identifica o **POTENCIAL** de recuperação
-                    
-                    O valor apresentado representa produtos com tributação **monofásica** de PIS/COFINS.
-                    
-                    **Antes de solicitar restituição, verifique com seu contador:**
-                    
-                    ---
-                    
-                    #### ✅ Se o contador **JÁ SEGREGA** monofásicos no PGDAS-D:
-                    - Sua empresa já está pagando corretamente
-                    - **NÃO há valores a recuperar**
-                    - Este relatório serve apenas como conferência
-                    
-                    ---
-                    
-                    #### 💰 Se o contador **NÃO SEGREGA** monofásicos:
-                    - Há valores a recuperar dos últimos **5 anos**
-                    - Solicite a retificação das declarações
-                    - Peça restituição ou compensação via **PER/DCOMP**
-                    
-                    ---
-                    
-                    #### 📜 Base Legal:
-                    - Lei nº 13.097/2015, arts. 14 a 36
-                    - Decreto nº 8.442/2015
-                    - Solução de Consulta COSIT nº 99002/2024
-                    """)
-        
-        else:
-            st.success("✅ Nenhum erro encontrado! Todas as notas estão corretas.")
+        render_analysis(uploaded_files, ncm_db)
     
     # -----------------------------------------------------------------
     # FOOTER
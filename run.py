@@ -1,6 +1,8 @@
-"""Script de entrada para executar o RevFinder AI."""
+"""Script de entrada para executar o RevFinder AI (--quiet: sem mensagens por item)."""
+
+import sys
 
 from src.main import process_pipeline
 
 if __name__ == "__main__":
-    process_pipeline()
\ No newline at end of file
+    process_pipeline(quiet="--quiet" in sys.argv[1:])
\ No newline at end of file
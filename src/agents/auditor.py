@@ -31,7 +31,7 @@ O agente usa o framework CrewAI com a seguinte estrutura:
     │  ┌─────────────────────────────────┐    │
     │  │         CrewAI Agent            │    │
     │  │  Role: Senior Tax Auditor       │    │
-    │  │  LLM: GPT-3.5-turbo            │    │
+    │  │  LLM: GPT-4o-mini              │    │
     │  └─────────────────────────────────┘    │
     │                  │                      │
     │                  ▼                      │
@@ -105,21 +105,42 @@ Data: Dezembro/2025
 # IMPORTS
 # =============================================================================
 
+from __future__ import annotations  # Anotações com Agent sem importar o CrewAI
+
+import ast  # Leitura de listas no formato Python (fallback)
+import json  # Leitura das respostas da IA (JSON)
+import logging  # Mensagens de progresso e erros da análise
 import os  # Acesso a variáveis de ambiente
-from typing import List, Any, Tuple  # Type hints
+import re  # Palavras-chave do fallback por nome
+import queue  # Agentes CrewAI livres para reaproveitamento
+import random  # Jitter entre novas tentativas de chamada à API
+import sys  # Saída das mensagens no exemplo de uso (__main__)
+import threading  # Lock do cache de vereditos
+import time  # Espera entre novas tentativas de chamada à API
+import unicodedata  # Remoção de acentos na normalização das descrições
+from concurrent.futures import ThreadPoolExecutor, as_completed  # Lotes em paralelo
+from typing import TYPE_CHECKING, Callable, Dict, List, Any, Optional, Tuple  # Type hints
 
-# Framework CrewAI para agentes de IA
-from crewai import Agent, Task, Crew
+# CrewAI e LangChain (Pydantic, httpx, tiktoken...) custam centenas de ms
+# no import: só são importados quando um FiscalAuditorAgent é criado
+# (ChatOpenAI em __init__, Agent/Task/Crew nos métodos que os usam)
+if TYPE_CHECKING:
+    from crewai import Agent
 
-# Integração com OpenAI via LangChain
-from langchain_openai import ChatOpenAI
+# Carrega variáveis do arquivo .env
+# Isso disponibiliza OPENAI_API_KEY para o ChatOpenAI. Se a chave já está
+# no ambiente (Secrets do Streamlit Cloud, produção), não há por que ler e
+# parsear o .env - nem importar o python-dotenv
+if "OPENAI_API_KEY" not in os.environ:
+    from dotenv import load_dotenv
+    load_dotenv()
 
-# Carregamento de variáveis de ambiente (.env)
-from dotenv import load_dotenv
 
-# Carrega variáveis do arquivo .env
-# Isso disponibiliza OPENAI_API_KEY para o ChatOpenAI
-load_dotenv()
+# Logger do módulo. Sem configuração (ex: no app Streamlit) só avisos e
+# erros aparecem; a CLI configura o nível INFO para exibir o progresso.
+# Diferente de print(), mensagens abaixo do nível ativo não são formatadas
+# nem escritas - nada de disputa pelo stdout entre as threads dos lotes.
+logger = logging.getLogger(__name__)
 
 
 # =============================================================================
@@ -127,13 +148,120 @@ load_dotenv()
 # =============================================================================
 
 # Modelo de linguagem a ser usado
-# GPT-3.5-turbo é mais barato e suficiente para esta tarefa
-DEFAULT_MODEL = "gpt-3.5-turbo"
+# GPT-4o-mini: mais barato e mais rápido que o GPT-3.5-turbo, com
+# precisão equivalente ou melhor para esta classificação de poucas classes
+DEFAULT_MODEL = "gpt-4o-mini"
 
 # Temperature 0 = respostas determinísticas (sem "criatividade")
 # Importante para análise fiscal onde precisamos de precisão
 DEFAULT_TEMPERATURE = 0
 
+# Quantidade máxima de itens por prompt em analyze_batch()
+# Lotes maiores economizam chamadas, mas aumentam a chance da IA
+# errar o formato (e aí o lote cai para análise item a item)
+BATCH_SIZE = 20
+
+# Quantos lotes de analyze_batch() (ou itens de analyze_items()) podem estar
+# em andamento ao mesmo tempo (respeita o limite de requisições simultâneas
+# da API)
+MAX_LOTES_SIMULTANEOS = 4
+
+# Parte fixa dos prompts de análise (regras, formato e exemplos), sem nenhum
+# dado do item. Vem ANTES dos dados variáveis: a OpenAI reaproveita (prompt
+# caching automático, com desconto nos tokens de entrada e menor latência)
+# o maior prefixo já visto, então tudo que é igual entre chamadas precisa
+# estar no começo - junto com o system prompt que o CrewAI monta a partir
+# do role/goal/backstory do agente, que também não muda.
+PROMPT_REGRAS_ITEM = """
+Analyze an item from a Brazilian invoice (Nota Fiscal). The item data is at the end.
+
+CLASSIFICATION RULES:
+1. If item is BEER (Heineken, Brahma, Skol, Antarctica, etc):
+   → Correct NCM is 22030000
+   → Return: [true, "22030000", "Beer identified"]
+
+2. If item is SODA/SOFT DRINK (Coca-Cola, Pepsi, Fanta, Sprite, Guaraná):
+   → Correct NCM is 22021000
+   → Return: [true, "22021000", "Soft drink identified"]
+
+3. If item is WATER (mineral, sparkling, natural):
+   → Correct NCM is 22011000
+   → Return: [true, "22011000", "Water identified"]
+
+4. If item is ENERGY DRINK (Red Bull, Monster, etc):
+   → Correct NCM is 22029000
+   → Return: [true, "22029000", "Energy drink identified"]
+
+5. Any other item (food, non-beverages, etc):
+   → Return: [false, "<item's current NCM>", "Not a monophasic product"]
+
+CRITICAL OUTPUT FORMAT:
+- Return ONLY a JSON array
+- NO text before the list
+- NO text after the list
+- NO markdown formatting
+- NO explanations outside the list
+
+Format: [is_monophasic_boolean, "NCM_Code_String", "Reason_String"]
+
+EXAMPLES OF CORRECT OUTPUT:
+[true, "22030000", "Beer identified - Heineken brand"]
+[true, "22021000", "Soft drink identified - Coca-Cola"]
+[false, "99999999", "Not a cold drink - food item"]
+"""
+
+PROMPT_REGRAS_LOTE = """
+Analyze a list of items from a Brazilian invoice (Nota Fiscal). The items are at the end.
+
+CLASSIFICATION RULES (apply to each item independently):
+1. BEER (Heineken, Brahma, Skol, Antarctica, etc) → [true, "22030000", "Beer identified"]
+2. SODA/SOFT DRINK (Coca-Cola, Pepsi, Fanta, Sprite, Guaraná) → [true, "22021000", "Soft drink identified"]
+3. WATER (mineral, sparkling, natural) → [true, "22011000", "Water identified"]
+4. ENERGY DRINK (Red Bull, Monster, etc) → [true, "22029000", "Energy drink identified"]
+5. Any other item (food, non-beverages, etc) → [false, "<item's current NCM>", "Not a monophasic product"]
+
+CRITICAL OUTPUT FORMAT:
+- Return ONLY a JSON array containing exactly one inner list per item
+- One inner list per item, in the SAME ORDER as the items
+- NO text before or after the list
+- NO markdown formatting
+
+Format: [[is_monophasic_boolean, "NCM_Code_String", "Reason_String"], ...]
+
+EXAMPLE OF CORRECT OUTPUT FOR 2 ITEMS:
+[[true, "22030000", "Beer identified - Heineken brand"], [false, "10063021", "Not a cold drink - food item"]]
+"""
+
+# Conexões com a API OpenAI: por quanto tempo uma conexão ociosa fica
+# aberta para reaproveitamento, e o tempo máximo de uma requisição
+HTTP_KEEPALIVE_SEGUNDOS = 120
+HTTP_TIMEOUT_SEGUNDOS = 120
+
+# Novas tentativas quando a API falha por motivo passageiro (limite de
+# requisições, erro 5xx, timeout): com lotes em paralelo, o 429 é comum e
+# não deve marcar o item como "não monofásico" de forma definitiva
+MAX_TENTATIVAS_API = 5
+ESPERA_BASE_SEGUNDOS = 1.0
+ESPERA_MAXIMA_SEGUNDOS = 30.0
+
+# Status HTTP que valem nova tentativa (timeout, conflito, limite, 5xx)
+STATUS_TRANSITORIOS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+# Erros esperados ao ler a resposta da IA (JSON/literal inválido, ou
+# aninhamento/tamanho absurdos no literal_eval). Outros erros são bugs e
+# não devem ser mascarados como "resposta inválida"
+ERROS_DE_PARSE = (ValueError, SyntaxError, MemoryError, RecursionError)
+
+# Início do motivo dos resultados de falha (rede/API, resposta ilegível).
+# São transitórios: não são um veredito sobre o produto e não devem ir para
+# nenhum cache (ver resultado_com_erro)
+MOTIVO_ERRO_API = "Erro na API"
+MOTIVO_ERRO_PARSE = "Erro no parse"
+
+# Quantos vereditos (descrição normalizada, NCM) o agente guarda em memória
+# para não repetir a chamada à IA quando o mesmo produto volta a aparecer
+MAX_VEREDITOS_MEMORIA = 10_000
+
 # NCMs comuns de produtos monofásicos (para fallback)
 COMMON_MONOPHASIC_NCMS = {
     "cerveja": "22030000",
@@ -142,6 +270,235 @@ COMMON_MONOPHASIC_NCMS = {
     "energetico": "22029000"
 }
 
+# Fallback por nome de _parse_response(), em ordem de prioridade:
+# (palavras-chave, NCM, mensagem do log, motivo devolvido)
+FALLBACK_POR_NOME = (
+    (("HEINEKEN", "BRAHMA", "SKOL", "ANTARCTICA", "CERV", "BEER"),
+     COMMON_MONOPHASIC_NCMS["cerveja"],
+     "cerveja", "Fallback: Beer identified by name"),
+    (("COCA", "PEPSI", "FANTA", "SPRITE", "GUARANA", "REFRI"),
+     COMMON_MONOPHASIC_NCMS["refrigerante"],
+     "refrigerante", "Fallback: Soft drink identified by name"),
+    (("AGUA", "WATER", "MINERAL"),
+     COMMON_MONOPHASIC_NCMS["agua"],
+     "água", "Fallback: Water identified by name"),
+)
+
+# Todas as categorias numa única regex, compilada uma vez: um lookahead
+# opcional por categoria, cada um capturando em seu grupo a primeira
+# palavra-chave da categoria presente na descrição. Uma só chamada a
+# match() (tudo no motor de regex, em C) diz quais categorias aparecem;
+# vale a primeira na ordem de FALLBACK_POR_NOME.
+_FALLBACK_REGEX = re.compile("".join(
+    f"(?=.*?({'|'.join(keywords)}))?" for keywords, _, _, _ in FALLBACK_POR_NOME
+), re.DOTALL)
+
+
+# =============================================================================
+# FUNÇÕES AUXILIARES
+# =============================================================================
+
+def _carregar_lista(texto: str) -> Any:
+    """
+    Converte o trecho de lista da resposta da IA em objeto Python.
+    
+    Os prompts pedem JSON ([true, "22030000", "..."]), lido pelo parser
+    em C do módulo json. Se o modelo responder no formato Python
+    ([True, ...]), cai para ast.literal_eval - mais lento, pois monta
+    uma AST, mas seguro como antes (só aceita literais).
+    
+    Args:
+        texto (str): Trecho da resposta entre o primeiro '[' e o último ']'.
+    
+    Returns:
+        Any: Objeto lido (normalmente uma lista).
+    
+    Raises:
+        ValueError, SyntaxError: Se o texto não for JSON nem literal Python.
+    """
+    try:
+        return json.loads(texto)
+    except ValueError:
+        return ast.literal_eval(texto)
+
+
+def _normalizar_descricao(descricao: str) -> str:
+    """
+    Normaliza a descrição do produto: sem acentos, maiúscula, espaços únicos.
+    
+    Feita uma única vez por item e reaproveitada na chave do veredito e no
+    fallback por nome - cujas palavras-chave não têm acento, então
+    "ÁGUA" e "GUARANÁ" também são reconhecidas.
+    
+    Args:
+        descricao (str): Descrição do produto como veio na NF-e.
+    
+    Returns:
+        str: Descrição normalizada.
+    
+    Example:
+        >>> _normalizar_descricao("Água  Mineral Guaraná")
+        'AGUA MINERAL GUARANA'
+    """
+    if not descricao.isascii():
+        descricao = unicodedata.normalize("NFKD", descricao).encode("ascii", "ignore").decode("ascii")
+    return " ".join(descricao.upper().split())
+
+
+def _chave_veredito(descricao: str, ncm: str) -> Tuple[str, str]:
+    """
+    Chave do veredito memorizado: descrição normalizada + NCM.
+    
+    Acentos, maiúsculas e espaços extras não mudam o produto: "Cerveja
+    Heineken" e "CERVEJA  HEINEKEN" compartilham a mesma análise.
+    
+    Args:
+        descricao (str): Descrição do produto como veio na NF-e.
+        ncm (str): NCM atual do produto.
+    
+    Returns:
+        Tuple[str, str]: (descrição normalizada, ncm).
+    """
+    return _normalizar_descricao(descricao), ncm
+
+
+def _fallback_por_nome(descricao_norm: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Identifica a categoria monofásica pelo nome, sem consultar a IA.
+    
+    Args:
+        descricao_norm (str): Descrição já normalizada (_normalizar_descricao).
+    
+    Returns:
+        Tuple[str, str, str] | None: (NCM, tipo para o log, motivo) da
+        primeira categoria de FALLBACK_POR_NOME encontrada, ou None.
+    
+    Example:
+        >>> _fallback_por_nome("COCA COLA LATA 350ML")
+        ('22021000', 'refrigerante', 'Fallback: Soft drink identified by name')
+    """
+    grupos = _FALLBACK_REGEX.match(descricao_norm).groups()
+    for encontrada, (_, ncm, tipo, motivo) in zip(grupos, FALLBACK_POR_NOME):
+        if encontrada is not None:
+            return ncm, tipo, motivo
+    return None
+
+
+def _extrair_lista(resposta: str) -> Any:
+    """
+    Localiza e lê a lista JSON contida na resposta da IA.
+    
+    Quando o modelo segue o formato pedido, a resposta inteira já é o
+    array JSON: vai direto para json.loads, sem procurar '[' e ']' no
+    texto. Só respostas com texto extra antes/depois da lista passam pelo
+    recorte entre o primeiro '[' e o último ']' (e por _carregar_lista).
+    
+    Args:
+        resposta (str): Texto bruto devolvido pela IA.
+    
+    Returns:
+        Any: Objeto lido (normalmente uma lista), ou None se o texto não
+        contém nenhuma lista.
+    
+    Raises:
+        ValueError, SyntaxError: Se o trecho recortado não for JSON nem
+        literal Python.
+    """
+    resposta = resposta.strip()
+    if resposta.startswith('['):
+        try:
+            return json.loads(resposta)
+        except ValueError:
+            pass
+    
+    start_idx = resposta.find('[')
+    end_idx = resposta.rfind(']') + 1
+    if start_idx == -1 or end_idx <= start_idx:
+        return None
+    
+    return _carregar_lista(resposta[start_idx:end_idx])
+
+
+def _erro_transitorio(erro: Exception) -> bool:
+    """
+    Indica se vale tentar de novo a chamada que gerou o erro.
+    
+    As exceções chegam de camadas diferentes (openai, litellm, httpx,
+    CrewAI), por isso a decisão usa o status HTTP quando existe (no erro
+    ou na resposta anexada) e, sem status, aceita só falhas de conexão
+    e timeout.
+    
+    Args:
+        erro (Exception): Exceção levantada pela chamada à IA.
+    
+    Returns:
+        bool: True para limite de requisições, 5xx, timeout e conexão.
+    """
+    status = getattr(erro, "status_code", None)
+    if status is None:
+        status = getattr(getattr(erro, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in STATUS_TRANSITORIOS
+    
+    if isinstance(erro, (TimeoutError, ConnectionError)):
+        return True
+    nome = type(erro).__name__
+    return "Timeout" in nome or "Connection" in nome
+
+
+def _espera_nova_tentativa(erro: Exception, tentativa: int) -> float:
+    """
+    Calcula quanto esperar antes da próxima tentativa.
+    
+    Backoff exponencial com jitter completo (sorteio entre 0 e o teto da
+    tentativa), para que os lotes que receberam 429 juntos não voltem
+    juntos. Se a API informar Retry-After, ele é respeitado como mínimo.
+    
+    Args:
+        erro (Exception): Exceção da tentativa que falhou.
+        tentativa (int): Número da tentativa que falhou (1, 2, ...).
+    
+    Returns:
+        float: Segundos de espera.
+    
+    Example:
+        >>> 0 <= _espera_nova_tentativa(TimeoutError(), 1) <= 2.0
+        True
+    """
+    teto = min(ESPERA_MAXIMA_SEGUNDOS, ESPERA_BASE_SEGUNDOS * 2 ** tentativa)
+    espera = random.uniform(0, teto)
+    
+    headers = getattr(getattr(erro, "response", None), "headers", None)
+    retry_after = headers.get("retry-after") if headers is not None else None
+    try:
+        espera = max(espera, min(float(retry_after), ESPERA_MAXIMA_SEGUNDOS))
+    except (TypeError, ValueError):
+        pass  # Ausente ou em formato de data: fica o backoff
+    return espera
+
+
+def resultado_com_erro(resultado: List[Any]) -> bool:
+    """
+    Diz se um resultado da IA é uma falha (rede/API ou resposta ilegível).
+    
+    Esses resultados saem como [False, ncm, "Erro ..."] para não travar a
+    análise, mas não dizem nada sobre o produto: quem guarda aprendizados
+    (ex: NCMDatabase.salvar_aprendizados_ia) deve ignorá-los, para que o
+    item seja consultado de novo na próxima análise.
+    
+    Args:
+        resultado (List[Any]): [is_monophasic, ncm, reason].
+    
+    Returns:
+        bool: True se o motivo indica falha.
+    
+    Example:
+        >>> resultado_com_erro([False, "22030000", "Erro na API: Timeout"])
+        True
+    """
+    motivo = resultado[2]
+    return isinstance(motivo, str) and motivo.startswith((MOTIVO_ERRO_API, MOTIVO_ERRO_PARSE))
+
 
 # =============================================================================
 # CLASSE PRINCIPAL
@@ -181,17 +538,33 @@ class FiscalAuditorAgent:
         NCM correto: 22030000
         >>> print(f"Motivo: {resultado[2]}")
         Motivo: Beer identified - Heineken brand
+        >>> 
+        >>> # Vários itens: uma chamada à API a cada BATCH_SIZE produtos
+        >>> resultados = auditor.analyze_batch([
+        ...     ("HEINEKEN LONG NECK 355ML", "99999999", 8.99),
+        ...     ("VINHO TINTO CASILLERO 750ML", "22042100", 59.90),
+        ... ])
+        >>> [r[0] for r in resultados]
+        [True, False]
     
     Note:
         - Requer OPENAI_API_KEY configurada no ambiente
-        - Custo aproximado: ~$0.001 por análise (GPT-3.5)
+        - Custo aproximado: ~$0.0003 por análise (GPT-4o-mini)
         - Latência típica: 1-3 segundos por análise
+        - Com vários itens pendentes, prefira analyze_batch(): o custo e a
+          latência por chamada são divididos entre os itens do lote
     
     Raises:
         Exception: Se OPENAI_API_KEY não estiver configurada.
     """
     
-    def __init__(self, model: str = DEFAULT_MODEL, temperature: float = DEFAULT_TEMPERATURE):
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        temperature: float = DEFAULT_TEMPERATURE,
+        batch_size: int = BATCH_SIZE,
+        max_lotes_simultaneos: int = MAX_LOTES_SIMULTANEOS
+    ):
         """
         Inicializa o agente de auditoria fiscal.
         
@@ -200,10 +573,15 @@ class FiscalAuditorAgent:
         
         Args:
             model (str): Nome do modelo OpenAI a usar. 
-                        Default: "gpt-3.5-turbo"
+                        Default: "gpt-4o-mini"
             temperature (float): Controle de aleatoriedade (0-2).
                                 0 = determinístico, 2 = muito criativo.
                                 Default: 0 (máxima precisão)
+            batch_size (int): Itens por prompt em analyze_batch().
+                              Default: BATCH_SIZE (20)
+            max_lotes_simultaneos (int): Chamadas simultâneas à API em
+                              analyze_batch()/analyze_items().
+                              Default: MAX_LOTES_SIMULTANEOS (4)
         
         Raises:
             Exception: Se OPENAI_API_KEY não estiver no ambiente.
@@ -217,11 +595,19 @@ class FiscalAuditorAgent:
             ...     model="gpt-4",
             ...     temperature=0
             ... )
+            >>> 
+            >>> # Auditoria grande (fora da interface): menos requisições
+            >>> # por minuto, com lotes maiores e mais lotes em paralelo
+            >>> auditor_lote = FiscalAuditorAgent(
+            ...     batch_size=50,
+            ...     max_lotes_simultaneos=8
+            ... )
         
         Note:
-            O modelo GPT-3.5-turbo é recomendado por ser:
+            O modelo GPT-4o-mini é recomendado por ser:
             - Mais rápido (~1s vs ~3s do GPT-4)
-            - Muito mais barato (~10x mais barato que GPT-4)
+            - Muito mais barato (~3x mais barato que o GPT-3.5-turbo e
+              bem mais que o GPT-4)
             - Suficientemente preciso para esta tarefa específica
         """
         # Verifica se a API key está configurada
@@ -232,16 +618,83 @@ class FiscalAuditorAgent:
                 "Configure no arquivo .env"
             )
         
+        # Integração com OpenAI via LangChain (import tardio, ver IMPORTS)
+        from langchain_openai import ChatOpenAI
+        
+        # O CrewAI registra handlers de signal no import: importa aqui, na
+        # thread de quem cria o auditor, e não na primeira análise (que
+        # pode rodar num worker do ThreadPoolExecutor)
+        import crewai  # noqa: F401
+        
+        # httpx já vem com o cliente da OpenAI (dependência do langchain-openai)
+        import httpx
+        
+        # Cliente HTTP próprio do auditor, com pool de conexões dimensionado
+        # para as chamadas simultâneas dos lotes: cada thread reaproveita
+        # uma conexão TLS aberta (keep-alive) em vez de refazer TCP + TLS,
+        # e as conexões ociosas duram o intervalo entre análises seguidas
+        self._http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_keepalive_connections=max_lotes_simultaneos * 2,
+                keepalive_expiry=HTTP_KEEPALIVE_SEGUNDOS
+            ),
+            timeout=httpx.Timeout(HTTP_TIMEOUT_SEGUNDOS, connect=10.0)
+        )
+        
         # Inicializa o modelo de linguagem
         # temperature=0 garante respostas consistentes e determinísticas
         self.llm = ChatOpenAI(
             model=model,
-            temperature=temperature
+            temperature=temperature,
+            http_client=self._http_client
         )
         
         # Armazena configurações para referência
         self._model = model
         self._temperature = temperature
+        
+        # Tamanho e concorrência dos lotes (limites de RPM variam por conta)
+        self._batch_size = batch_size
+        self._max_lotes_simultaneos = max_lotes_simultaneos
+        
+        # Agentes CrewAI livres, reaproveitados entre chamadas e threads
+        # (ver _get_auditor_agent)
+        self._agentes_livres: queue.SimpleQueue = queue.SimpleQueue()
+        
+        # Vereditos já obtidos da IA, por _chave_veredito(). Com
+        # temperature=0 o mesmo prompt traz a mesma resposta: repetir a
+        # chamada só gastaria tokens e 1-3 segundos
+        self._vereditos: Dict[Tuple[str, str], Tuple[Any, ...]] = {}
+        self._vereditos_lock = threading.Lock()
+    
+    def _buscar_veredito(self, chave: Tuple[str, str]) -> Optional[List[Any]]:
+        """
+        Retorna uma cópia do veredito memorizado, ou None se não houver.
+        
+        Args:
+            chave (Tuple[str, str]): Resultado de _chave_veredito().
+        
+        Returns:
+            List[Any] | None: [is_monophasic, ncm, reason] ou None.
+        """
+        veredito = self._vereditos.get(chave)
+        return list(veredito) if veredito is not None else None
+    
+    def _memorizar_veredito(self, chave: Tuple[str, str], resultado: List[Any]) -> None:
+        """
+        Guarda a resposta da IA para o produto (até MAX_VEREDITOS_MEMORIA).
+        
+        Erros de rede/API e respostas ilegíveis (ver resultado_com_erro)
+        não passam por aqui: são transitórios e o item deve ser consultado
+        de novo na próxima vez.
+        
+        Args:
+            chave (Tuple[str, str]): Resultado de _chave_veredito().
+            resultado (List[Any]): [is_monophasic, ncm, reason].
+        """
+        with self._vereditos_lock:
+            if len(self._vereditos) < MAX_VEREDITOS_MEMORIA:
+                self._vereditos[chave] = tuple(resultado)
     
     def _build_analysis_prompt(
         self, 
@@ -271,47 +724,41 @@ class FiscalAuditorAgent:
             performance com prompts em inglês, especialmente para
             tarefas de classificação e análise estruturada.
         """
-        prompt = f"""
-Analyze this item from a Brazilian invoice (Nota Fiscal):
-
+        # Regras fixas primeiro e dados do item no fim: o início do prompt
+        # é idêntico em todas as chamadas (ver PROMPT_REGRAS_ITEM)
+        prompt = PROMPT_REGRAS_ITEM + f"""
 ITEM DATA:
 - Description: '{descricao}'
 - Current NCM code: '{ncm_errado}'
 - Value (R$): {valor_item}
 
-CLASSIFICATION RULES:
-1. If item is BEER (Heineken, Brahma, Skol, Antarctica, etc):
-   → Correct NCM is 22030000
-   → Return: [True, "22030000", "Beer identified"]
-
-2. If item is SODA/SOFT DRINK (Coca-Cola, Pepsi, Fanta, Sprite, Guaraná):
-   → Correct NCM is 22021000
-   → Return: [True, "22021000", "Soft drink identified"]
-
-3. If item is WATER (mineral, sparkling, natural):
-   → Correct NCM is 22011000
-   → Return: [True, "22011000", "Water identified"]
-
-4. If item is ENERGY DRINK (Red Bull, Monster, etc):
-   → Correct NCM is 22029000
-   → Return: [True, "22029000", "Energy drink identified"]
-
-5. Any other item (food, non-beverages, etc):
-   → Return: [False, "{ncm_errado}", "Not a monophasic product"]
-
-CRITICAL OUTPUT FORMAT:
-- Return ONLY a Python list
-- NO text before the list
-- NO text after the list
-- NO markdown formatting
-- NO explanations outside the list
-
-Format: [Is_Monophasic_Boolean, "NCM_Code_String", "Reason_String"]
-
-EXAMPLES OF CORRECT OUTPUT:
-[True, "22030000", "Beer identified - Heineken brand"]
-[True, "22021000", "Soft drink identified - Coca-Cola"]
-[False, "99999999", "Not a cold drink - food item"]
+YOUR OUTPUT:
+"""
+        return prompt
+    
+    def _build_batch_prompt(self, itens: List[Tuple[str, str, float]]) -> str:
+        """
+        Constrói o prompt de análise para vários itens de uma vez.
+        
+        Mesmas regras de _build_analysis_prompt(), mas pedindo uma lista
+        de resultados - um por item, na mesma ordem - para que N itens
+        custem uma única chamada à API.
+        
+        Args:
+            itens: Lista de (descricao, ncm_errado, valor_item).
+        
+        Returns:
+            str: Prompt formatado para envio ao LLM.
+        """
+        linhas_itens = "\n".join(
+            f"{numero}. Description: '{descricao}' | Current NCM code: '{ncm}' | Value (R$): {valor}"
+            for numero, (descricao, ncm, valor) in enumerate(itens, start=1)
+        )
+        
+        # Regras fixas primeiro e itens no fim (ver PROMPT_REGRAS_LOTE)
+        prompt = PROMPT_REGRAS_LOTE + f"""
+ITEMS ({len(itens)} in total - return exactly {len(itens)} lists):
+{linhas_itens}
 
 YOUR OUTPUT:
 """
@@ -336,6 +783,8 @@ YOUR OUTPUT:
             para que o modelo entenda que deve ser preciso e conciso,
             não conversacional.
         """
+        from crewai import Agent
+        
         return Agent(
             role='Senior Tax Auditor',
             goal='Analyze beverage tax classification and identify correct NCM codes for Brazilian products.',
@@ -349,7 +798,44 @@ YOUR OUTPUT:
             llm=self.llm
         )
     
-    def _parse_response(self, response: Any, ncm_fallback: str, descricao: str) -> List[Any]:
+    def _get_auditor_agent(self) -> Agent:
+        """
+        Retira um agente CrewAI livre do pool, criando um se não houver.
+        
+        O agente (e o cliente do LLM que ele referencia) é o mesmo para
+        todas as análises, então não há por que reconstruí-lo a cada
+        chamada. Cada chamada em andamento usa um agente exclusivo, porque
+        o CrewAI guarda estado de execução no Agent e o FiscalAuditorAgent
+        é compartilhado entre sessões no app Streamlit. Ao contrário de um
+        agente por thread, o pool sobrevive às threads de cada
+        ThreadPoolExecutor: o número de agentes criados fica limitado ao
+        máximo de chamadas simultâneas, não ao número de lotes analisados.
+        Devolva o agente com _release_auditor_agent().
+        
+        Returns:
+            Agent: Agente CrewAI para uso exclusivo nesta chamada.
+        """
+        try:
+            return self._agentes_livres.get_nowait()
+        except queue.Empty:
+            return self._create_auditor_agent()
+    
+    def _release_auditor_agent(self, agent: Agent) -> None:
+        """
+        Devolve ao pool um agente obtido com _get_auditor_agent().
+        
+        Args:
+            agent (Agent): Agente que terminou de executar sua tarefa.
+        """
+        self._agentes_livres.put(agent)
+    
+    def _parse_response(
+        self,
+        response: Any,
+        ncm_fallback: str,
+        descricao: str,
+        descricao_norm: Optional[str] = None
+    ) -> List[Any]:
         """
         Extrai e valida a resposta do agente de IA.
         
@@ -365,6 +851,8 @@ YOUR OUTPUT:
             response (Any): Resposta bruta do CrewAI.
             ncm_fallback (str): NCM a usar se parsing falhar.
             descricao (str): Descrição original (para fallback inteligente).
+            descricao_norm (str | None): _normalizar_descricao(descricao), se
+                           o chamador já a calculou.
         
         Returns:
             List[Any]: Lista [is_monophasic, ncm, reason] ou fallback.
@@ -388,61 +876,79 @@ YOUR OUTPUT:
         else:
             result_str = str(response)
         
-        print(f"   (Retorno da IA): {result_str[:100]}...")  # Log truncado
+        # %.100s trunca só se o nível DEBUG estiver ativo
+        logger.debug("   (Retorno da IA): %.100s...", result_str)
         
         try:
             # =================================================================
             # Estratégia 1: Encontrar lista no texto
             # =================================================================
-            # Procura o primeiro '[' e último ']' para extrair a lista
-            start_idx = result_str.find('[')
-            end_idx = result_str.rfind(']') + 1
+            # Lista JSON pura (formato pedido) ou recortada entre o primeiro
+            # '[' e o último ']' (JSON, ou literal Python se o modelo ignorar
+            # o formato pedido)
+            parsed_list = _extrair_lista(result_str)
             
-            if start_idx != -1 and end_idx > start_idx:
-                # Extrai apenas a parte da lista
-                clean_result = result_str[start_idx:end_idx]
-                
-                # Converte string para lista Python usando ast.literal_eval
-                # (mais seguro que eval() pois só aceita literais)
-                import ast
-                parsed_list = ast.literal_eval(clean_result)
-                
-                # Valida estrutura da lista
-                if isinstance(parsed_list, list) and len(parsed_list) >= 3:
-                    return parsed_list
+            # Valida estrutura da lista
+            if isinstance(parsed_list, list) and len(parsed_list) >= 3:
+                return parsed_list
             
             # =================================================================
             # Estratégia 2: Fallback inteligente baseado no nome
             # =================================================================
             # Se a IA falhou no formato, tentamos identificar pelo nome
-            descricao_upper = descricao.upper()
-            
-            # Verifica se é cerveja
-            beer_keywords = ["HEINEKEN", "BRAHMA", "SKOL", "ANTARCTICA", "CERV", "BEER"]
-            if any(kw in descricao_upper for kw in beer_keywords):
-                print("   (Fallback: identificado como cerveja pelo nome)")
-                return [True, "22030000", "Fallback: Beer identified by name"]
-            
-            # Verifica se é refrigerante
-            soda_keywords = ["COCA", "PEPSI", "FANTA", "SPRITE", "GUARANA", "REFRI"]
-            if any(kw in descricao_upper for kw in soda_keywords):
-                print("   (Fallback: identificado como refrigerante pelo nome)")
-                return [True, "22021000", "Fallback: Soft drink identified by name"]
+            if descricao_norm is None:
+                descricao_norm = _normalizar_descricao(descricao)
             
-            # Verifica se é água
-            water_keywords = ["AGUA", "WATER", "MINERAL"]
-            if any(kw in descricao_upper for kw in water_keywords):
-                print("   (Fallback: identificado como água pelo nome)")
-                return [True, "22011000", "Fallback: Water identified by name"]
+            # Cerveja, refrigerante e água, nessa ordem (ver FALLBACK_POR_NOME)
+            fallback = _fallback_por_nome(descricao_norm)
+            if fallback is not None:
+                ncm, tipo, motivo = fallback
+                logger.info("   (Fallback: identificado como %s pelo nome)", tipo)
+                return [True, ncm, motivo]
             
             # =================================================================
             # Estratégia 3: Fallback seguro (não é monofásico)
             # =================================================================
             return [False, ncm_fallback, "IA respondeu em formato inválido"]
             
-        except Exception as e:
-            print(f"   (Erro no parsing): {e}")
-            return [False, ncm_fallback, f"Erro no parse: {str(e)[:30]}"]
+        except ERROS_DE_PARSE as e:
+            # Só o tipo da exceção vai no motivo: a mensagem de um
+            # SyntaxError do literal_eval pode repetir a resposta inteira
+            logger.warning("   (Erro no parsing): %s", type(e).__name__)
+            return [False, ncm_fallback, f"{MOTIVO_ERRO_PARSE}: {type(e).__name__}"]
+    
+    def _parse_batch_response(self, response: Any, quantidade: int) -> Optional[List[List[Any]]]:
+        """
+        Extrai a lista de resultados de uma resposta de analyze_batch().
+        
+        Args:
+            response (Any): Resposta bruta do CrewAI.
+            quantidade (int): Número de itens enviados no prompt.
+        
+        Returns:
+            List[List[Any]] | None: Um resultado [is_monophasic, ncm, reason]
+            por item, ou None se a resposta não tiver exatamente esse formato
+            (o chamador então analisa os itens individualmente).
+        """
+        if hasattr(response, 'raw'):
+            result_str = response.raw
+        else:
+            result_str = str(response)
+        
+        logger.debug("   (Retorno da IA em lote): %.100s...", result_str)
+        
+        try:
+            parsed_list = _extrair_lista(result_str)
+        except ERROS_DE_PARSE as e:
+            logger.warning("   (Erro no parsing do lote): %s", type(e).__name__)
+            return None
+        
+        if not isinstance(parsed_list, list) or len(parsed_list) != quantidade:
+            return None
+        if not all(isinstance(r, list) and len(r) >= 3 for r in parsed_list):
+            return None
+        
+        return parsed_list
     
     def analyze_item(
         self, 
@@ -503,46 +1009,250 @@ YOUR OUTPUT:
         Raises:
             Não levanta exceções - erros são tratados internamente.
         """
-        print(f"   (Conectando à IA... analisando '{descricao[:30]}...')")
+        # Descrição normalizada uma única vez: chave do veredito e fallback
+        chave = _chave_veredito(descricao, ncm_errado)
+        memorizado = self._buscar_veredito(chave)
+        if memorizado is not None:
+            return memorizado
+        
+        logger.info("   (Conectando à IA... analisando '%.30s...')", descricao)
         
         try:
             # =================================================================
-            # ETAPA 1: Criar agente
-            # =================================================================
-            auditor_agent = self._create_auditor_agent()
-            
-            # =================================================================
-            # ETAPA 2: Criar tarefa com prompt
+            # ETAPAS 1 a 3: Criar agente, tarefa e executar análise
             # =================================================================
             prompt = self._build_analysis_prompt(descricao, ncm_errado, valor_item)
-            
-            task = Task(
-                description=prompt,
-                agent=auditor_agent,
-                expected_output="A Python List like [True, '22030000', 'Reason']"
+            resultado_bruto = self._run_task(
+                prompt,
+                expected_output='A JSON array like [true, "22030000", "Reason"]'
             )
             
-            # =================================================================
-            # ETAPA 3: Executar análise
-            # =================================================================
-            crew = Crew(
-                agents=[auditor_agent],
-                tasks=[task],
-                verbose=False  # Desativa logs verbosos
-            )
-            
-            # kickoff() executa a tarefa e retorna resultado
-            resultado_bruto = crew.kickoff()
-            
             # =================================================================
             # ETAPA 4: Parsear resposta
             # =================================================================
-            return self._parse_response(resultado_bruto, ncm_errado, descricao)
+            resultado = self._parse_response(resultado_bruto, ncm_errado, descricao, chave[0])
+            # Resposta ilegível não é veredito: a próxima chamada tenta de novo
+            if not resultado_com_erro(resultado):
+                self._memorizar_veredito(chave, resultado)
+            return resultado
             
         except Exception as e:
             # Em caso de erro (rede, API, etc.), retorna resposta segura
-            print(f"   ❌ Erro na análise IA: {e}")
-            return [False, ncm_errado, f"Erro na API: {str(e)[:30]}"]
+            logger.warning("   ❌ Erro na análise IA: %s", e)
+            return [False, ncm_errado, f"{MOTIVO_ERRO_API}: {type(e).__name__}"]
+    
+    def analyze_items(self, itens: List[Tuple[str, str, float]]) -> List[List[Any]]:
+        """
+        Analisa vários itens, um prompt por item, com chamadas simultâneas.
+        
+        Cada analyze_item() passa quase todo o tempo esperando a API: com
+        até MAX_LOTES_SIMULTANEOS chamadas em paralelo, o tempo total fica
+        próximo ao das chamadas mais lentas em vez da soma de todas.
+        
+        Args:
+            itens: Lista de (descricao, ncm_errado, valor_item), os mesmos
+                   argumentos de analyze_item().
+        
+        Returns:
+            List[List[Any]]: Um resultado [is_monophasic, ncm, reason] por
+            item, na mesma ordem da entrada.
+        
+        Note:
+            Prefira analyze_batch(), que envia vários itens por prompt; este
+            método é o caminho item a item (ex: lote em formato inválido).
+        """
+        if len(itens) <= 1:
+            return [self.analyze_item(*item) for item in itens]
+        
+        # map() devolve os resultados na ordem dos itens
+        with ThreadPoolExecutor(max_workers=min(len(itens), self._max_lotes_simultaneos)) as executor:
+            return list(executor.map(lambda item: self.analyze_item(*item), itens))
+    
+    def analyze_batch(
+        self,
+        itens: List[Tuple[str, str, float]],
+        ao_concluir_lote: Optional[Callable[[int, int], None]] = None
+    ) -> List[List[Any]]:
+        """
+        Analisa vários itens com uma chamada à IA por lote.
+        
+        Cada chamada à API tem latência fixa de 1-3 segundos; enviar os
+        itens em lotes de até BATCH_SIZE economiza N-1 chamadas por lote.
+        Havendo mais de um lote, até MAX_LOTES_SIMULTANEOS são enviados
+        ao mesmo tempo: a espera é pela rede, então o tempo total fica
+        próximo ao do lote mais lento em vez da soma de todos.
+        
+        Args:
+            itens: Lista de (descricao, ncm_errado, valor_item), os mesmos
+                   argumentos de analyze_item().
+            ao_concluir_lote: Chamada como ao_concluir_lote(concluidos, total)
+                   assim que cada lote termina - na ordem em que terminam,
+                   não na dos lotes - com o número de itens já respondidos e
+                   o total enviado à IA. Roda na thread de quem chamou
+                   analyze_batch() (ex: para atualizar o progresso na tela).
+        
+        Returns:
+            List[List[Any]]: Um resultado [is_monophasic, ncm, reason] por
+            item, na mesma ordem da entrada.
+        
+        Example:
+            >>> resultados = auditor.analyze_batch([
+            ...     ("HEINEKEN LN 355ML", "99999999", 8.99),
+            ...     ("ARROZ TIPO 1 5KG", "10063021", 25.90),
+            ... ])
+            >>> print(resultados)
+            [[True, '22030000', 'Beer identified'], [False, '10063021', 'Not a monophasic product']]
+        
+        Note:
+            - Itens repetidos (mesma descrição normalizada e NCM) e produtos
+              já analisados por este agente não geram nova consulta.
+            - Se a IA responder um lote em formato inválido, o lote é
+              reenviado em duas metades; se ainda assim falhar, os itens são
+              analisados individualmente com analyze_items().
+        """
+        # Só vai para a IA um item por produto ainda sem veredito
+        chaves = [_chave_veredito(descricao, ncm) for descricao, ncm, _ in itens]
+        resultados = [self._buscar_veredito(chave) for chave in chaves]
+        pendentes = {}
+        for chave, item, resultado in zip(chaves, itens, resultados):
+            if resultado is None:
+                pendentes.setdefault(chave, item)
+        
+        if not pendentes:
+            return resultados
+        
+        consultar = list(pendentes.values())
+        tamanho = self._batch_size
+        lotes = [consultar[inicio:inicio + tamanho] for inicio in range(0, len(consultar), tamanho)]
+        
+        if len(lotes) <= 1:
+            resultados_lotes = [self._analyze_lote(lote) for lote in lotes]
+            if ao_concluir_lote:
+                ao_concluir_lote(len(consultar), len(consultar))
+        else:
+            # Cada lote é entregue assim que termina (as_completed), e guardado
+            # na sua posição para manter a ordem de entrada
+            resultados_lotes = [None] * len(lotes)
+            concluidos = 0
+            with ThreadPoolExecutor(max_workers=min(len(lotes), self._max_lotes_simultaneos)) as executor:
+                posicoes = {executor.submit(self._analyze_lote, lote): i for i, lote in enumerate(lotes)}
+                for futuro in as_completed(posicoes):
+                    posicao = posicoes[futuro]
+                    resultados_lotes[posicao] = futuro.result()
+                    concluidos += len(lotes[posicao])
+                    if ao_concluir_lote:
+                        ao_concluir_lote(concluidos, len(consultar))
+        
+        novos = dict(zip(pendentes, (resultado for lote in resultados_lotes for resultado in lote)))
+        
+        return [
+            resultado if resultado is not None else list(novos[chave])
+            for chave, resultado in zip(chaves, resultados)
+        ]
+    
+    def _analyze_lote(self, lote: List[Tuple[str, str, float]], dividir: bool = True) -> List[List[Any]]:
+        """
+        Analisa um lote (até BATCH_SIZE itens) com uma única chamada.
+        
+        Se a resposta vier em formato inválido (ex: cortada por excesso de
+        tokens, ou com um item a menos), o lote é dividido ao meio e cada
+        metade é reenviada uma vez - 2 chamadas em vez de uma por item.
+        Só se uma metade também falhar seus itens vão um a um.
+        
+        Args:
+            lote: Lista de (descricao, ncm_errado, valor_item).
+            dividir: Se False, um lote em formato inválido vai direto para
+                     a análise item a item (usado nas metades).
+        
+        Returns:
+            List[List[Any]]: Um resultado por item do lote.
+        """
+        if len(lote) == 1:
+            return [self.analyze_item(*lote[0])]
+        
+        logger.info("   (Conectando à IA... analisando lote de %d itens)", len(lote))
+        
+        try:
+            prompt = self._build_batch_prompt(lote)
+            resultado_bruto = self._run_task(
+                prompt,
+                expected_output='A JSON array of arrays like [[true, "22030000", "Reason"], ...]'
+            )
+        except Exception as e:
+            # Em caso de erro (rede, API, etc.), retorna resposta segura
+            logger.warning("   ❌ Erro na análise IA: %s", e)
+            return [[False, ncm, f"{MOTIVO_ERRO_API}: {type(e).__name__}"] for _, ncm, _ in lote]
+        
+        resultados = self._parse_batch_response(resultado_bruto, len(lote))
+        if resultados is None:
+            if dividir and len(lote) > 2:
+                logger.warning("   (Lote em formato inválido - reenviando em duas metades)")
+                meio = len(lote) // 2
+                return (
+                    self._analyze_lote(lote[:meio], dividir=False)
+                    + self._analyze_lote(lote[meio:], dividir=False)
+                )
+            
+            logger.warning("   (Lote em formato inválido - analisando itens individualmente)")
+            return self.analyze_items(lote)
+        
+        for (descricao, ncm, _), resultado in zip(lote, resultados):
+            if not resultado_com_erro(resultado):
+                self._memorizar_veredito(_chave_veredito(descricao, ncm), resultado)
+        
+        return resultados
+    
+    def _run_task(self, prompt: str, expected_output: str) -> Any:
+        """
+        Monta a tarefa e executa o prompt via CrewAI.
+        
+        O agente é reaproveitado (ver _get_auditor_agent); só Task e Crew,
+        que carregam o prompt desta chamada, são criados a cada execução.
+        O CrewAI guarda na Task a saída da execução, por isso ela não é
+        reaproveitada entre chamadas simultâneas.
+        
+        Erros passageiros da API (ver _erro_transitorio) são repetidos até
+        MAX_TENTATIVAS_API vezes, com backoff exponencial e jitter; só a
+        última falha chega a quem chamou, que devolve o resultado seguro.
+        
+        Args:
+            prompt (str): Descrição da tarefa (prompt completo).
+            expected_output (str): Formato esperado, informado ao CrewAI.
+        
+        Returns:
+            Any: Resposta bruta do CrewAI (CrewOutput).
+        """
+        from crewai import Task, Crew
+        
+        auditor_agent = self._get_auditor_agent()
+        try:
+            for tentativa in range(1, MAX_TENTATIVAS_API + 1):
+                task = Task(
+                    description=prompt,
+                    agent=auditor_agent,
+                    expected_output=expected_output
+                )
+                
+                crew = Crew(
+                    agents=[auditor_agent],
+                    tasks=[task],
+                    verbose=False  # Desativa logs verbosos
+                )
+                
+                try:
+                    # kickoff() executa a tarefa e retorna resultado
+                    return crew.kickoff()
+                except Exception as e:
+                    if tentativa == MAX_TENTATIVAS_API or not _erro_transitorio(e):
+                        raise
+                    espera = _espera_nova_tentativa(e, tentativa)
+                    logger.warning(
+                        "   (API indisponível: %s) nova tentativa %d/%d em %.1fs",
+                        type(e).__name__, tentativa + 1, MAX_TENTATIVAS_API, espera
+                    )
+                    time.sleep(espera)
+        finally:
+            self._release_auditor_agent(auditor_agent)
 
 
 # =============================================================================
@@ -558,6 +1268,10 @@ if __name__ == "__main__":
         
     Requer OPENAI_API_KEY configurada no .env
     """
+    # Exibe as mensagens de progresso do agente (nível INFO) no terminal
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler(sys.stdout))
+    
     print("=" * 60)
     print("🤖 TESTE DO AGENTE DE AUDITORIA FISCAL")
     print("=" * 60)
@@ -575,13 +1289,15 @@ if __name__ == "__main__":
             ("RED BULL ENERGY 250ML", "99999999", 12.00),
         ]
         
-        for descricao, ncm, valor in test_cases:
+        # Os casos são enviados à IA ao mesmo tempo (analyze_items): o teste
+        # leva o tempo da chamada mais lenta, não a soma de todas
+        resultados = auditor.analyze_items(test_cases)
+        
+        for (descricao, ncm, valor), resultado in zip(test_cases, resultados):
             print(f"\n📋 Testando: {descricao}")
             print(f"   NCM atual: {ncm}")
             print(f"   Valor: R$ {valor}")
             
-            resultado = auditor.analyze_item(descricao, ncm, valor)
-            
             print(f"\n   📊 Resultado:")
             print(f"   - É monofásico? {resultado[0]}")
             print(f"   - NCM correto: {resultado[1]}")
@@ -4,9 +4,10 @@ Pacote core - Módulos centrais do RevFinder AI.
 Contém:
     - NFeParser: Extração de dados de XMLs de NF-e
     - NCMDatabase: Banco de dados inteligente de NCMs monofásicos
+    - get_ncm_database: NCMDatabase compartilhado por arquivo (uma carga por processo)
 """
 
 from .parser import NFeParser
-from .ncm_database import NCMDatabase
+from .ncm_database import NCMDatabase, get_ncm_database
 
-__all__ = ['NFeParser', 'NCMDatabase']
+__all__ = ['NFeParser', 'NCMDatabase', 'get_ncm_database']
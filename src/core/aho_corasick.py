@@ -0,0 +1,217 @@
+"""
+================================================================================
+MÓDULO: aho_corasick.py - Busca de Várias Palavras em uma Única Passada
+================================================================================
+
+Implementa o autômato de Aho-Corasick: dado um conjunto de padrões
+(palavras-chave, nomes de produtos do cache...), encontra TODAS as
+ocorrências de TODOS os padrões em um texto percorrendo o texto uma
+única vez.
+
+POR QUE NÃO USAR `padrao in texto` PARA CADA PADRÃO?
+----------------------------------------------------
+Com n padrões, o laço faz n buscas por texto: o custo cresce com o
+tamanho do cache/lista de keywords. No autômato o custo depende só do
+tamanho do texto e do número de ocorrências:
+
+    Laço simples:   O(n × |texto|)
+    Aho-Corasick:   O(|texto| + ocorrências)
+
+Para poucos padrões o laço em C do `in` ainda ganha; o autômato compensa
+quando os padrões passam das centenas (ex: cache de aprendizado da IA).
+
+COMO FUNCIONA:
+--------------
+    1. Os padrões formam uma árvore de prefixos (trie), um caractere por nó
+    2. Cada nó ganha um link de falha: o maior sufixo do caminho até ele
+       que também é prefixo de algum padrão
+    3. Na busca, quando o próximo caractere não continua o caminho, o
+       autômato segue os links de falha em vez de recomeçar do zero
+
+A montagem (passo 2) é feita sob demanda na primeira busca após novos
+padrões serem adicionados.
+
+THREADS:
+--------
+Várias threads podem buscar ao mesmo tempo no mesmo autômato: a montagem
+sob demanda roda uma vez só (lock) e publica os links de falha de uma
+vez, em listas novas. adicionar() não pode rodar junto com buscas: quem
+compartilha o autômato (ex: NCMDatabase entre as sessões do Streamlit)
+o monta com todos os padrões antes de publicá-lo, ou serializa
+adicionar() e buscar().
+
+USO:
+----
+    from core.aho_corasick import AhoCorasick
+
+    automato = AhoCorasick([("CASAL GARCIA", 0), ("HEINEKEN", 1)])
+
+    for inicio, fim, valor in automato.buscar("VH CASAL GARCIA 750ML"):
+        print(inicio, fim, valor)  # 3 15 0
+
+Autor: Grande Mestre
+Versão: 1.0
+Data: Dezembro/2025
+================================================================================
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+
+class AhoCorasick:
+    """
+    Autômato de Aho-Corasick para busca simultânea de vários padrões.
+
+    Cada padrão é adicionado com um valor associado, devolvido junto com
+    as posições de cada ocorrência encontrada. Padrões repetidos são
+    mantidos (cada um devolve seu próprio valor).
+
+    buscar() pode ser chamado por várias threads ao mesmo tempo;
+    adicionar() não (ver THREADS no início do módulo).
+
+    Attributes:
+        total_padroes (int): Quantidade de padrões adicionados
+
+    Example:
+        >>> automato = AhoCorasick([("CHA", "cha"), ("CHANDON", "vinho")])
+        >>> sorted(valor for _, _, valor in automato.buscar("CHANDON BRUT"))
+        ['cha', 'vinho']
+    """
+
+    def __init__(self, padroes: Iterable[Tuple[str, Any]] = ()):
+        """
+        Cria o autômato, opcionalmente já com padrões.
+
+        Args:
+            padroes (Iterable[Tuple[str, Any]]): Pares (padrão, valor).
+        """
+        # Nó 0 é a raiz. Cada nó tem: transições (caractere -> nó),
+        # link de falha e saídas (tamanho do padrão, valor)
+        self._transicoes: List[Dict[str, int]] = [{}]
+        self._proprias: List[List[Tuple[int, Any]]] = [[]]  # Padrões que terminam no nó
+        # (links de falha, saídas = próprias + as do link de falha), trocados
+        # juntos a cada montagem: uma busca lê o par uma vez só
+        self._links: Tuple[List[int], List[Tuple[Tuple[int, Any], ...]]] = ([0], [()])
+        self._montagem_lock = threading.Lock()
+        self._montado = True
+        self.total_padroes = 0
+
+        for padrao, valor in padroes:
+            self.adicionar(padrao, valor)
+
+    def __len__(self) -> int:
+        return self.total_padroes
+
+    def adicionar(self, padrao: str, valor: Any) -> None:
+        """
+        Adiciona um padrão ao autômato.
+
+        Os links de falha são recalculados na próxima busca, então várias
+        inclusões seguidas custam uma única remontagem.
+
+        Args:
+            padrao (str): Texto a procurar (padrão vazio é ignorado).
+            valor (Any): Valor devolvido em cada ocorrência do padrão.
+        """
+        if not padrao:
+            return
+
+        no = 0
+        for caractere in padrao:
+            proximo = self._transicoes[no].get(caractere)
+            if proximo is None:
+                # O nó existe antes da transição que leva a ele
+                proximo = len(self._transicoes)
+                self._transicoes.append({})
+                self._proprias.append([])
+                self._transicoes[no][caractere] = proximo
+            no = proximo
+
+        self._proprias[no].append((len(padrao), valor))
+        self.total_padroes += 1
+        self._montado = False
+
+    def _montar(self) -> None:
+        """
+        Calcula os links de falha e as saídas de cada nó (busca em largura).
+
+        A largura garante que o link de falha de um nó (sempre mais raso)
+        já esteja pronto quando o nó é processado. Os links vão para listas
+        novas, publicadas juntas no fim: uma busca em andamento continua
+        com as anteriores.
+        """
+        with self._montagem_lock:
+            # Outra thread pode ter montado enquanto esta esperava
+            if self._montado:
+                return
+            self._links = self._calcular_links()
+            self._montado = True
+
+    def _calcular_links(self) -> Tuple[List[int], List[Tuple[Tuple[int, Any], ...]]]:
+        """
+        Calcula, em listas novas, os links de falha e as saídas (ver _montar).
+
+        Returns:
+            tuple: (links de falha, saídas), um item por nó.
+        """
+        transicoes = self._transicoes
+        proprias = self._proprias
+        falha = [0] * len(transicoes)
+        saidas = [()] * len(transicoes)
+
+        fila = deque()
+        for filho in transicoes[0].values():
+            falha[filho] = 0
+            saidas[filho] = tuple(proprias[filho])
+            fila.append(filho)
+
+        while fila:
+            no = fila.popleft()
+            for caractere, filho in transicoes[no].items():
+                # Maior sufixo próprio que continua com este caractere
+                anterior = falha[no]
+                while anterior and caractere not in transicoes[anterior]:
+                    anterior = falha[anterior]
+                falha[filho] = transicoes[anterior].get(caractere, 0)
+                saidas[filho] = tuple(proprias[filho]) + saidas[falha[filho]]
+                fila.append(filho)
+
+        return falha, saidas
+
+    def buscar(self, texto: str, inicio: int = 0) -> Iterator[Tuple[int, int, Any]]:
+        """
+        Encontra todas as ocorrências de todos os padrões no texto.
+
+        As ocorrências saem em ordem de posição final; na mesma posição,
+        o padrão mais longo vem primeiro.
+
+        Args:
+            texto (str): Texto onde procurar.
+            inicio (int): Posição onde a busca começa. Ocorrências que
+                começam antes dela não são reportadas; as posições
+                devolvidas continuam relativas ao texto inteiro.
+
+        Yields:
+            tuple: (inicio, fim, valor) de cada ocorrência, com
+                   texto[inicio:fim] == padrão.
+
+        Example:
+            >>> automato = AhoCorasick([("COCA", 1), ("COLA", 2)])
+            >>> list(automato.buscar("COCA COLA"))
+            [(0, 4, 1), (5, 9, 2)]
+        """
+        if not self._montado:
+            self._montar()
+
+        transicoes = self._transicoes
+        falha, saidas = self._links
+
+        no = 0
+        for fim, caractere in enumerate(texto[inicio:] if inicio else texto, inicio + 1):
+            while no and caractere not in transicoes[no]:
+                no = falha[no]
+            no = transicoes[no].get(caractere, 0)
+            for tamanho, valor in saidas[no]:
+                yield fim - tamanho, fim, valor
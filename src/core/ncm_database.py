@@ -31,6 +31,9 @@ COMO FUNCIONA:
 
 2. Após receber a resposta da IA, o sistema SALVA automaticamente no JSON
    em uma seção especial chamada "_aprendizado_ia".
+   (Cada resposta é anexada em uma linha de "<json>.learn.jsonl"; o JSON
+   principal só é reescrito a cada APRENDIZADOS_POR_CONSOLIDACAO respostas
+   e ao final do programa - ver consolidar_aprendizado.)
 
 3. Na próxima vez que o MESMO PRODUTO aparecer, o sistema encontra no cache
    e NÃO precisa chamar a IA novamente (economia de dinheiro!).
@@ -77,7 +80,7 @@ ESTRUTURA DO JSON COMPLETO:
 ---------------------------
     {
         "_metadata": { ... },           # Informações sobre a tabela
-        "_ncm_simples": { "lista": [] }, # Lista rápida de NCMs
+        "_ncms_monofasicos_lista": { "lista": [] }, # Lista rápida de NCMs
         "_keywords_produtos": { ... },   # Palavras-chave por categoria
         "_aprendizado_ia": { ... },      # NOVO: Cache de respostas da IA
         "2201": {                        # Grupo de NCMs
@@ -118,12 +121,169 @@ Data: Dezembro/2025
 ================================================================================
 """
 
+import atexit
 import json
 import os
+import re
+import sys
+from bisect import bisect_right
+from collections import OrderedDict
+import threading
+import weakref
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Tuple
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Any, Tuple
 from colorama import Fore
 
+from .aho_corasick import AhoCorasick
+
+
+# Keywords que devem ser buscadas como palavra completa (evita falsos positivos)
+# Ex: "CHA" não deve bater em "CHANDON"
+KEYWORDS_PALAVRA_COMPLETA = frozenset({"CHA", "CHÁ", "ALE", "ZERO"})
+
+# Keywords muito específicas (marcas) = alta confiança na identificação
+KEYWORDS_CONFIANCA_ALTA = frozenset({
+    "HEINEKEN", "BRAHMA", "SKOL", "ANTARCTICA", "BUDWEISER",
+    "COCA-COLA", "COCA", "PEPSI", "FANTA", "SPRITE",
+    "RED BULL", "MONSTER", "GATORADE", "POWERADE"
+})
+
+# Keywords genéricas (tipo de bebida) = média confiança
+KEYWORDS_CONFIANCA_MEDIA = frozenset({
+    "CERVEJA", "REFRIGERANTE", "AGUA", "ÁGUA", "SUCO",
+    "ENERGETICO", "ISOTONICO", "CHÁ"
+})
+
+# Mapeamento de categoria de keywords -> NCM sugerido
+CATEGORIA_NCM = {
+    "cerveja": "22030000",
+    "refrigerante": "22021000",
+    "agua": "22011000",
+    "energetico": "22029900",
+    "isotonico": "22029900",
+    "cha_pronto": "22029900",
+    "suco_pronto": "22029900",
+    "cerveja_sem_alcool": "22029100"
+}
+
+# Quantos produtos aprendidos podem ficar fora do índice do cache de IA
+# (verificados um a um) antes de o índice ser remontado. Evita remontar
+# o autômato a cada salvar_aprendizado_ia durante uma análise
+CACHE_IA_MAX_NAO_INDEXADOS = 64
+
+# Quantos resultados de verificar_item() ficam em memória. O mesmo produto
+# aparece em várias notas de um lote; a partir do limite, o par (NCM, nome)
+# usado há mais tempo sai para dar lugar ao novo (LRU), e a memória continua
+# útil em lotes longos sem crescer
+MAX_VERIFICACOES_MEMORIA = 8192
+
+# Quantos nomes ficam memorizados com a keyword encontrada (ou nenhuma).
+# O mesmo nome chega com NCMs diferentes (cada um é um par novo em
+# verificar_item) e em chamadas diretas a identificar_por_nome
+MAX_IDENTIFICACOES_MEMORIA = 8192
+
+# Quantos caracteres do início de cada chave do cache de IA entram no
+# autômato. A chave inteira custaria um nó por caractere (centenas de MB
+# com dezenas de milhares de produtos); o prefixo só aponta candidatas,
+# confirmadas depois com startswith
+CACHE_IA_PREFIXO_INDEXADO = 8
+
+# Quantos nomes sem resultado no cache de IA ficam memorizados. Um produto
+# não reconhecido se repete em várias notas até a IA responder por ele
+MAX_CACHE_IA_AUSENTES = 16384
+
+# A cada quantos aprendizados anexados em "<json>.learn.jsonl" o JSON
+# principal é reescrito (consolidado). Reescrever o JSON inteiro a cada
+# resposta da IA custava mais que a própria busca
+APRENDIZADOS_POR_CONSOLIDACAO = 50
+
+def _limpar_ncm(ncm: str) -> str:
+    """
+    Normaliza um código NCM: sem pontos, sem espaços.
+    
+    Único ponto de limpeza do NCM (is_monofasico, get_descricao,
+    verificar_item). O NCM que vem do XML já é só dígitos e volta sem
+    nenhuma cópia.
+    
+    Args:
+        ncm (str): NCM como veio da nota (ex: "2203.00.00")
+    
+    Returns:
+        str: NCM limpo (ex: "22030000")
+    
+    Example:
+        >>> _limpar_ncm(" 2203.00.00 ")
+        '22030000'
+    """
+    if ncm.isdigit():
+        return ncm
+    return ncm.replace(".", "").replace(" ", "").strip()
+
+
+def _regex_trie(palavras: List[str]) -> str:
+    """
+    Monta uma regex que reconhece qualquer uma das palavras, em forma de
+    árvore de prefixos (trie).
+    
+    Numa alternância simples ("CERVEJA|CERV|COCA|..."), o módulo re tenta
+    cada alternativa em cada posição do texto: o custo cresce com o número
+    de palavras. Com os prefixos comuns fatorados
+    ("C(?:ERV(?:EJA)?|OCA)"), cada posição testa só os ramos que continuam
+    o que já bateu.
+    
+    Args:
+        palavras (List[str]): Palavras a reconhecer (não vazias).
+    
+    Returns:
+        str: Padrão da regex (sem âncoras nem lookarounds).
+    
+    Example:
+        >>> _regex_trie(["CERV", "CERVEJA", "COCA"])
+        'C(?:ERV(?:EJA)?|OCA)'
+    """
+    trie = {}
+    for palavra in palavras:
+        no = trie
+        for caractere in palavra:
+            no = no.setdefault(caractere, {})
+        no[""] = {}  # Fim de palavra
+    
+    def _padrao(no: Dict[str, Any]) -> str:
+        ramos = [
+            re.escape(caractere) + _padrao(filho)
+            for caractere, filho in no.items()
+            if caractere
+        ]
+        if not ramos:
+            return ""
+        if len(ramos) == 1 and "" not in no:
+            return ramos[0]
+        grupo = "(?:" + "|".join(ramos) + ")"
+        # Palavra que termina aqui: o resto é opcional
+        return grupo + "?" if "" in no else grupo
+    
+    return _padrao(trie)
+
+
+class _IndiceCacheIA(NamedTuple):
+    """
+    Índices da busca flexível do cache de IA (ver _indexar_cache_ia).
+    
+    Publicados juntos, em uma única atribuição: quem busca lê o índice
+    uma vez e usa sempre as mesmas chaves, autômato e texto, mesmo que
+    outra thread esteja remontando o índice.
+    """
+    chaves: List[str]  # Chaves de _cache_ia_upper indexadas, em ordem
+    automato: AhoCorasick  # Prefixo da chave -> posição em chaves
+    texto: str  # Chaves unidas por "\0" (busca reversa)
+    inicios: List[int]  # Posição de cada chave em texto
+    maior_chave: int  # Tamanho da maior chave
+
+
+# Índice vazio (antes da primeira indexação)
+_INDICE_CACHE_IA_VAZIO = _IndiceCacheIA([], AhoCorasick(), "", [], 0)
+
 
 class NCMDatabase:
     """
@@ -137,10 +297,12 @@ class NCMDatabase:
     
     Attributes:
         data (dict): Dados completos do JSON
-        ncm_lista (list): Lista simples de NCMs monofásicos
+        ncm_lista (tuple): Lista simples de NCMs monofásicos (somente leitura:
+            as buscas usam os conjuntos montados a partir dela)
         keywords (dict): Dicionário de palavras-chave por categoria
         ncm_detalhes (dict): Mapeamento NCM -> detalhes (descrição, exemplos, etc)
         cache_ia (dict): Cache de respostas da IA (aprendizado)
+        verbose (bool): Se imprime as mensagens de andamento (carga, aprendizado)
     
     Example:
         >>> db = NCMDatabase("ncm_rules.json")
@@ -156,28 +318,58 @@ class NCMDatabase:
         >>> db.salvar_aprendizado_ia("VINHO TINTO", False, "22042100", "Wine")
     """
     
-    def __init__(self, json_path: str):
+    def __init__(self, json_path: str, verbose: bool = True):
         """
         Inicializa o banco de dados carregando o arquivo JSON.
         
         Args:
             json_path (str): Caminho para o arquivo ncm_rules.json
+            verbose (bool): Se False, não imprime as mensagens de andamento
+                (banco carregado, totais, "Aprendizado salvo"). Avisos e
+                erros continuam sendo impressos. Útil em lotes grandes,
+                onde um print por aprendizado pesa no tempo total.
         
         Raises:
             FileNotFoundError: Se o arquivo não existir
             json.JSONDecodeError: Se o JSON estiver malformado
         """
         self.json_path = json_path
+        self.verbose = verbose
+        self.aprendizado_path = json_path + ".learn.jsonl"  # Aprendizados ainda não consolidados
         self.data = {}
-        self.ncm_lista = []
+        self.ncm_lista = ()
+        self._ncm_set = frozenset()  # ncm_lista para busca exata O(1)
+        self._ncm_prefixos = frozenset()  # Prefixos de até 4 dígitos de cada NCM da lista
         self.keywords = {}
         self.ncm_detalhes = {}
+        self._descricoes = {}  # NCM ou ncm_base -> descrição (respostas de get_descricao)
         self.metadata = {}
         self.cache_ia = {}  # NOVO: Cache de aprendizado da IA
+        self._cache_ia_upper = {}  # Índice do cache por nome em maiúsculas
+        self._cache_ia_indice = _INDICE_CACHE_IA_VAZIO  # Índices da busca flexível
+        self._cache_ia_nao_indexadas = []  # Chaves ainda fora do índice (na carga, todas)
+        self._cache_ia_ausentes = set()  # Nomes já buscados sem resultado no cache
+        self._cache_ia_geracao = 0  # Lotes de aprendizados salvos (invalida ausências anteriores)
+        self._verificacoes = OrderedDict()  # (ncm_limpo, nome em maiúsculas) -> resultado de verificar_item (LRU)
+        self._keyword_regex = None  # Regex pré-compilada com todas as keywords
+        self._keywords_busca = []  # (keyword, keyword_upper, categoria, ncm, palavra_completa, confianca)
+        self._keywords_automato = AhoCorasick()  # keyword_upper -> posição em _keywords_busca
+        self._keywords_montadas = False  # As três acima já montadas (_montar_busca_keywords)
+        self._identificacoes = OrderedDict()  # Nome em maiúsculas -> resultado de _identificar_keyword (LRU)
+        self._aprendizados_pendentes = 0  # Linhas em aprendizado_path ainda fora do JSON
+        self._aprendizado_arquivo = None  # aprendizado_path aberto para anexar (até consolidar)
+        self._economia_pendente = False  # _total_economizado mudou desde a última consolidação
+        self._arquivo_lock = threading.Lock()  # Escrita nos arquivos (sessões do Streamlit)
+        self._memoria_lock = threading.Lock()  # Memórias LRU compartilhadas entre sessões/threads
+        self._cache_ia_lock = threading.Lock()  # Novos aprendizados e remontagem do índice do cache
         
         # Carrega e processa o JSON
         self._load_database()
+        self._carregar_aprendizados_pendentes()
         self._process_database()
+        
+        # Aprendizados e economia pendentes vão para o JSON ao sair
+        _INSTANCIAS.add(self)
     
     def _load_database(self) -> None:
         """
@@ -187,20 +379,64 @@ class NCMDatabase:
             FileNotFoundError: Se arquivo não existir
             json.JSONDecodeError: Se JSON inválido
         """
-        if not os.path.exists(self.json_path):
-            print(Fore.YELLOW + f"⚠️  Arquivo {self.json_path} não encontrado.")
-            print(Fore.YELLOW + "   Criando banco de dados vazio...")
-            self.data = {}
-            return
-        
+        # Abre direto (sem os.path.exists antes): o caso comum, arquivo
+        # presente, custa uma chamada de sistema a menos
         try:
             with open(self.json_path, 'r', encoding='utf-8') as f:
                 self.data = json.load(f)
-            print(Fore.GREEN + f"✅ Banco de NCMs carregado: {self.json_path}")
+            if self.verbose:
+                print(Fore.GREEN + f"✅ Banco de NCMs carregado: {self.json_path}")
+        except FileNotFoundError:
+            print(Fore.YELLOW + f"⚠️  Arquivo {self.json_path} não encontrado.")
+            print(Fore.YELLOW + "   Criando banco de dados vazio...")
+            self.data = {}
         except json.JSONDecodeError as e:
             print(Fore.RED + f"❌ Erro ao ler JSON: {e}")
             self.data = {}
     
+    def _carregar_aprendizados_pendentes(self) -> None:
+        """
+        Aplica em self.data os aprendizados anexados e ainda não consolidados.
+        
+        Acontece quando o programa anterior terminou antes de consolidar
+        (ex: processo encerrado à força). Uma linha incompleta no fim do
+        arquivo (escrita interrompida), ou que não seja um objeto com
+        "nome", é ignorada.
+        """
+        # Sem o arquivo (o caso comum: tudo consolidado) não há o que aplicar
+        try:
+            f = open(self.aprendizado_path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        
+        produtos = self._secao_aprendizado()["produtos"]
+        with f:
+            for linha in f:
+                try:
+                    dados = json.loads(linha)
+                    nome = dados.pop("nome")
+                except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+                    continue
+                if not isinstance(nome, str):
+                    continue
+                produtos[nome] = dados
+                self._aprendizados_pendentes += 1
+    
+    def _secao_aprendizado(self) -> Dict[str, Any]:
+        """
+        Retorna a seção "_aprendizado_ia" de self.data, criando se preciso.
+        
+        Returns:
+            dict: Seção com "_total_economizado" e "produtos".
+        """
+        if "_aprendizado_ia" not in self.data:
+            self.data["_aprendizado_ia"] = {
+                "_comentario": "Cache de respostas da IA - Gerado automaticamente pelo sistema",
+                "_total_economizado": 0,
+                "produtos": {}
+            }
+        return self.data["_aprendizado_ia"]
+    
     def _process_database(self) -> None:
         """
         Processa o JSON carregado, extraindo:
@@ -216,15 +452,51 @@ class NCMDatabase:
         self.metadata = self.data.get("_metadata", {})
         
         # Extrai lista simples de NCMs
-        ncm_simples = self.data.get("_ncm_simples", {})
-        self.ncm_lista = ncm_simples.get("lista", [])
+        # (o JSON usa "_ncms_monofasicos_lista"; "_ncm_simples" é o nome antigo)
+        ncm_simples = self.data.get("_ncms_monofasicos_lista") or self.data.get("_ncm_simples", {})
+        # Internados: o parser também interna o NCM de cada item, então a
+        # busca no conjunto compara o mesmo objeto. Tupla: alterar a lista
+        # depois da carga não atualizaria _ncm_set nem _ncm_prefixos
+        self.ncm_lista = tuple(sys.intern(ncm) for ncm in ncm_simples.get("lista", []))
+        self._ncm_set = frozenset(self.ncm_lista)
+        # Todos os prefixos de 0 a 4 dígitos: NCM informado com menos de 4
+        # dígitos também vira uma consulta ao conjunto
+        self._ncm_prefixos = frozenset(
+            ncm[:tamanho] for ncm in self.ncm_lista for tamanho in range(5)
+        )
         
-        # Extrai keywords
+        # Extrai keywords. A tabela, a regex e o autômato da busca por nome
+        # - a maior parte do tempo da carga - só são montados na primeira
+        # busca (_montar_busca_keywords): quem só consulta NCMs não paga
         self.keywords = self.data.get("_keywords_produtos", {})
+        self._keywords_montadas = False
+        self._identificacoes.clear()
         
         # NOVO: Extrai cache de aprendizado da IA
+        # Nomes internados: as chaves já são salvas em maiúsculas, então
+        # cache_ia e _cache_ia_upper passam a apontar para a mesma string
+        # (em vez de uma cópia criada por upper() para cada produto)
         aprendizado = self.data.get("_aprendizado_ia", {})
-        self.cache_ia = aprendizado.get("produtos", {})
+        self.cache_ia = {
+            sys.intern(chave): dados
+            for chave, dados in aprendizado.get("produtos", {}).items()
+        }
+        if "produtos" in aprendizado:
+            aprendizado["produtos"] = self.cache_ia  # Continua sendo a seção do JSON
+        # salvar_aprendizado_ia() já grava as chaves em maiúsculas: no caso
+        # comum o índice é uma cópia direta (em C) de cache_ia. Só um JSON
+        # editado à mão, com chave em minúsculas, passa pelo laço
+        if all(chave_cache == chave_cache.upper() for chave_cache in self.cache_ia):
+            self._cache_ia_upper = dict(self.cache_ia)
+        else:
+            self._cache_ia_upper = {}
+            for chave_cache, dados in self.cache_ia.items():
+                self._cache_ia_upper.setdefault(sys.intern(chave_cache.upper()), dados)
+        
+        # O índice da busca flexível só é montado na primeira busca (e só
+        # se o cache passar de CACHE_IA_MAX_NAO_INDEXADOS produtos): a
+        # carga não paga pelo autômato se a análise nem chegar ao cache
+        self._cache_ia_nao_indexadas = list(self._cache_ia_upper)
         total_cache = len(self.cache_ia)
         
         # Processa cada grupo de NCMs para extrair detalhes
@@ -251,6 +523,10 @@ class NCMDatabase:
                         "observacao": ncm_info.get("observacao", ""),
                         "base_legal": self.metadata.get("base_legal", "")
                     }
+                    # Código exato tem prioridade; a base (sem _EX01) fica
+                    # com a descrição do primeiro NCM que a usa
+                    self._descricoes[ncm_code] = ncm_info.get("descricao", "")
+                    self._descricoes.setdefault(ncm_base, ncm_info.get("descricao", ""))
         
         # Calcula total de keywords
         total_keywords = sum(
@@ -259,6 +535,9 @@ class NCMDatabase:
             if not cat.startswith("_")
         )
         
+        if not self.verbose:
+            return
+        
         print(Fore.BLUE + f"   📊 {len(self.ncm_lista)} NCMs carregados")
         print(Fore.BLUE + f"   🔍 {len(self.keywords)} categorias de keywords ({total_keywords} keywords)")
         
@@ -266,10 +545,192 @@ class NCMDatabase:
         if total_cache > 0:
             print(Fore.CYAN + f"   🧠 {total_cache} produtos no cache de aprendizado")
     
+    def _montar_busca_keywords(self) -> None:
+        """
+        Monta as estruturas da busca por nome, na primeira busca.
+        
+        Chamado por _identificar_keyword(). Os três atributos são montados
+        antes de serem publicados, e a marca _keywords_montadas vem por
+        último: uma sessão do Streamlit que busque ao mesmo tempo vê tudo
+        pronto ou monta sua própria cópia (mesmo resultado).
+        """
+        self._keywords_busca = self._build_keywords_busca()
+        regex = self._compile_keyword_regex()
+        automato = AhoCorasick(
+            (busca[1], posicao) for posicao, busca in enumerate(self._keywords_busca)
+        )
+        self._keyword_regex = regex
+        self._keywords_automato = automato
+        self._keywords_montadas = True
+    
+    def _compile_keyword_regex(self) -> Optional["re.Pattern"]:
+        """
+        Compila uma única regex com todas as keywords de _keywords_busca.
+        
+        A regex é usada como pré-filtro em identificar_por_nome(): a maioria
+        dos produtos não bate com nenhuma keyword, e uma única busca em C
+        descarta esses casos sem percorrer o autômato em Python.
+        
+        Usa a mesma tabela do autômato (e não self.keywords), então
+        keywords de categorias sem NCM em CATEGORIA_NCM (ex: "chopp"), que
+        nunca geram identificação, não deixam o nome passar à toa.
+        Keywords repetidas entram uma vez só.
+        
+        Keywords de KEYWORDS_PALAVRA_COMPLETA só batem como palavra
+        completa (delimitadas por espaço ou início/fim do nome), com
+        lookarounds - sem montar strings com espaços em volta.
+        
+        As keywords entram em forma de árvore de prefixos (_regex_trie):
+        um nome sem keyword nenhuma, o caso comum, é descartado em cerca
+        de metade do tempo da alternância simples.
+
+        Sem re2/Hyperscan: a regex só responde "há keyword?" (cerca de
+        1 µs por nome, já em C), e quem decide qual keyword vale é o
+        autômato, pela ordem de prioridade. Um grupo nomeado por keyword
+        devolveria a ocorrência mais à esquerda, não a de maior
+        prioridade ("CHA DE CERVEJA" precisa dar cerveja).
+
+        Returns:
+            re.Pattern | None: Regex compilada ou None se não há keywords.
+        """
+        completas = {}
+        parciais = {}
+        for _, keyword_upper, _, _, palavra_completa, _ in self._keywords_busca:
+            if palavra_completa:
+                completas[keyword_upper] = None
+            else:
+                parciais[keyword_upper] = None
+        
+        padroes = []
+        if completas:
+            padroes.append(rf"(?<![^ ])(?:{_regex_trie(completas)})(?![^ ])")
+        if parciais:
+            padroes.append(_regex_trie(parciais))
+        
+        if not padroes:
+            return None
+        return re.compile("|".join(padroes))
+    
+    def _build_keywords_busca(self) -> List[Tuple[str, str, str, str, bool, str]]:
+        """
+        Achata as keywords em uma lista pronta para identificar_por_nome().
+        
+        Mantém a ordem de prioridade (categoria, depois keyword) e resolve
+        uma única vez o que antes era refeito a cada produto: uppercase da
+        keyword, NCM da categoria, se a busca é por palavra completa e a
+        confiança da identificação (_calcular_confianca só depende da
+        keyword).
+        Categorias sem NCM em CATEGORIA_NCM ficam de fora - nunca geravam
+        identificação.
+        
+        Returns:
+            list: Tuplas (keyword, keyword_upper, categoria, ncm_sugerido,
+                  palavra_completa, confianca) na ordem de busca.
+        """
+        busca = []
+        for categoria, keywords_lista in self.keywords.items():
+            if categoria.startswith("_"):
+                continue
+            ncm_sugerido = CATEGORIA_NCM.get(categoria, "")
+            if not ncm_sugerido:
+                continue
+            for keyword in keywords_lista:
+                keyword_upper = keyword.upper()
+                busca.append((
+                    keyword,
+                    keyword_upper,
+                    categoria,
+                    ncm_sugerido,
+                    keyword_upper in KEYWORDS_PALAVRA_COMPLETA,
+                    self._calcular_confianca(keyword, "")
+                ))
+        return busca
+    
     # =========================================================================
     # NOVO v2.1: SISTEMA DE CACHE INTELIGENTE COM APRENDIZADO
     # =========================================================================
     
+    def _indexar_cache_ia(self) -> None:
+        """
+        Monta os índices da busca flexível do cache de aprendizado.
+        
+        - Autômato de Aho-Corasick com o prefixo de cada chave
+          (CACHE_IA_PREFIXO_INDEXADO caracteres): uma passada pelo nome do
+          produto encontra onde cada chave pode começar
+        - Texto único com as chaves separadas por "\0": um único find()
+          (em C) encontra a primeira chave que contém o nome do produto
+        
+        Os dois guardam a posição de cada chave na ordem do cache, para
+        que buscar_cache_ia() devolva a mesma chave que o laço original
+        (a primeira, na ordem do cache, que atende a alguma das condições).
+        
+        Note:
+            A mesma instância atende várias sessões/threads. Os índices são
+            montados em variáveis locais e publicados de uma vez
+            (_IndiceCacheIA) sob _cache_ia_lock, que também serializa os
+            novos aprendizados: os aprendidos durante a remontagem
+            continuam em _cache_ia_nao_indexadas.
+        """
+        with self._cache_ia_lock:
+            chaves = list(self._cache_ia_upper)
+            automato = AhoCorasick(
+                (chave[:CACHE_IA_PREFIXO_INDEXADO], posicao)
+                for posicao, chave in enumerate(chaves)
+            )
+            
+            inicios = []
+            inicio = 0
+            for chave in chaves:
+                inicios.append(inicio)
+                inicio += len(chave) + 1
+            
+            self._cache_ia_indice = _IndiceCacheIA(
+                chaves, automato, "\0".join(chaves), inicios, max(map(len, chaves), default=0)
+            )
+            # Lista nova (não clear()): quem já percorre a antiga termina nela
+            self._cache_ia_nao_indexadas = []
+    
+    def _buscar_chave_indexada(self, nome_upper: str) -> Optional[str]:
+        """
+        Busca flexível nas chaves já indexadas do cache de aprendizado.
+        
+        Args:
+            nome_upper (str): Nome do produto em maiúsculas, sem espaços
+                nas pontas.
+        
+        Returns:
+            str | None: A primeira chave (na ordem do cache) contida no nome
+            ou que contém o nome; None se nenhuma.
+        """
+        # Uma leitura só: o índice inteiro é trocado de uma vez na remontagem
+        indice = self._cache_ia_indice
+        chaves = indice.chaves
+        if not chaves:
+            return None
+        
+        # Chaves contidas no nome (ex: "CASAL GARCIA" em "VH CASAL GARCIA 750ML"):
+        # o prefixo encontrado diz onde a chave começaria no nome
+        posicao = len(chaves)
+        for inicio, _, candidata in indice.automato.buscar(nome_upper):
+            if candidata < posicao and nome_upper.startswith(chaves[candidata], inicio):
+                posicao = candidata
+        
+        # Chave vazia está contida em qualquer nome (o autômato a ignora)
+        if "" in self._cache_ia_upper and "" in chaves:
+            posicao = min(posicao, chaves.index(""))
+        
+        # Chaves que contêm o nome: a primeira ocorrência no texto unido
+        # está na chave de menor posição. Só interessam chaves antes da já
+        # encontrada e com tamanho para conter o nome, então o find() para
+        # no início dela e nem roda se o nome é maior que todas as chaves
+        if posicao and len(nome_upper) <= indice.maior_chave:
+            limite = indice.inicios[posicao] if posicao < len(chaves) else len(indice.texto)
+            ocorrencia = indice.texto.find(nome_upper, 0, limite)
+            if ocorrencia != -1:
+                posicao = bisect_right(indice.inicios, ocorrencia) - 1
+        
+        return chaves[posicao] if posicao < len(chaves) else None
+    
     def buscar_cache_ia(self, nome_produto: str) -> Optional[Dict[str, Any]]:
         """
         Busca um produto no cache de aprendizado da IA.
@@ -307,32 +768,74 @@ class NCMDatabase:
             ...     print("Cache miss. Precisa consultar IA.")
         
         Note:
-            Esta função é O(n) onde n é o tamanho do cache. Para bases muito
-            grandes (>10.000 produtos), considerar usar índice invertido.
+            A busca flexível não percorre o cache: usa os índices montados
+            por _indexar_cache_ia() (autômato de Aho-Corasick e texto único
+            com as chaves), com custo proporcional ao tamanho do nome. Só os
+            produtos aprendidos desde a última indexação (no máximo
+            CACHE_IA_MAX_NAO_INDEXADOS) são verificados um a um.
         """
-        if not self.cache_ia:
+        dados = self._buscar_cache(nome_produto.upper().strip())
+        if dados is None:
             return None
         
-        nome_upper = nome_produto.upper().strip()
+        resultado = dados.copy()
+        resultado["fonte"] = "cache_ia"
+        return resultado
+    
+    def _buscar_cache(self, nome_upper: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca de buscar_cache_ia() sem copiar o resultado.
+        
+        Args:
+            nome_upper (str): Nome do produto em maiúsculas, sem espaços
+                nas pontas.
+        
+        Returns:
+            dict | None: Os dados guardados no cache (não alterar) ou None.
+        """
+        if not self._cache_ia_upper:
+            return None
+        
+        # Lida antes da busca: uma ausência só é memorizada se nenhum
+        # aprendizado foi salvo enquanto esta busca rodava
+        geracao = self._cache_ia_geracao
         
         # Busca exata primeiro (mais rápido)
-        if nome_upper in self.cache_ia:
-            resultado = self.cache_ia[nome_upper].copy()
-            resultado["fonte"] = "cache_ia"
-            return resultado
+        dados = self._cache_ia_upper.get(nome_upper)
+        if dados is not None:
+            return dados
         
-        # Busca flexível: nome contém chave ou chave contém nome
-        for chave_cache, dados in self.cache_ia.items():
-            chave_upper = chave_cache.upper()
-            
-            # Verifica se nome do produto contém a chave do cache
-            # Ex: "VH BCO POR CASAL GARCIA SWEET 750ML" contém "CASAL GARCIA"
-            if chave_upper in nome_upper or nome_upper in chave_upper:
-                resultado = dados.copy()
-                resultado["fonte"] = "cache_ia"
-                return resultado
+        # Nome já buscado sem resultado (até o próximo aprendizado)
+        with self._cache_ia_lock:
+            if nome_upper in self._cache_ia_ausentes:
+                return None
+        
+        # Muitos produtos aprendidos fora do índice: remonta uma vez só
+        if len(self._cache_ia_nao_indexadas) > CACHE_IA_MAX_NAO_INDEXADOS:
+            self._indexar_cache_ia()
+        
+        # Pendentes lidos antes do índice: se uma remontagem publicar no
+        # meio, o índice novo cobre os pendentes antigos (o contrário, índice
+        # antigo com a lista já zerada, perderia chaves)
+        pendentes = self._cache_ia_nao_indexadas
         
-        return None
+        # Busca flexível: nome contém chave ou chave contém nome
+        # Ex: "VH BCO POR CASAL GARCIA SWEET 750ML" contém "CASAL GARCIA"
+        chave_upper = self._buscar_chave_indexada(nome_upper)
+        
+        # Aprendidos depois da indexação vêm depois na ordem do cache
+        if chave_upper is None:
+            for chave_nova in pendentes:
+                if chave_nova in nome_upper or nome_upper in chave_nova:
+                    chave_upper = chave_nova
+                    break
+        
+        if chave_upper is None:
+            with self._cache_ia_lock:
+                if geracao == self._cache_ia_geracao and len(self._cache_ia_ausentes) < MAX_CACHE_IA_AUSENTES:
+                    self._cache_ia_ausentes.add(nome_upper)
+            return None
+        return self._cache_ia_upper[chave_upper]
     
     def salvar_aprendizado_ia(
         self, 
@@ -379,38 +882,108 @@ class NCMDatabase:
         Note:
             - O nome do produto é normalizado (uppercase, sem espaços extras)
             - Produtos já existentes no cache são atualizados
-            - O arquivo JSON é reescrito a cada salvamento
+            - O aprendizado é anexado em uma linha de aprendizado_path; o
+              JSON principal é reescrito a cada APRENDIZADOS_POR_CONSOLIDACAO
+              salvamentos e ao final do programa (consolidar_aprendizado)
         """
+        return self.salvar_aprendizados_ia(
+            [(nome_produto, is_monofasico, ncm_sugerido, motivo)]
+        )
+    
+    def salvar_aprendizados_ia(
+        self,
+        aprendizados: List[Tuple[str, bool, str, str]]
+    ) -> bool:
+        """
+        Salva de uma vez os resultados de várias consultas à IA.
+        
+        Mesmo efeito de chamar salvar_aprendizado_ia() para cada resultado,
+        na ordem, mas o lote inteiro custa uma escrita e um flush no
+        arquivo de aprendizado (em vez de um por produto), uma limpeza da
+        memória de verificações e no máximo uma consolidação. Usado depois
+        de FiscalAuditorAgent.analyze_batch, que devolve todas as respostas
+        juntas.
+        
+        Args:
+            aprendizados (List[Tuple[str, bool, str, str]]): Tuplas
+                (nome_produto, is_monofasico, ncm_sugerido, motivo).
+        
+        Returns:
+            bool: True se salvou com sucesso, False se erro
+        
+        Example:
+            >>> db.salvar_aprendizados_ia([
+            ...     ("VINHO TINTO SECO 750ML", False, "22042100", "Wine"),
+            ...     ("CERVEJA ARTESANAL IPA", True, "22030000", "Beer"),
+            ... ])
+            True
+        """
+        if not aprendizados:
+            return True
+        
         try:
-            nome_normalizado = nome_produto.upper().strip()
-            
-            # Prepara os dados do aprendizado
-            dados_aprendizado = {
-                "is_monofasico": is_monofasico,
-                "ncm_sugerido": ncm_sugerido,
-                "motivo": motivo,
-                "data_aprendizado": datetime.now().isoformat()
-            }
+            data_aprendizado = datetime.now().isoformat()
+            novos = []
+            linhas = []
+            for nome_produto, is_monofasico, ncm_sugerido, motivo in aprendizados:
+                nome_normalizado = sys.intern(nome_produto.upper().strip())
+                
+                # Prepara os dados do aprendizado
+                dados_aprendizado = {
+                    "is_monofasico": is_monofasico,
+                    "ncm_sugerido": ncm_sugerido,
+                    "motivo": motivo,
+                    "data_aprendizado": data_aprendizado
+                }
+                
+                novos.append((nome_normalizado, dados_aprendizado))
+                linhas.append(json.dumps({"nome": nome_normalizado, **dados_aprendizado}, ensure_ascii=False))
             
-            # Atualiza cache em memória
-            self.cache_ia[nome_normalizado] = dados_aprendizado
+            # Atualiza cache em memória (produto novo fica fora do índice
+            # da busca flexível até a próxima indexação). Sob o lock: a
+            # remontagem do índice lê _cache_ia_upper inteiro
+            with self._cache_ia_lock:
+                for nome_normalizado, dados_aprendizado in novos:
+                    if nome_normalizado not in self._cache_ia_upper:
+                        self._cache_ia_nao_indexadas.append(nome_normalizado)
+                    self._cache_ia_upper[nome_normalizado] = dados_aprendizado
+                # Ausências anteriores podem ter deixado de valer; a nova
+                # geração impede que uma busca já em andamento (que não viu
+                # estes aprendizados) volte a memorizar a sua
+                self._cache_ia_geracao += 1
+                self._cache_ia_ausentes.clear()
             
-            # Prepara estrutura para salvar no JSON
-            if "_aprendizado_ia" not in self.data:
-                self.data["_aprendizado_ia"] = {
-                    "_comentario": "Cache de respostas da IA - Gerado automaticamente pelo sistema",
-                    "_total_economizado": 0,
-                    "produtos": {}
-                }
+            # Os novos aprendizados podem mudar o resultado de produtos já
+            # verificados (ex: antes "não encontrado", agora "cache_ia").
+            # Vale para qualquer nome que contenha um novo, não só para ele
+            with self._memoria_lock:
+                self._verificacoes.clear()
             
-            # Adiciona produto ao cache
-            self.data["_aprendizado_ia"]["produtos"][nome_normalizado] = dados_aprendizado
+            # Anexa só estes aprendizados (uma linha cada); o JSON inteiro é
+            # reescrito de tempos em tempos
+            with self._arquivo_lock:
+                # cache_ia é a própria seção de produtos do JSON: não muda
+                # enquanto consolidar_aprendizado() grava self.data
+                produtos = self._secao_aprendizado()["produtos"]
+                for nome_normalizado, dados_aprendizado in novos:
+                    self.cache_ia[nome_normalizado] = dados_aprendizado
+                    produtos[nome_normalizado] = dados_aprendizado
+                # O arquivo fica aberto entre aprendizados: cada lote custa
+                # uma escrita, sem abrir/fechar. flush() garante as linhas no
+                # disco caso o processo seja encerrado à força
+                if self._aprendizado_arquivo is None:
+                    self._aprendizado_arquivo = open(self.aprendizado_path, 'a', encoding='utf-8')
+                self._aprendizado_arquivo.write("\n".join(linhas) + "\n")
+                self._aprendizado_arquivo.flush()
+                self._aprendizados_pendentes += len(linhas)
+                consolidar = self._aprendizados_pendentes >= APRENDIZADOS_POR_CONSOLIDACAO
             
-            # Salva no arquivo JSON
-            with open(self.json_path, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=4)
+            if consolidar:
+                self.consolidar_aprendizado()
             
-            print(Fore.CYAN + f"   🧠 Aprendizado salvo: {nome_produto[:30]}...")
+            if self.verbose:
+                for nome_produto, _, _, _ in aprendizados:
+                    print(Fore.CYAN + f"   🧠 Aprendizado salvo: {nome_produto[:30]}...")
             
             return True
             
@@ -424,20 +997,97 @@ class NCMDatabase:
         
         Chamado toda vez que um produto é encontrado no cache,
         evitando uma chamada à IA.
+        
+        O contador só muda em memória; vai para o arquivo na próxima
+        consolidação (consolidar_aprendizado).
+        
+        Fica no caminho de todo acerto de cache: só uma busca da seção e
+        nenhuma E/S.
         """
-        try:
-            if "_aprendizado_ia" not in self.data:
-                return
-            
-            self.data["_aprendizado_ia"]["_total_economizado"] = \
-                self.data["_aprendizado_ia"].get("_total_economizado", 0) + 1
+        secao = self.data.get("_aprendizado_ia")
+        if secao is None:
+            return
+        
+        secao["_total_economizado"] = secao.get("_total_economizado", 0) + 1
+        self._economia_pendente = True
+    
+    def _serializar_banco(self) -> str:
+        """
+        Gera o texto do JSON principal para consolidar_aprendizado().
+        
+        As seções editadas à mão (NCMs, keywords, metadata) continuam com
+        indent=4. Os produtos aprendidos pela IA, que são gerados pelo
+        sistema e crescem a cada análise, ficam um por linha e compactos:
+        a seção ocupa ~40% menos e cada produto é serializado pelo
+        codificador em C do json (com indent, o json usa o codificador
+        em Python).
+        
+        Returns:
+            str: Conteúdo completo do JSON, equivalente a self.data.
+        """
+        secao = self.data.get("_aprendizado_ia")
+        if not isinstance(secao, dict) or not secao.get("produtos"):
+            return json.dumps(self.data, ensure_ascii=False, indent=4)
+        
+        # Marcador no lugar dos produtos, trocado depois pelas linhas compactas
+        marcador = "__PRODUTOS_APRENDIDOS__"
+        dados = dict(self.data)
+        dados["_aprendizado_ia"] = {**secao, "produtos": marcador}
+        texto = json.dumps(dados, ensure_ascii=False, indent=4)
+        
+        codificar = json.JSONEncoder(ensure_ascii=False).encode
+        linhas = ",\n".join(
+            f"            {codificar(nome)}: {codificar(produto)}"
+            for nome, produto in secao["produtos"].items()
+        )
+        return texto.replace(f'"{marcador}"', "{\n" + linhas + "\n        }", 1)
+    
+    def consolidar_aprendizado(self) -> bool:
+        """
+        Grava no JSON principal os aprendizados e a economia pendentes.
+        
+        Reescreve o JSON inteiro (em um arquivo temporário, depois
+        renomeado, para nunca deixar o JSON pela metade) e apaga o arquivo
+        de aprendizados anexados. Sem nada pendente, não faz nada.
+        
+        Chamado automaticamente a cada APRENDIZADOS_POR_CONSOLIDACAO
+        aprendizados e ao final do programa (atexit).
+        
+        Returns:
+            bool: True se não havia pendências ou se gravou com sucesso,
+                  False se erro
+        
+        Example:
+            >>> db.salvar_aprendizado_ia("VINHO TINTO", False, "22042100", "Wine")
+            >>> db.consolidar_aprendizado()  # Grava agora, sem esperar
+            True
+        """
+        with self._arquivo_lock:
+            if not self._aprendizados_pendentes and not self._economia_pendente:
+                return True
             
-            # Salva no arquivo
-            with open(self.json_path, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=4)
+            try:
+                # Fecha antes de apagar: escrever num arquivo já apagado
+                # perderia os próximos aprendizados
+                if self._aprendizado_arquivo is not None:
+                    self._aprendizado_arquivo.close()
+                    self._aprendizado_arquivo = None
+                
+                temporario = self.json_path + ".tmp"
+                with open(temporario, 'w', encoding='utf-8') as f:
+                    f.write(self._serializar_banco())
+                os.replace(temporario, self.json_path)
+                
+                if os.path.exists(self.aprendizado_path):
+                    os.remove(self.aprendizado_path)
                 
-        except Exception:
-            pass  # Não é crítico
+                self._aprendizados_pendentes = 0
+                self._economia_pendente = False
+                return True
+                
+            except OSError as e:
+                print(Fore.RED + f"   ❌ Erro ao consolidar aprendizado: {e}")
+                return False
     
     def get_estatisticas_cache(self) -> Dict[str, Any]:
         """
@@ -496,20 +1146,30 @@ class NCMDatabase:
             >>> db.is_monofasico("12345678")
             False
         """
-        # Remove pontos e espaços
-        ncm_limpo = ncm.replace(".", "").replace(" ", "").strip()
+        return self._ncm_monofasico(_limpar_ncm(ncm))
+    
+    def _ncm_monofasico(self, ncm_limpo: str) -> bool:
+        """
+        is_monofasico() para um NCM já sem pontos e espaços.
         
-        # Busca exata
-        if ncm_limpo in self.ncm_lista:
-            return True
+        Args:
+            ncm_limpo (str): Código NCM limpo
         
-        # Busca por prefixo (4 primeiros dígitos)
-        prefixo = ncm_limpo[:4]
-        for ncm_cadastrado in self.ncm_lista:
-            if ncm_cadastrado.startswith(prefixo):
-                return True
+        Returns:
+            bool: True se o NCM é monofásico
         
-        return False
+        Note:
+            A regra de prefixo olha sempre os mesmos 4 dígitos, então os
+            prefixos possíveis cabem num conjunto (_ncm_prefixos): duas
+            consultas de hash, sem árvore de prefixos nem laço pela lista.
+        """
+        # Busca exata (conjunto pré-calculado, O(1))
+        if ncm_limpo in self._ncm_set:
+            return True
+        
+        # Busca por prefixo (4 primeiros dígitos, ou o NCM inteiro se for
+        # mais curto): algum NCM da lista começa com ele?
+        return ncm_limpo[:4] in self._ncm_prefixos
     
     def get_descricao(self, ncm: str) -> str:
         """
@@ -521,18 +1181,21 @@ class NCMDatabase:
         Returns:
             str: Descrição do NCM ou string vazia se não encontrado
         """
-        ncm_limpo = ncm.replace(".", "").replace(" ", "").strip()
-        
-        # Busca direta
-        if ncm_limpo in self.ncm_detalhes:
-            return self.ncm_detalhes[ncm_limpo].get("descricao", "")
+        return self._descricao_ncm(_limpar_ncm(ncm))
+    
+    def _descricao_ncm(self, ncm_limpo: str) -> str:
+        """
+        get_descricao() para um NCM já sem pontos e espaços.
         
-        # Busca por prefixo
-        for ncm_key, info in self.ncm_detalhes.items():
-            if info.get("ncm_base") == ncm_limpo:
-                return info.get("descricao", "")
+        Args:
+            ncm_limpo (str): Código NCM limpo
         
-        return ""
+        Returns:
+            str: Descrição do NCM ou string vazia se não encontrado
+        """
+        # Busca direta ou pelo NCM sem sufixo (ex: "22029900" encontra
+        # "22029900_EX01"), as duas no mesmo índice
+        return self._descricoes.get(ncm_limpo, "")
     
     def get_base_legal(self) -> str:
         """
@@ -576,68 +1239,108 @@ class NCMDatabase:
                 'confianca': 'alta',
                 'keyword_encontrada': 'HEINEKEN'
             }
+
+        Note:
+            A comparação é exata (a keyword precisa aparecer no nome), não
+            por similaridade: nomes de NF-e são abreviados ("CERV", "REFRIG")
+            e uma pontuação aproximada aceitaria produtos parecidos que não
+            são monofásicos ("CHA" em "CHANDON", "COCA" em "COCADA"). A
+            busca é uma passada do autômato sobre o nome, sem laço em Python
+            por keyword, então não há ganho em trocá-la por um pontuador.
+
+            O nome só passa por upper(), sem remover acentos: as keywords
+            acentuadas já vêm nas duas grafias ("AGUA"/"ÁGUA", "CHA"/"CHÁ"),
+            e upper() em nomes ASCII é cerca de 10x mais rápido que um
+            str.translate() com tabela de acentos.
         """
-        nome_upper = nome_produto.upper()
+        busca = self._identificar_keyword(nome_produto.upper())
+        if busca is None:
+            return None
         
-        # Mapeamento de categoria -> NCM sugerido
-        categoria_ncm = {
-            "cerveja": "22030000",
-            "refrigerante": "22021000",
-            "agua": "22011000",
-            "energetico": "22029900",
-            "isotonico": "22029900",
-            "cha_pronto": "22029900",
-            "suco_pronto": "22029900",
-            "cerveja_sem_alcool": "22029100"
+        keyword, _, categoria, ncm_sugerido, _, confianca = busca
+        return {
+            "categoria": categoria,
+            "ncm_sugerido": ncm_sugerido,
+            "descricao": self._descricao_ncm(ncm_sugerido),
+            "confianca": confianca,
+            "keyword_encontrada": keyword,
+            "base_legal": self.get_base_legal()
         }
+    
+    def _identificar_keyword(self, nome_upper: str) -> Optional[Tuple[str, str, str, str, bool, str]]:
+        """
+        Encontra a keyword de maior prioridade presente no nome.
         
-        # Keywords que devem ser buscadas como palavra completa (evita falsos positivos)
-        # Ex: "CHA" não deve bater em "CHANDON"
-        keywords_palavra_completa = ["CHA", "CHÁ", "ALE", "ZERO"]
+        Args:
+            nome_upper (str): Nome do produto em maiúsculas
         
-        # Busca em cada categoria
-        for categoria, keywords_lista in self.keywords.items():
-            # Ignora campos de comentário
-            if categoria.startswith("_"):
+        Returns:
+            tuple | None: Entrada de _keywords_busca (keyword, keyword_upper,
+            categoria, ncm_sugerido, palavra_completa, confianca) ou None.
+        
+        Note:
+            O resultado (inclusive None) fica em memória por nome, até
+            MAX_IDENTIFICACOES_MEMORIA nomes, descartando o usado há mais
+            tempo. As keywords não mudam depois da carga (a IA aprende no
+            cache, não nas keywords), então a memória nunca é invalidada.
+            A memória é acessada sob _memoria_lock (a mesma instância
+            atende várias sessões do Streamlit); a busca em si roda fora
+            dele.
+        """
+        identificacoes = self._identificacoes
+        with self._memoria_lock:
+            if nome_upper in identificacoes:
+                identificacoes.move_to_end(nome_upper)
+                return identificacoes[nome_upper]
+        
+        busca = self._buscar_keyword(nome_upper)
+        with self._memoria_lock:
+            if len(identificacoes) >= MAX_IDENTIFICACOES_MEMORIA:
+                identificacoes.popitem(last=False)
+            identificacoes[nome_upper] = busca
+        return busca
+    
+    def _buscar_keyword(self, nome_upper: str) -> Optional[Tuple[str, str, str, str, bool, str]]:
+        """
+        _identificar_keyword() sem consultar a memória.
+        
+        Args:
+            nome_upper (str): Nome do produto em maiúsculas
+        
+        Returns:
+            tuple | None: Entrada de _keywords_busca ou None.
+        """
+        if not self._keywords_montadas:
+            self._montar_busca_keywords()
+        
+        # Pré-filtro: se nenhuma keyword aparece no nome, não há o que buscar
+        if self._keyword_regex is None:
+            return None
+        primeira = self._keyword_regex.search(nome_upper)
+        if primeira is None:
+            return None
+        
+        # Uma passada pelo nome encontra todas as keywords presentes; vale a
+        # de menor posição (ordem de prioridade: categoria, depois keyword).
+        # A regex tem as mesmas regras de palavra completa do autômato e
+        # acha a ocorrência válida mais à esquerda: antes dela não há
+        # keyword, e o autômato começa ali
+        encontrada = len(self._keywords_busca)
+        for inicio, fim, posicao in self._keywords_automato.buscar(nome_upper, primeira.start()):
+            if posicao >= encontrada:
                 continue
-            
-            for keyword in keywords_lista:
-                keyword_upper = keyword.upper()
-                
-                # Para keywords curtas/ambíguas, busca palavra completa
-                if keyword_upper in keywords_palavra_completa:
-                    # Adiciona espaços para garantir palavra completa
-                    # " CHA " encontra "CHA GELADO" mas não "CHANDON"
-                    nome_com_espacos = f" {nome_upper} "
-                    keyword_com_espacos = f" {keyword_upper} "
-                    
-                    if keyword_com_espacos in nome_com_espacos:
-                        ncm_sugerido = categoria_ncm.get(categoria, "")
-                        if ncm_sugerido:
-                            return {
-                                "categoria": categoria,
-                                "ncm_sugerido": ncm_sugerido,
-                                "descricao": self.get_descricao(ncm_sugerido),
-                                "confianca": self._calcular_confianca(keyword, nome_produto),
-                                "keyword_encontrada": keyword,
-                                "base_legal": self.get_base_legal()
-                            }
-                else:
-                    # Busca normal (substring)
-                    if keyword_upper in nome_upper:
-                        ncm_sugerido = categoria_ncm.get(categoria, "")
-                        
-                        if ncm_sugerido:
-                            return {
-                                "categoria": categoria,
-                                "ncm_sugerido": ncm_sugerido,
-                                "descricao": self.get_descricao(ncm_sugerido),
-                                "confianca": self._calcular_confianca(keyword, nome_produto),
-                                "keyword_encontrada": keyword,
-                                "base_legal": self.get_base_legal()
-                            }
-        
-        return None
+            # Para keywords curtas/ambíguas, só vale palavra completa
+            # (delimitada por espaço): "CHA GELADO" sim, "CHANDON" não
+            if self._keywords_busca[posicao][4] and not (
+                (inicio == 0 or nome_upper[inicio - 1] == " ")
+                and (fim == len(nome_upper) or nome_upper[fim] == " ")
+            ):
+                continue
+            encontrada = posicao
+        
+        if encontrada == len(self._keywords_busca):
+            return None
+        return self._keywords_busca[encontrada]
     
     def _calcular_confianca(self, keyword: str, nome_produto: str) -> str:
         """
@@ -650,24 +1353,11 @@ class NCMDatabase:
         Returns:
             str: "alta", "media" ou "baixa"
         """
-        # Keywords muito específicas = alta confiança
-        keywords_alta = [
-            "HEINEKEN", "BRAHMA", "SKOL", "ANTARCTICA", "BUDWEISER",
-            "COCA-COLA", "COCA", "PEPSI", "FANTA", "SPRITE",
-            "RED BULL", "MONSTER", "GATORADE", "POWERADE"
-        ]
-        
-        # Keywords genéricas = média confiança
-        keywords_media = [
-            "CERVEJA", "REFRIGERANTE", "AGUA", "ÁGUA", "SUCO",
-            "ENERGETICO", "ISOTONICO", "CHÁ"
-        ]
-        
         keyword_upper = keyword.upper()
         
-        if keyword_upper in keywords_alta:
+        if keyword_upper in KEYWORDS_CONFIANCA_ALTA:
             return "alta"
-        elif keyword_upper in keywords_media:
+        elif keyword_upper in KEYWORDS_CONFIANCA_MEDIA:
             return "media"
         else:
             return "baixa"
@@ -712,57 +1402,145 @@ class NCMDatabase:
                 'descricao': 'Cervejas de malte',
                 'confianca': 'alta'
             }
+        
+        Note:
+            O resultado fica em memória por (NCM, nome em maiúsculas), então
+            o mesmo produto repetido em várias notas só é verificado uma vez.
+            Guarda até MAX_VERIFICACOES_MEMORIA pares, descartando o usado
+            há mais tempo. A memória é limpa a cada salvar_aprendizado_ia()
+            (o que a IA aprende pode mudar o resultado). Acertos no
+            cache de IA continuam contando em incrementar_economia().
+            Leitura, reordenação, descarte e limpeza da memória rodam sob
+            _memoria_lock (instância compartilhada entre sessões).
         """
-        ncm_limpo = ncm.replace(".", "").replace(" ", "").strip()
-        resultado = {
-            "is_monofasico": False,
-            "ncm_correto": ncm_limpo,
-            "ncm_atual_correto": True,
-            "fonte": "",
-            "descricao": "",
-            "base_legal": self.get_base_legal(),
-            "confianca": "alta"
-        }
+        ncm_limpo = _limpar_ncm(ncm)
+        nome_upper = nome_produto.upper()
+        chave = (ncm_limpo, nome_upper)
+        
+        verificacoes = self._verificacoes
+        with self._memoria_lock:
+            resultado = verificacoes.get(chave)
+            if resultado is not None:
+                verificacoes.move_to_end(chave)
+        if resultado is not None:
+            if resultado["fonte"] == "cache_ia":
+                self.incrementar_economia()
+            return resultado.copy()
+        
+        resultado = self._verificar_item(ncm_limpo, nome_upper)
+        with self._memoria_lock:
+            if len(verificacoes) >= MAX_VERIFICACOES_MEMORIA:
+                verificacoes.popitem(last=False)
+            verificacoes[chave] = resultado.copy()
+        return resultado
+    
+    def verificar_itens(self, itens: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Verifica vários itens de uma vez (ex: todos os itens de uma nota).
+        
+        Mesmo resultado de chamar verificar_item() para cada par, na mesma
+        ordem. Produtos repetidos na lista (ou já vistos antes) saem da
+        memória de verificar_item() sem refazer as buscas.
+        
+        Args:
+            itens (List[Tuple[str, str]]): Pares (ncm, nome_produto).
+        
+        Returns:
+            List[dict]: Um resultado por item (ver verificar_item); cada
+            dicionário é uma cópia independente.
+        
+        Example:
+            >>> resultados = db.verificar_itens([
+            ...     ("99999999", "HEINEKEN 355ML"),
+            ...     ("22021000", "REFRIGERANTE FANTA"),
+            ... ])
+            >>> [r["fonte"] for r in resultados]
+            ['identificacao_nome', 'banco_dados']
+        
+        Note:
+            Não há versão vetorizada (NumPy): a etapa 1 já é uma busca em
+            conjunto, as keywords já são uma única regex, e o produto
+            repetido sai da memória em menos de 0,5 µs. E os itens de uma
+            auditoria precisam ser verificados em ordem: o que a IA
+            aprende com um item muda o resultado dos seguintes.
+        """
+        verificar = self.verificar_item
+        return [verificar(ncm, nome_produto) for ncm, nome_produto in itens]
+    
+    def _verificar_item(self, ncm_limpo: str, nome_upper: str) -> Dict[str, Any]:
+        """
+        Executa as etapas de verificar_item() sem consultar a memória.
+        
+        O NCM e o nome chegam já normalizados e cada etapa usa as buscas
+        internas (_ncm_monofasico, _identificar_keyword, _buscar_cache),
+        que não limpam o NCM de novo nem montam dicionários intermediários:
+        o único dicionário criado é o resultado.
+        
+        Args:
+            ncm_limpo (str): NCM atual, já sem pontos e espaços
+            nome_upper (str): Nome/descrição do produto em maiúsculas
+        
+        Returns:
+            dict: Resultado da verificação (ver verificar_item)
+        """
+        base_legal = self.get_base_legal()
         
         # ETAPA 1: Verifica se o NCM atual já é monofásico
-        if self.is_monofasico(ncm_limpo):
-            resultado["is_monofasico"] = True
-            resultado["ncm_correto"] = ncm_limpo
-            resultado["fonte"] = "banco_dados"
-            resultado["descricao"] = self.get_descricao(ncm_limpo)
-            return resultado
+        if self._ncm_monofasico(ncm_limpo):
+            return {
+                "is_monofasico": True,
+                "ncm_correto": ncm_limpo,
+                "ncm_atual_correto": True,
+                "fonte": "banco_dados",
+                "descricao": self._descricao_ncm(ncm_limpo),
+                "base_legal": base_legal,
+                "confianca": "alta"
+            }
         
         # ETAPA 2: Se NCM não é monofásico, tenta identificar pelo nome
-        identificacao = self.identificar_por_nome(nome_produto)
-        
-        if identificacao:
-            resultado["is_monofasico"] = True
-            resultado["ncm_correto"] = identificacao["ncm_sugerido"]
-            resultado["ncm_atual_correto"] = False  # NCM atual está ERRADO
-            resultado["fonte"] = "identificacao_nome"
-            resultado["descricao"] = identificacao["descricao"]
-            resultado["confianca"] = identificacao["confianca"]
-            resultado["keyword_encontrada"] = identificacao["keyword_encontrada"]
-            return resultado
+        busca = self._identificar_keyword(nome_upper)
+        
+        if busca is not None:
+            keyword, _, _, ncm_sugerido, _, confianca = busca
+            return {
+                "is_monofasico": True,
+                "ncm_correto": ncm_sugerido,
+                "ncm_atual_correto": False,  # NCM atual está ERRADO
+                "fonte": "identificacao_nome",
+                "descricao": self._descricao_ncm(ncm_sugerido),
+                "base_legal": base_legal,
+                "confianca": confianca,
+                "keyword_encontrada": keyword
+            }
         
         # ETAPA 3 (NOVO v2.1): Busca no cache de aprendizado da IA
-        cache = self.buscar_cache_ia(nome_produto)
+        cache = self._buscar_cache(nome_upper.strip())
         
-        if cache:
+        if cache is not None:
             # Incrementa contador de economia
             self.incrementar_economia()
             
-            resultado["is_monofasico"] = cache["is_monofasico"]
-            resultado["ncm_correto"] = cache["ncm_sugerido"]
-            resultado["ncm_atual_correto"] = (ncm_limpo == cache["ncm_sugerido"])
-            resultado["fonte"] = "cache_ia"
-            resultado["descricao"] = cache.get("motivo", "")
-            resultado["confianca"] = "alta"  # Cache é confiável (veio da IA)
-            return resultado
+            return {
+                "is_monofasico": cache["is_monofasico"],
+                "ncm_correto": cache["ncm_sugerido"],
+                "ncm_atual_correto": (ncm_limpo == cache["ncm_sugerido"]),
+                "fonte": "cache_ia",
+                "descricao": cache.get("motivo", ""),
+                "base_legal": base_legal,
+                "confianca": "alta"  # Cache é confiável (veio da IA)
+            }
         
         # Não encontrou em nenhum lugar
         # main.py vai consultar a IA e depois chamar salvar_aprendizado_ia()
-        return resultado
+        return {
+            "is_monofasico": False,
+            "ncm_correto": ncm_limpo,
+            "ncm_atual_correto": True,
+            "fonte": "",
+            "descricao": "",
+            "base_legal": base_legal,
+            "confianca": "alta"
+        }
     
     def get_estatisticas(self) -> Dict[str, Any]:
         """
@@ -794,6 +1572,52 @@ class NCMDatabase:
         }
 
 
+# Instâncias vivas, consolidadas ao final do programa. Referências fracas:
+# registrar o método de cada instância no atexit a manteria viva até sair
+_INSTANCIAS = weakref.WeakSet()
+
+
+@atexit.register
+def _consolidar_instancias() -> None:
+    """Consolida os aprendizados pendentes das instâncias ainda vivas (atexit)."""
+    for instancia in list(_INSTANCIAS):
+        instancia.consolidar_aprendizado()
+
+
+@lru_cache(maxsize=None)
+def _ncm_database_compartilhado(json_path_absoluto: str) -> NCMDatabase:
+    """Constrói o NCMDatabase de um caminho já absoluto (memória de get_ncm_database)."""
+    return NCMDatabase(json_path_absoluto)
+
+
+def get_ncm_database(json_path: str) -> NCMDatabase:
+    """
+    Retorna o NCMDatabase do arquivo, construído uma única vez por processo.
+    
+    A carga (JSON, conjuntos de NCMs, índices do cache de IA) fica para a
+    primeira chamada; as seguintes, com o mesmo arquivo (por qualquer
+    caminho relativo ou absoluto), devolvem a mesma instância. Além do
+    tempo, evita duas instâncias gravando aprendizados no mesmo
+    "<json>.learn.jsonl", cada uma com sua contagem de pendentes.
+    
+    Args:
+        json_path (str): Caminho para o arquivo ncm_rules.json
+    
+    Returns:
+        NCMDatabase: Instância compartilhada para o arquivo.
+    
+    Example:
+        >>> db = get_ncm_database("src/database/ncm_rules.json")
+        >>> db is get_ncm_database(os.path.abspath("src/database/ncm_rules.json"))
+        True
+    
+    Note:
+        Quem precisa de uma instância isolada (ex: testes que gravam em
+        uma cópia do JSON) continua usando NCMDatabase(json_path).
+    """
+    return _ncm_database_compartilhado(os.path.abspath(json_path))
+
+
 # =============================================================================
 # EXEMPLO DE USO
 # =============================================================================
@@ -38,26 +38,40 @@ Licença: MIT
 # =============================================================================
 # IMPORTS
 # =============================================================================
+import logging
 import os
 import sys
-from colorama import Fore, init
-from dotenv import load_dotenv
+from collections import Counter
+from colorama import Fore, Style, init
 
 # Adiciona o diretório pai ao path para imports funcionarem
 # Isso permite rodar tanto "python run.py" da raiz quanto "python main.py" de src/
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Módulos Internos do Projeto
-from src.core.parser import NFeParser
-from src.core.ncm_database import NCMDatabase
-from src.utils.exporter import ReportGenerator
-from src.agents.auditor import FiscalAuditorAgent
+from src.core.parser import ItemNFe, iter_xml_files
+from src.core.ncm_database import NCMDatabase, get_ncm_database
+from src.utils.exporter import ErroRecuperavel, ReportGenerator
+from src.agents.auditor import FiscalAuditorAgent, resultado_com_erro
 
 # =============================================================================
 # INICIALIZAÇÃO
 # =============================================================================
 init(autoreset=True)
-load_dotenv()
+
+# Progresso do agente de IA (mensagens INFO do módulo auditor) no terminal
+logger_ia = logging.getLogger("src.agents.auditor")
+logger_ia.setLevel(logging.INFO)
+logger_ia.addHandler(logging.StreamHandler(sys.stdout))
+
+# Erros de leitura dos XMLs (módulo parser), no terminal junto com o resto
+logger_parser = logging.getLogger("src.core.parser")
+logger_parser.addHandler(logging.StreamHandler(sys.stdout))
+
+# O .env só é lido se a chave ainda não estiver no ambiente
+if "OPENAI_API_KEY" not in os.environ:
+    from dotenv import load_dotenv
+    load_dotenv()
 
 # =============================================================================
 # CONSTANTES DE CONFIGURAÇÃO
@@ -69,10 +83,23 @@ INPUT_DIR = "input_xmls"
 # Diretório para relatórios de saída
 OUTPUT_DIR = "output_reports"
 
+# Cache dos itens já extraídos de cada XML (reexecuções sobre a mesma
+# pasta não parseiam de novo os arquivos que não mudaram)
+PARSER_CACHE_DIR = os.path.join(".cache", "parser")
+
 # Caminho para o banco de dados JSON de NCMs monofásicos
 # Usa caminho relativo ao arquivo para funcionar de qualquer diretório
 DB_PATH = os.path.join(os.path.dirname(__file__), "database", "ncm_rules.json")
 
+# Rótulos da coluna "Auditoria Feita Por" (origem_analise) e confiança das
+# identificações da IA. Um conjunto fechado de valores: todos os registros
+# apontam para estas mesmas strings, nenhuma é montada por item
+ORIGEM_BANCO_DADOS = "Banco de Dados"
+ORIGEM_CACHE_IA = "Cache IA (Aprendizado)"
+ORIGEM_KEYWORDS = "Identificação por Nome"
+ORIGEM_IA = "Agente IA"
+CONFIANCA_IA = "media"
+
 
 # =============================================================================
 # FUNÇÕES AUXILIARES
@@ -93,10 +120,44 @@ def print_summary(total_recuperavel: float, stats: dict) -> None:
     
     if stats:
         print(Fore.CYAN + "\n📊 Estatísticas da Análise:")
-        print(Fore.WHITE + f"   • Identificados por Banco de Dados: {stats.get('banco_dados', 0)}")
-        print(Fore.WHITE + f"   • Identificados por Keywords: {stats.get('keywords', 0)}")
-        print(Fore.WHITE + f"   • Identificados por IA: {stats.get('ia', 0)}")
-        print(Fore.WHITE + f"   • Chamadas de IA economizadas: {stats.get('ia_economizada', 0)}")
+        print(Fore.WHITE + f"   • Identificados por Banco de Dados: {stats['banco_dados']}")
+        print(Fore.WHITE + f"   • Identificados por Keywords: {stats['keywords']}")
+        print(Fore.WHITE + f"   • Identificados por IA: {stats['ia']}")
+        print(Fore.WHITE + f"   • Chamadas de IA economizadas: {stats['ia_economizada']}")
+
+
+def _emitir(log: list | None, mensagem: str) -> None:
+    """
+    Registra uma mensagem por item: no buffer do arquivo, ou direto na tela.
+    
+    Args:
+        log (list | None): Buffer de mensagens do arquivo em análise (ver
+            _descarregar_log). None imprime na hora.
+        mensagem (str): Linha a exibir (com as cores do colorama).
+    """
+    if log is None:
+        print(mensagem)
+    else:
+        log.append(mensagem)
+
+
+def _descarregar_log(log: list, quiet: bool = False) -> None:
+    """
+    Escreve as mensagens acumuladas de uma vez e esvazia o buffer.
+    
+    Um print() por mensagem é uma escrita (e uma chamada de sistema) por
+    linha; juntas, as linhas de um arquivo saem em uma única escrita.
+    Cada linha termina com Style.RESET_ALL, como o autoreset do colorama
+    faria a cada print, para a cor de uma não passar para a seguinte.
+    
+    Args:
+        log (list): Buffer de mensagens (ver _emitir).
+        quiet (bool): Se True, descarta as mensagens sem exibir.
+    """
+    if log and not quiet:
+        sys.stdout.write("".join(mensagem + Style.RESET_ALL + "\n" for mensagem in log))
+        sys.stdout.flush()
+    log.clear()
 
 
 def initialize_ai_agent() -> FiscalAuditorAgent | None:
@@ -117,11 +178,13 @@ def initialize_ai_agent() -> FiscalAuditorAgent | None:
 
 
 def analyze_item(
-    item: dict,
+    item: ItemNFe,
     ncm_db: NCMDatabase,
     ia_auditor: FiscalAuditorAgent | None,
-    stats: dict
-) -> dict | None:
+    stats: dict,
+    pendentes_ia: list | None = None,
+    log: list | None = None
+) -> ErroRecuperavel | None:
     """
     Analisa um item da nota fiscal para verificar se há imposto recuperável.
     
@@ -131,66 +194,75 @@ def analyze_item(
         3. Inteligência Artificial - PAGO e LENTO (último recurso)
     
     Args:
-        item (dict): Dados do item da NF-e
+        item (ItemNFe): Dados do item da NF-e
         ncm_db (NCMDatabase): Banco de dados de NCMs
         ia_auditor (FiscalAuditorAgent | None): Agente de IA ou None
         stats (dict): Dicionário para acumular estatísticas
+        pendentes_ia (list | None): Se informado, itens que precisariam da
+            IA são adicionados aqui em vez de consultados na hora (ver
+            analyze_pending_ia para a consulta em lote).
+        log (list | None): Buffer das mensagens do item (ver _emitir);
+            None imprime na hora.
     
     Returns:
-        dict | None: Erro encontrado ou None se item está ok
-    """
-    # Se não pagou imposto, não tem o que recuperar
-    if item['imposto_total'] <= 0:
-        return None
+        ErroRecuperavel | None: Erro encontrado ou None se item está ok
     
+    Note:
+        Só recebe itens com imposto pago (item.imposto_total > 0): quem
+        chama filtra os itens de cada nota antes, em uma list
+        comprehension, e os sem imposto - sem nada a recuperar - nem
+        chegam a custar uma chamada desta função.
+    """
     # =========================================================================
     # ETAPA 1 e 2: Verificação pelo Banco de Dados (NCM + Keywords)
     # =========================================================================
-    resultado_db = ncm_db.verificar_item(item['ncm'], item['produto'])
+    resultado_db = ncm_db.verificar_item(item.ncm, item.produto)
     
     if resultado_db['is_monofasico']:
         # Determina a fonte da identificação
         if resultado_db['fonte'] == 'banco_dados':
-            stats['banco_dados'] = stats.get('banco_dados', 0) + 1
-            origem = "Banco de Dados"
-            motivo = f"NCM {item['ncm']} é monofásico - {resultado_db['descricao']}"
+            stats['banco_dados'] += 1
+            origem = ORIGEM_BANCO_DADOS
+            motivo = f"NCM {item.ncm} é monofásico - {resultado_db['descricao']}"
         elif resultado_db['fonte'] == 'cache_ia':
             # NOVO v2.1: Identificado pelo cache de aprendizado da IA
-            stats['ia_economizada'] = stats.get('ia_economizada', 0) + 1
-            origem = "Cache IA (Aprendizado)"
+            stats['ia_economizada'] += 1
+            origem = ORIGEM_CACHE_IA
             motivo = f"Produto identificado por aprendizado anterior - {resultado_db['descricao']}"
-            print(Fore.CYAN + f"   🧠 Cache hit! Economizou chamada de IA")
+            _emitir(log, Fore.CYAN + f"   🧠 Cache hit! Economizou chamada de IA")
         else:
-            stats['keywords'] = stats.get('keywords', 0) + 1
-            stats['ia_economizada'] = stats.get('ia_economizada', 0) + 1
-            origem = "Identificação por Nome"
+            stats['keywords'] += 1
+            stats['ia_economizada'] += 1
+            origem = ORIGEM_KEYWORDS
             keyword = resultado_db.get('keyword_encontrada', '')
             motivo = f"Produto identificado por keyword '{keyword}' - {resultado_db['descricao']}"
         
         # NCM atual está errado?
         ncm_correto = resultado_db['ncm_correto']
         if not resultado_db['ncm_atual_correto']:
-            print(Fore.YELLOW + f"   ⚠️  NCM INCORRETO: {item['ncm']} → deveria ser {ncm_correto}")
+            _emitir(log, Fore.YELLOW + f"   ⚠️  NCM INCORRETO: {item.ncm} → deveria ser {ncm_correto}")
         
-        print(Fore.RED + f"   🚨 RECUPERÁVEL: R$ {item['imposto_total']:.2f} ({item['produto'][:30]}...)")
+        _emitir(log, Fore.RED + f"   🚨 RECUPERÁVEL: R$ {item.imposto_total:.2f} ({item.produto[:30]}...)")
         
-        return {
+        # Posicionais, na ordem dos campos de ErroRecuperavel (mais barato
+        # que por nome)
+        return ErroRecuperavel(
             # Dados da nota (v2.1)
-            "chave_acesso": item.get('chave_acesso', ''),
-            "numero_nota": item.get('numero_nota', ''),
-            "data_emissao": item.get('data_emissao', ''),
-            "cnpj_emitente": item.get('cnpj_emitente', ''),
-            "nome_emitente": item.get('nome_emitente', ''),
+            item.chave_acesso,
+            item.numero_nota,
+            item.data_emissao,
+            item.cnpj_emitente,
+            item.nome_emitente,
             # Dados do item
-            "produto": item['produto'],
-            "ncm": item['ncm'],
-            "ncm_correto": ncm_correto,
-            "imposto_recuperavel": item['imposto_total'],
-            "motivo": motivo,
-            "origem_analise": origem,
-            "base_legal": resultado_db['base_legal'],
-            "confianca": resultado_db.get('confianca', 'alta')
-        }
+            item.produto,
+            item.ncm,
+            ncm_correto,
+            item.imposto_total,
+            motivo,
+            origem,
+            resultado_db['base_legal'],
+            resultado_db.get('confianca', 'alta')
+        )
     
     # =========================================================================
     # ETAPA 3: Inteligência Artificial (último recurso)
@@ -199,57 +271,171 @@ def analyze_item(
     # 1. Não encontrou no banco de dados
     # 2. Não encontrou no cache de aprendizado (NOVO v2.1)
     # 3. Agente está disponível
-    # 4. Item tem imposto pago (já verificado acima)
+    # 4. Item tem imposto pago (filtrado antes da chamada)
     
     # NOVO v2.1: Se já tem no cache, NÃO chama IA (mesmo que não seja monofásico)
     if resultado_db.get('fonte') == 'cache_ia':
-        stats['ia_economizada'] = stats.get('ia_economizada', 0) + 1
-        print(Fore.CYAN + f"   🧠 Cache hit! '{item['produto'][:30]}...' não é monofásico (economizou IA)")
+        stats['ia_economizada'] += 1
+        _emitir(log, Fore.CYAN + f"   🧠 Cache hit! '{item.produto[:30]}...' não é monofásico (economizou IA)")
         return None  # Não é monofásico, não tem o que recuperar
-    # 3. Item tem imposto pago (já verificado acima)
+    # 3. Item tem imposto pago (filtrado antes da chamada)
     
     if ia_auditor:
-        print(Fore.YELLOW + f"   🤔 Consultando IA para '{item['produto'][:30]}...'")
+        # Consulta em lote feita depois, por analyze_pending_ia()
+        if pendentes_ia is not None:
+            pendentes_ia.append(item)
+            return None
+        
+        _emitir(log, Fore.YELLOW + f"   🤔 Consultando IA para '{item.produto[:30]}...'")
         
         resultado_ia = ia_auditor.analyze_item(
-            descricao=item['produto'],
-            ncm_errado=item['ncm'],
-            valor_item=item['valor_total']
+            descricao=item.produto,
+            ncm_errado=item.ncm,
+            valor_item=item.valor_total
         )
-        
-        # NOVO v2.1: Salva o aprendizado da IA no cache (independente do resultado)
-        # Isso evita consultas repetidas ao mesmo produto no futuro
+        return _registrar_resultado_ia(item, resultado_ia, ncm_db, stats, log)
+    
+    return None
+
+
+def analyze_pending_ia(
+    pendentes: list,
+    ncm_db: NCMDatabase,
+    ia_auditor: FiscalAuditorAgent,
+    stats: dict,
+    log: list | None = None
+) -> list:
+    """
+    Consulta a IA em lote para os itens que não foram identificados.
+    
+    Em vez de uma chamada à API por item (1-3 segundos cada), os produtos
+    distintos vão juntos para FiscalAuditorAgent.analyze_batch, que agrupa
+    vários por chamada. Repetições do mesmo produto são reanalisadas
+    depois que o aprendizado foi salvo, e por isso saem do cache da IA -
+    como no fluxo item a item. Nomes que só diferem em maiúsculas ou
+    espaços nas pontas contam como o mesmo produto: é a normalização do
+    cache de aprendizado, então a repetição sempre o encontra.
+    
+    Args:
+        pendentes (list): Itens coletados por analyze_item(..., pendentes_ia=...)
+        ncm_db (NCMDatabase): Banco de dados de NCMs
+        ia_auditor (FiscalAuditorAgent): Agente de IA
+        stats (dict): Dicionário para acumular estatísticas
+        log (list | None): Buffer das mensagens por item (ver _emitir)
+    
+    Returns:
+        list: Erros encontrados entre os itens pendentes
+    """
+    if not pendentes:
+        return []
+    
+    primeiros = {}
+    repetidos = []
+    for item in pendentes:
+        # Mesma chave do cache de aprendizado (ver salvar_aprendizado_ia)
+        nome = item.produto.upper().strip()
+        if nome in primeiros:
+            repetidos.append(item)
+        else:
+            primeiros[nome] = item
+    
+    _emitir(log, Fore.YELLOW + f"\n🤔 Consultando IA para {len(primeiros)} produto(s) não identificado(s)...")
+    
+    resultados_ia = ia_auditor.analyze_batch(
+        [(item.produto, item.ncm, item.valor_total) for item in primeiros.values()]
+    )
+    
+    # Todo o lote vai para o cache de aprendizado de uma vez (uma escrita
+    # no arquivo, não uma por produto). Falhas da IA (rede, resposta
+    # ilegível) ficam de fora: o produto volta a ser consultado depois
+    ncm_db.salvar_aprendizados_ia([
+        (item.produto, resultado_ia[0] == True, resultado_ia[1], resultado_ia[2])
+        for item, resultado_ia in zip(primeiros.values(), resultados_ia, strict=True)
+        if not resultado_com_erro(resultado_ia)
+    ])
+    
+    # Constante durante a análise: lida uma vez para o lote inteiro
+    base_legal = ncm_db.get_base_legal()
+    
+    erros = []
+    for item, resultado_ia in zip(primeiros.values(), resultados_ia, strict=True):
+        erro = _registrar_resultado_ia(
+            item, resultado_ia, ncm_db, stats, log, base_legal, salvar=False
+        )
+        if erro:
+            erros.append(erro)
+    
+    for item in repetidos:
+        erro = analyze_item(item, ncm_db, ia_auditor, stats, log=log)
+        if erro:
+            erros.append(erro)
+    
+    return erros
+
+
+def _registrar_resultado_ia(
+    item: ItemNFe,
+    resultado_ia: list,
+    ncm_db: NCMDatabase,
+    stats: dict,
+    log: list | None = None,
+    base_legal: str | None = None,
+    salvar: bool = True
+) -> ErroRecuperavel | None:
+    """
+    Salva o aprendizado da IA e monta o erro se o item for monofásico.
+    
+    Args:
+        item (ItemNFe): Dados do item da NF-e
+        resultado_ia (list): [is_monofasico, ncm_correto, motivo] da IA
+        ncm_db (NCMDatabase): Banco de dados de NCMs
+        stats (dict): Dicionário para acumular estatísticas
+        log (list | None): Buffer das mensagens do item (ver _emitir)
+        base_legal (str | None): Base legal já lida por quem chama (ex: uma
+            vez por lote em analyze_pending_ia). None: lida do ncm_db.
+        salvar (bool): Se False, o aprendizado já foi salvo por quem chama
+            (ex: em lote, com ncm_db.salvar_aprendizados_ia).
+    
+    Returns:
+        ErroRecuperavel | None: Erro encontrado ou None
+    """
+    # NOVO v2.1: Salva o aprendizado da IA no cache (monofásico ou não)
+    # Isso evita consultas repetidas ao mesmo produto no futuro. Falhas da
+    # IA (rede, resposta ilegível) não são aprendizado: ficam de fora
+    if salvar and not resultado_com_erro(resultado_ia):
         ncm_db.salvar_aprendizado_ia(
-            nome_produto=item['produto'],
+            nome_produto=item.produto,
             is_monofasico=(resultado_ia[0] == True),
             ncm_sugerido=resultado_ia[1],
             motivo=resultado_ia[2]
         )
+    
+    # resultado_ia = [is_monofasico, ncm_correto, motivo]
+    if resultado_ia[0] == True:
+        stats['ia'] += 1
         
-        # resultado_ia = [is_monofasico, ncm_correto, motivo]
-        if resultado_ia[0] == True:
-            stats['ia'] = stats.get('ia', 0) + 1
-            
-            print(Fore.GREEN + f"   🤖 IA identificou! NCM correto: {resultado_ia[1]}")
-            print(Fore.RED + f"   🚨 RECUPERÁVEL: R$ {item['imposto_total']:.2f}")
-            
-            return {
-                # Dados da nota (v2.1)
-                "chave_acesso": item.get('chave_acesso', ''),
-                "numero_nota": item.get('numero_nota', ''),
-                "data_emissao": item.get('data_emissao', ''),
-                "cnpj_emitente": item.get('cnpj_emitente', ''),
-                "nome_emitente": item.get('nome_emitente', ''),
-                # Dados do item
-                "produto": item['produto'],
-                "ncm": item['ncm'],
-                "ncm_correto": resultado_ia[1],
-                "imposto_recuperavel": item['imposto_total'],
-                "motivo": resultado_ia[2],
-                "origem_analise": "Agente IA",
-                "base_legal": ncm_db.get_base_legal(),
-                "confianca": "media"
-            }
+        _emitir(log, Fore.GREEN + f"   🤖 IA identificou '{item.produto[:30]}...'! NCM correto: {resultado_ia[1]}")
+        _emitir(log, Fore.RED + f"   🚨 RECUPERÁVEL: R$ {item.imposto_total:.2f}")
+        
+        # Posicionais, na ordem dos campos de ErroRecuperavel (mais barato
+        # que por nome)
+        return ErroRecuperavel(
+            # Dados da nota (v2.1)
+            item.chave_acesso,
+            item.numero_nota,
+            item.data_emissao,
+            item.cnpj_emitente,
+            item.nome_emitente,
+            # Dados do item
+            item.produto,
+            item.ncm,
+            resultado_ia[1],
+            item.imposto_total,
+            resultado_ia[2],
+            ORIGEM_IA,
+            base_legal if base_legal is not None else ncm_db.get_base_legal(),
+            CONFIANCA_IA
+        )
     
     return None
 
@@ -258,14 +444,22 @@ def analyze_item(
 # FUNÇÃO PRINCIPAL - PIPELINE DE PROCESSAMENTO
 # =============================================================================
 
-def process_pipeline() -> None:
+def process_pipeline(quiet: bool = False) -> None:
     """
     Executa o pipeline completo de auditoria tributária.
     
+    As mensagens de cada item são acumuladas e escritas de uma vez ao fim
+    de cada arquivo (ver _descarregar_log).
+    
+    Args:
+        quiet (bool): Se True, omite as mensagens por item (cache hit,
+            recuperável, NCM incorreto...) e mostra só o andamento por
+            arquivo e o resumo. Na linha de comando: --quiet.
+    
     FLUXO:
-    1. Inicializa componentes (Parser, Database, Exporter, IA)
+    1. Inicializa componentes (Database, Exporter, IA)
     2. Lista arquivos XML no diretório de input
-    3. Processa cada arquivo, analisando cada item
+    3. Parseia os arquivos em paralelo e analisa cada item
     4. Gera relatório Excel com resultados
     """
     
@@ -275,11 +469,10 @@ def process_pipeline() -> None:
     # ETAPA 1: INICIALIZAÇÃO DOS COMPONENTES
     # =========================================================================
     
-    parser = NFeParser()
     exporter = ReportGenerator(output_folder=OUTPUT_DIR)
     
     # Carrega banco de dados rico de NCMs
-    ncm_db = NCMDatabase(DB_PATH)
+    ncm_db = get_ncm_database(DB_PATH)
     
     # Mostra estatísticas do banco
     db_stats = ncm_db.get_estatisticas()
@@ -298,7 +491,15 @@ def process_pipeline() -> None:
         print(Fore.YELLOW + f"   Crie a pasta e coloque os arquivos XML nela.")
         return
     
-    arquivos_xml = [f for f in os.listdir(INPUT_DIR) if f.lower().endswith('.xml')]
+    # scandir: nome, caminho e tipo de cada entrada vêm da própria leitura
+    # do diretório (sem um stat por arquivo); pastas com nome .xml ficam
+    # de fora. Lista de (nome, caminho)
+    with os.scandir(INPUT_DIR) as entradas:
+        arquivos_xml = [
+            (entrada.name, entrada.path)
+            for entrada in entradas
+            if entrada.name.lower().endswith('.xml') and entrada.is_file()
+        ]
     
     if not arquivos_xml:
         print(Fore.YELLOW + f"⚠️  Nenhum arquivo XML encontrado em '{INPUT_DIR}'.")
@@ -311,30 +512,47 @@ def process_pipeline() -> None:
     # =========================================================================
     
     erros_encontrados = []
+    pendentes_ia = []
+    log = []  # Mensagens por item do arquivo em análise
     total_recuperavel = 0.0
-    stats = {
-        'banco_dados': 0,
-        'keywords': 0,
-        'ia': 0,
-        'ia_economizada': 0
-    }
-    
-    for xml_file in arquivos_xml:
-        caminho_xml = os.path.join(INPUT_DIR, xml_file)
+    # Counter: chave ausente vale 0, então cada contagem é só `+= 1`
+    stats = Counter(banco_dados=0, keywords=0, ia=0, ia_economizada=0)
+    
+    # Parsing em paralelo (um processo por núcleo), entregue arquivo a
+    # arquivo: a análise (sequencial, na ordem dos arquivos - o que a IA
+    # aprende com um item vale para os seguintes) começa pelo primeiro
+    # arquivo enquanto os demais ainda estão sendo lidos
+    itens_por_arquivo = iter_xml_files(
+        [caminho for _, caminho in arquivos_xml],
+        cache_dir=PARSER_CACHE_DIR
+    )
+    
+    for (xml_file, _), itens_nota in zip(arquivos_xml, itens_por_arquivo):
         print(f"📂 Processando: {xml_file}...")
         
-        itens_nota = parser.parse(caminho_xml)
-        
         if not itens_nota:
             print(Fore.YELLOW + f"   ⚠️  Não foi possível extrair itens de {xml_file}")
             continue
         
-        for item in itens_nota:
-            erro = analyze_item(item, ncm_db, ia_auditor, stats)
+        # Só os itens com PIS/COFINS pago entram na análise - os demais não
+        # têm o que recuperar (mesmo filtro do app)
+        com_imposto = [item for item in itens_nota if item.imposto_total > 0]
+        for item in com_imposto:
+            erro = analyze_item(item, ncm_db, ia_auditor, stats, pendentes_ia, log)
             
             if erro:
                 erros_encontrados.append(erro)
-                total_recuperavel += erro['imposto_recuperavel']
+                total_recuperavel += erro.imposto_recuperavel
+        
+        _descarregar_log(log, quiet)
+    
+    # Itens que o banco não identificou: uma consulta à IA em lote, em vez
+    # de uma chamada por item durante a leitura dos arquivos
+    if ia_auditor:
+        for erro in analyze_pending_ia(pendentes_ia, ncm_db, ia_auditor, stats, log):
+            erros_encontrados.append(erro)
+            total_recuperavel += erro.imposto_recuperavel
+        _descarregar_log(log, quiet)
     
     # =========================================================================
     # ETAPA 4: FINALIZAÇÃO E RELATÓRIO
@@ -343,7 +561,9 @@ def process_pipeline() -> None:
     print_summary(total_recuperavel, stats)
     
     if total_recuperavel > 0:
-        exporter.gerar_excel(erros_encontrados)
+        # O total já foi acumulado durante a análise: o exporter não
+        # percorre os erros de novo para somá-lo
+        exporter.gerar_excel(erros_encontrados, total=total_recuperavel)
         
         print(Fore.CYAN + f"\n📈 Resumo Final:")
         print(Fore.WHITE + f"   • Arquivos analisados: {len(arquivos_xml)}")
@@ -364,4 +584,4 @@ def process_pipeline() -> None:
 # =============================================================================
 
 if __name__ == "__main__":
-    process_pipeline()
+    process_pipeline(quiet="--quiet" in sys.argv[1:])
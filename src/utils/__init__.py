@@ -3,8 +3,9 @@ Pacote utils - Utilitários do RevFinder AI.
 
 Contém:
     - ReportGenerator: Gerador de relatórios Excel/CSV
+    - ErroRecuperavel: Registro de um item recuperável (linha do relatório)
 """
 
-from .exporter import ReportGenerator
+from .exporter import ErroRecuperavel, ReportGenerator
 
-__all__ = ['ReportGenerator']
+__all__ = ['ReportGenerator', 'ErroRecuperavel']
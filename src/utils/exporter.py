@@ -37,8 +37,9 @@ Os arquivos são nomeados com timestamp para evitar sobrescrita:
 
 DEPENDÊNCIAS:
 -------------
-    - pandas: Manipulação de dados e exportação para Excel
-    - openpyxl: Engine para escrita de arquivos .xlsx (instalado com pandas)
+    - xlsxwriter: Escrita dos arquivos .xlsx, linha a linha (modo
+      constant_memory), direto da lista de erros - sem DataFrame
+    - csv (biblioteca padrão): Relatório alternativo em CSV
 
 USO:
 ----
@@ -72,12 +73,16 @@ Data: Dezembro/2025
 # IMPORTS
 # =============================================================================
 
+import csv  # Exportação alternativa em CSV
 import os  # Manipulação de caminhos e diretórios
-from datetime import datetime  # Geração de timestamps
-from typing import List, Dict, Any, Optional  # Type hints
+import time  # Timestamp do nome dos arquivos
+from dataclasses import dataclass  # Registro tipado de cada erro encontrado
+from operator import attrgetter  # Leitura das colunas de um registro em C
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Union  # Type hints
 
-# Pandas para manipulação de dados tabulares e exportação Excel
-import pandas as pd
+# xlsxwriter para gravar o Excel em streaming, uma linha por vez
+import xlsxwriter
+from xlsxwriter.exceptions import FileCreateError
 
 # Colorama para output colorido no terminal
 from colorama import Fore
@@ -108,8 +113,18 @@ COLUMN_MAPPING = {
     "origem_analise": "Auditoria Feita Por"
 }
 
-# Ordem das colunas no relatório final
-COLUMN_ORDER = [
+# Nome da aba do relatório Excel
+SHEET_NAME = "Recuperacao"
+
+# Timestamp no nome dos relatórios (YYYYMMDD_HHMMSS, horário local)
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+# Formato monetário da coluna de valores (aplicado pelo Excel; as células
+# continuam numéricas e somáveis)
+MONEY_FORMAT = "R$ #,##0.00"
+
+# Ordem das colunas no relatório final (tupla: constante, nunca alterada)
+COLUMN_ORDER = (
     # Dados da nota primeiro (v2.1)
     "chave_acesso",
     "numero_nota",
@@ -123,7 +138,70 @@ COLUMN_ORDER = [
     "imposto_recuperavel",
     "motivo",
     "origem_analise"
-]
+)
+
+# Cabeçalho do relatório (nomes amigáveis, na ordem de COLUMN_ORDER) e
+# posição da coluna de valores - calculados uma vez, na importação
+COLUMN_HEADERS = tuple(COLUMN_MAPPING.get(col, col) for col in COLUMN_ORDER)
+COLUNA_VALOR = COLUMN_ORDER.index("imposto_recuperavel")
+
+
+# =============================================================================
+# ESTRUTURA DE DADOS
+# =============================================================================
+
+@dataclass(slots=True)
+class ErroRecuperavel:
+    """
+    Um item com PIS/COFINS recuperável (uma linha do relatório).
+    
+    Como o ItemNFe do parser, usa slots: criar um registro é mais barato
+    que montar um dicionário de 13 chaves por item identificado, e o
+    relatório lê as colunas direto dos atributos (ver _linhas), sem .get
+    com valor default em cada célula.
+    
+    Attributes:
+        chave_acesso (str): Chave de 44 dígitos da nota
+        numero_nota (str): Número da nota fiscal
+        data_emissao (str): Data e hora de emissão
+        cnpj_emitente (str): CNPJ do emitente (formatado)
+        nome_emitente (str): Nome/Razão social do emitente
+        produto (str): Nome/descrição do produto
+        ncm (str): NCM informado na nota
+        ncm_correto (str): NCM monofásico correto
+        imposto_recuperavel (float): PIS + COFINS pagos, em R$
+        motivo (str): Justificativa da identificação
+        origem_analise (str): Quem identificou (Banco de Dados, Agente IA...)
+        base_legal (str): Fundamentação legal
+        confianca (str): Confiança da identificação (alta, media...)
+    
+    Example:
+        >>> erro = ErroRecuperavel(produto="HEINEKEN 355ML", imposto_recuperavel=0.85)
+        >>> dataclasses.asdict(erro)  # Se precisar do formato dicionário
+    """
+    # Dados da nota (v2.1) - mesma ordem de COLUMN_ORDER
+    chave_acesso: str = ''
+    numero_nota: str = ''
+    data_emissao: str = ''
+    cnpj_emitente: str = ''
+    nome_emitente: str = ''
+    
+    # Dados do item
+    produto: str = ''
+    ncm: str = ''
+    ncm_correto: str = ''
+    imposto_recuperavel: float = 0.0
+    motivo: str = ''
+    origem_analise: str = ''
+    
+    # Fora do relatório
+    base_legal: str = ''
+    confianca: str = 'alta'
+
+
+# Lê todas as colunas do relatório de um ErroRecuperavel em uma chamada
+# (devolve a tupla na ordem de COLUMN_ORDER)
+_LER_COLUNAS = attrgetter(*COLUMN_ORDER)
 
 
 # =============================================================================
@@ -186,11 +264,14 @@ class ReportGenerator:
         """
         self.output_folder = output_folder
         
-        # Cria o diretório se não existir
-        # exist_ok=True evita erro se já existir
-        if not os.path.exists(output_folder):
-            os.makedirs(output_folder, exist_ok=True)
+        # Cria o diretório se não existir, sem consultar antes: se ele já
+        # existe (ou for criado por outro processo nesse meio tempo), o
+        # makedirs avisa com FileExistsError
+        try:
+            os.makedirs(output_folder)
             print(Fore.BLUE + f"📁 Diretório criado: {output_folder}")
+        except FileExistsError:
+            pass
     
     def _generate_filename(self) -> str:
         """
@@ -210,82 +291,51 @@ class ReportGenerator:
         Note:
             O timestamp usa horário local do sistema.
         """
-        # Formato: YYYYMMDD_HHMMSS
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Formato: YYYYMMDD_HHMMSS (time.strftime: sem montar um datetime)
+        timestamp = time.strftime(TIMESTAMP_FORMAT)
         return f"Relatorio_Recuperacao_{timestamp}.xlsx"
     
-    def _prepare_dataframe(self, lista_auditoria: List[Dict[str, Any]]) -> pd.DataFrame:
+    def _linhas(self, lista_auditoria: List[Union[ErroRecuperavel, Dict[str, Any]]]) -> Iterator[Sequence[Any]]:
         """
-        Prepara o DataFrame para exportação.
+        Gera as linhas do relatório, uma por erro, na ordem das colunas.
         
-        Esta função:
-        1. Converte a lista de dicionários em DataFrame
-        2. Garante que todas as colunas esperadas existam
-        3. Reordena as colunas na ordem correta
-        4. Renomeia colunas para nomes amigáveis
+        Cada erro pode ser um ErroRecuperavel (colunas lidas de uma vez por
+        _LER_COLUNAS) ou um dicionário, em que chaves ausentes viram células
+        vazias. As linhas são geradas sob demanda: nenhuma tabela
+        intermediária (DataFrame) é montada, e quem grava libera cada linha
+        antes da próxima.
         
         Args:
-            lista_auditoria (List[Dict]): Lista de erros encontrados.
-                Cada dicionário deve conter as chaves definidas em COLUMN_ORDER.
+            lista_auditoria (List[ErroRecuperavel | Dict]): Lista de erros
+                encontrados. Dicionários devem conter as chaves definidas
+                em COLUMN_ORDER.
         
-        Returns:
-            pd.DataFrame: DataFrame formatado e pronto para exportação.
+        Yields:
+            Sequence[Any]: Valores de um erro, na ordem de COLUMN_ORDER.
         
         Example:
-            >>> erros = [
-            ...     {"produto": "HEINEKEN", "ncm": "99999999", ...}
-            ... ]
-            >>> df = self._prepare_dataframe(erros)
-            >>> print(df.columns.tolist())
-            ['Produto', 'NCM Sistema', 'NCM Correto', 'Valor a Recuperar (R$)', ...]
-        """
-        # Converte lista para DataFrame
-        df = pd.DataFrame(lista_auditoria)
-        
-        # Garante que todas as colunas existam (adiciona vazias se faltar)
-        for col in COLUMN_ORDER:
-            if col not in df.columns:
-                df[col] = ""
-        
-        # Seleciona e reordena colunas
-        df_ordered = df[COLUMN_ORDER].copy()
-        
-        # Renomeia colunas para nomes amigáveis
-        column_names = [COLUMN_MAPPING.get(col, col) for col in COLUMN_ORDER]
-        df_ordered.columns = column_names
-        
-        return df_ordered
-    
-    def _format_currency(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Formata valores monetários no DataFrame.
-        
-        Converte a coluna de valores para formato brasileiro (R$).
-        
-        Args:
-            df (pd.DataFrame): DataFrame com dados brutos.
-        
-        Returns:
-            pd.DataFrame: DataFrame com valores formatados.
-        
-        Note:
-            Esta função é opcional e pode ser expandida para
-            adicionar mais formatações.
+            >>> next(self._linhas([{"produto": "HEINEKEN"}]))[5]
+            'HEINEKEN'
         """
-        # Por enquanto, mantemos os valores numéricos para
-        # permitir soma no Excel. A formatação é feita pelo Excel.
-        return df
+        for item in lista_auditoria:
+            if isinstance(item, ErroRecuperavel):
+                yield _LER_COLUNAS(item)
+            else:
+                yield [item.get(col, "") for col in COLUMN_ORDER]
     
-    def gerar_excel(self, lista_auditoria: List[Dict[str, Any]]) -> Optional[str]:
+    def gerar_excel(
+        self,
+        lista_auditoria: List[Union[ErroRecuperavel, Dict[str, Any]]],
+        total: Optional[float] = None
+    ) -> Optional[str]:
         """
         Gera o relatório Excel com os erros encontrados.
         
         Esta é a função principal do módulo. Ela:
         1. Valida se há dados para exportar
-        2. Prepara o DataFrame
-        3. Gera nome de arquivo único
-        4. Exporta para Excel
-        5. Exibe mensagem de sucesso
+        2. Gera nome de arquivo único
+        3. Grava o Excel linha a linha (valores com formato monetário)
+        4. Exibe mensagem de sucesso
         
         Args:
             lista_auditoria (List[Dict]): Lista de erros encontrados na auditoria.
@@ -296,6 +346,8 @@ class ReportGenerator:
                 - imposto_recuperavel (float): Valor em R$
                 - motivo (str): Explicação do erro
                 - origem_analise (str): "Banco de Dados" ou "Agente AI"
+            total (Optional[float]): Soma de imposto_recuperavel, se quem
+                chama já a acumulou durante a análise. None: somado aqui.
         
         Returns:
             Optional[str]: Caminho completo do arquivo gerado ou None se vazio.
@@ -330,8 +382,14 @@ class ReportGenerator:
         
         Note:
             - Se lista_auditoria estiver vazia, não gera arquivo
-            - O arquivo usa engine 'openpyxl' para compatibilidade
-            - Valores numéricos são mantidos para permitir fórmulas no Excel
+            - O arquivo é gravado pelo xlsxwriter em modo constant_memory:
+              cada linha vai para o disco quando a próxima começa, então a
+              memória não cresce com o tamanho do relatório (as linhas
+              precisam ser escritas em ordem crescente)
+            - Sem conversão de textos em links (strings_to_urls), que
+              testaria uma regex por célula
+            - Valores numéricos são mantidos para permitir fórmulas no Excel;
+              o formato R$ é da coluna, aplicado pelo próprio Excel
         """
         # =====================================================================
         # VALIDAÇÃO: Verifica se há dados para exportar
@@ -340,12 +398,6 @@ class ReportGenerator:
             print(Fore.YELLOW + "⚠️  Nenhum erro para exportar. Relatório não gerado.")
             return None
         
-        # =====================================================================
-        # PREPARAÇÃO: Converte e formata os dados
-        # =====================================================================
-        df = self._prepare_dataframe(lista_auditoria)
-        df = self._format_currency(df)
-        
         # =====================================================================
         # GERAÇÃO: Cria nome de arquivo e caminho completo
         # =====================================================================
@@ -356,25 +408,39 @@ class ReportGenerator:
         # EXPORTAÇÃO: Salva o arquivo Excel
         # =====================================================================
         try:
-            # to_excel com index=False remove a coluna de índice do pandas
-            # engine='openpyxl' é necessário para .xlsx
-            df.to_excel(
+            with xlsxwriter.Workbook(
                 filepath,
-                index=False,
-                engine='openpyxl'
-            )
+                {'constant_memory': True, 'strings_to_urls': False}
+            ) as workbook:
+                worksheet = workbook.add_worksheet(SHEET_NAME)
+                
+                # Formatos criados uma vez, reaproveitados em todas as células
+                header_fmt = workbook.add_format({'bold': True, 'border': 1, 'align': 'center'})
+                money_fmt = workbook.add_format({'num_format': MONEY_FORMAT})
+                
+                # Formato monetário na coluna de valores, definido uma vez
+                worksheet.set_column(COLUNA_VALOR, COLUNA_VALOR, 16, money_fmt)
+                
+                worksheet.write_row(0, 0, COLUMN_HEADERS, header_fmt)
+                for row_idx, linha in enumerate(self._linhas(lista_auditoria), start=1):
+                    worksheet.write_row(row_idx, 0, linha)
             
             print(Fore.GREEN + f"\n📊 Relatório Excel gerado com sucesso!")
             print(Fore.WHITE + f"   📁 Arquivo: {filepath}")
             print(Fore.WHITE + f"   📋 Registros: {len(lista_auditoria)} itens")
             
-            # Calcula e exibe o total
-            total = sum(item.get('imposto_recuperavel', 0) for item in lista_auditoria)
+            # Exibe o total (somado aqui só se não veio pronto)
+            if total is None:
+                total = sum(
+                    item.imposto_recuperavel if isinstance(item, ErroRecuperavel)
+                    else item.get('imposto_recuperavel', 0)
+                    for item in lista_auditoria
+                )
             print(Fore.WHITE + f"   💰 Total: R$ {total:.2f}")
             
             return filepath
             
-        except PermissionError:
+        except (PermissionError, FileCreateError):
             print(Fore.RED + f"❌ Erro: Arquivo {filepath} está aberto em outro programa.")
             print(Fore.YELLOW + "   Feche o Excel e tente novamente.")
             return None
@@ -383,7 +449,7 @@ class ReportGenerator:
             print(Fore.RED + f"❌ Erro ao salvar Excel: {e}")
             return None
     
-    def gerar_csv(self, lista_auditoria: List[Dict[str, Any]]) -> Optional[str]:
+    def gerar_csv(self, lista_auditoria: List[Union[ErroRecuperavel, Dict[str, Any]]]) -> Optional[str]:
         """
         Gera o relatório em formato CSV (alternativa ao Excel).
         
@@ -405,21 +471,20 @@ class ReportGenerator:
             print(Fore.YELLOW + "⚠️  Nenhum erro para exportar.")
             return None
         
-        df = self._prepare_dataframe(lista_auditoria)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = time.strftime(TIMESTAMP_FORMAT)
         filename = f"Relatorio_Recuperacao_{timestamp}.csv"
         filepath = os.path.join(self.output_folder, filename)
         
         try:
-            # sep=';' para compatibilidade com Excel brasileiro
+            # delimiter=';' para compatibilidade com Excel brasileiro
             # encoding='utf-8-sig' adiciona BOM para Excel reconhecer acentos
-            df.to_csv(
-                filepath,
-                index=False,
-                sep=';',
-                encoding='utf-8-sig'
-            )
+            with open(filepath, "w", newline="", encoding="utf-8-sig") as f:
+                # Fim de linha do sistema, como o to_csv do pandas gravava
+                writer = csv.writer(
+                    f, delimiter=";", quoting=csv.QUOTE_MINIMAL, lineterminator=os.linesep
+                )
+                writer.writerow(COLUMN_HEADERS)
+                writer.writerows(self._linhas(lista_auditoria))
             
             print(Fore.GREEN + f"📊 Relatório CSV gerado: {filepath}")
             return filepath
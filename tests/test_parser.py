@@ -13,8 +13,17 @@ import pytest
 # Adiciona o diretório src ao path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from src.core.parser import NFeParser
-from src.core.ncm_database import NCMDatabase
+from src.core.parser import NFeParser, ItemNFe, DadosNota, parse_xml_bytes
+from src.core.ncm_database import NCMDatabase, get_ncm_database
+
+# Banco de regras do projeto (somente leitura nos testes; quem grava usa cópia)
+DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'database', 'ncm_rules.json')
+
+
+@pytest.fixture(scope="module")
+def ncm_db():
+    """Carrega o banco de NCMs uma única vez para todo o módulo."""
+    return get_ncm_database(DB_PATH)
 
 
 class TestNFeParser:
@@ -38,30 +47,192 @@ class TestNFeParser:
         result = self.parser._safe_find_text(root, 'inexistente', 'DEFAULT')
         assert result == 'DEFAULT'
     
+    def test_safe_find_text_prefixo_nfe(self):
+        """Testa que caminhos 'nfe:' e tags qualificadas acham o mesmo elemento."""
+        import xml.etree.ElementTree as ET
+        from src.core.parser import PREFIXO_NFE
+        root = ET.fromstring(
+            '<prod xmlns="http://www.portalfiscal.inf.br/nfe"><xProd>AGUA</xProd></prod>'
+        )
+        assert self.parser._safe_find_text(root, 'nfe:xProd') == 'AGUA'
+        assert self.parser._safe_find_text(root, PREFIXO_NFE + 'xProd') == 'AGUA'
+        assert self.parser._safe_find_text(root, './/nfe:xProd') == 'AGUA'
+    
     def test_safe_find_float_with_default(self):
         """Testa função de busca numérica segura."""
         import xml.etree.ElementTree as ET
         root = ET.fromstring('<root></root>')
         result = self.parser._safe_find_float(root, 'inexistente', 99.99)
         assert result == 99.99
+    
+    def test_parse_bytes_igual_parse(self):
+        """Testa se parse_bytes extrai os mesmos itens que parse."""
+        xml_path = os.path.join(
+            os.path.dirname(__file__), '..', 'input_xmls', 'nota_teste.xml'
+        )
+        with open(xml_path, 'rb') as f:
+            data = f.read()
+        itens = self.parser.parse_bytes(data)
+        assert len(itens) > 0
+        assert itens == self.parser.parse(xml_path)
+    
+    def test_streaming_igual_arvore(self, monkeypatch):
+        """Testa se a leitura em streaming (XML grande) e a pela árvore coincidem."""
+        from src.core import parser as parser_module
+        xml_path = os.path.join(
+            os.path.dirname(__file__), '..', 'input_xmls', 'nota_teste.xml'
+        )
+        with open(xml_path, 'rb') as f:
+            data = f.read()
+        itens_arvore = self.parser.parse_bytes(data)
+        monkeypatch.setattr(parser_module, 'MAX_BYTES_ARVORE_XML', 0)
+        assert self.parser.parse_bytes(data) == itens_arvore
+    
+    def test_streaming_memoria_limitada(self):
+        """Testa que o streaming não guarda a árvore inteira de um XML grande."""
+        import tracemalloc
+        xml_path = os.path.join(
+            os.path.dirname(__file__), '..', 'input_xmls', 'nota_teste.xml'
+        )
+        with open(xml_path, 'rb') as f:
+            data = f.read()
+        # Mesma nota com os itens repetidos até passar de 1 MB
+        inicio = data.index(b'<det ')
+        fim = data.rindex(b'</det>') + len(b'</det>')
+        grande = data[:inicio] + data[inicio:fim] * 200 + data[fim:]
+        
+        tracemalloc.start()
+        try:
+            itens = self.parser.parse_bytes(grande)
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        
+        # A árvore inteira ocuparia ~10x o tamanho do XML; no streaming ficam
+        # em memória os itens extraídos, o bloco em leitura e, por item,
+        # apenas um <det> vazio
+        assert len(itens) == 200 * data.count(b'<det ')
+        assert pico < 2 * len(grande)
+    
+    def test_parse_retorna_itemnfe(self):
+        """Testa se os itens extraídos são ItemNFe com os totais calculados."""
+        xml_path = os.path.join(
+            os.path.dirname(__file__), '..', 'input_xmls', 'nota_teste.xml'
+        )
+        itens = self.parser.parse(xml_path)
+        assert all(isinstance(item, ItemNFe) for item in itens)
+        item = itens[0]
+        assert item.chave_acesso != ''
+        assert item.imposto_total == item.pis_pago + item.cofins_pago
+        assert not hasattr(item, '__dict__')  # slots=True
+    
+    def test_campos_repetidos_internados(self):
+        """Testa que NCM e número do item repetidos entre notas são a mesma string."""
+        xml_path = os.path.join(
+            os.path.dirname(__file__), '..', 'input_xmls', 'nota_teste.xml'
+        )
+        primeira = self.parser.parse(xml_path)[0]
+        segunda = self.parser.parse(xml_path)[0]
+        assert primeira.ncm is segunda.ncm
+        assert primeira.numero_item is segunda.numero_item
+        assert primeira.nome_emitente is segunda.nome_emitente
+    
+    def test_parse_xml_bytes_em_processo(self):
+        """Testa parse_xml_bytes rodando em um pool de processos."""
+        from concurrent.futures import ProcessPoolExecutor
+        xml_path = os.path.join(
+            os.path.dirname(__file__), '..', 'input_xmls', 'nota_teste.xml'
+        )
+        with open(xml_path, 'rb') as f:
+            data = f.read()
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            itens = executor.submit(parse_xml_bytes, data).result()
+        assert itens == self.parser.parse(xml_path)
+    
+    def test_parse_xml_files_igual_sequencial(self, monkeypatch):
+        """Testa que o lote em processos devolve o mesmo que parse(), na ordem."""
+        from src.core import parser as parser_module
+        from src.core.parser import parse_xml_files
+        xml_path = os.path.join(
+            os.path.dirname(__file__), '..', 'input_xmls', 'nota_teste.xml'
+        )
+        caminhos = [xml_path, 'inexistente.xml'] * 3
+        esperado = [self.parser.parse(caminho) for caminho in caminhos]
+        # Força o pool (o padrão só o usa a partir de dezenas de arquivos)
+        monkeypatch.setattr(parser_module, 'MIN_ARQUIVOS_PROCESSOS', 2)
+        assert parse_xml_files(caminhos, max_workers=2) == esperado
+    
+    def test_iter_xml_bytes_na_ordem(self):
+        """Testa que iter_xml_bytes devolve os itens de cada conteúdo, na ordem."""
+        from src.core.parser import iter_xml_bytes
+        xml_path = os.path.join(
+            os.path.dirname(__file__), '..', 'input_xmls', 'nota_teste.xml'
+        )
+        with open(xml_path, 'rb') as f:
+            data = f.read()
+        resultados = list(iter_xml_bytes([data, b'<nao-fecha>', data], ['a', 'b', 'c']))
+        assert resultados == [self.parser.parse_bytes(data), [], self.parser.parse_bytes(data)]
+    
+    def test_dados_nota_na_ordem_de_itemnfe(self):
+        """Testa que DadosNota tem os mesmos campos iniciais de ItemNFe."""
+        import dataclasses
+        campos_item = [campo.name for campo in dataclasses.fields(ItemNFe)]
+        assert campos_item[:len(DadosNota._fields)] == list(DadosNota._fields)
+    
+    def test_parse_xml_file_com_cache(self, tmp_path):
+        """Testa que o cache de parsing devolve os mesmos itens e é podado."""
+        from src.core.parser import parse_xml_file, _podar_cache_parser
+        xml_path = os.path.join(
+            os.path.dirname(__file__), '..', 'input_xmls', 'nota_teste.xml'
+        )
+        cache_dir = str(tmp_path / 'cache')
+        itens = parse_xml_file(xml_path, cache_dir=cache_dir)
+        assert len(os.listdir(cache_dir)) == 1
+        assert parse_xml_file(xml_path, cache_dir=cache_dir) == itens
+        assert itens == self.parser.parse(xml_path)
+        
+        _podar_cache_parser(cache_dir, max_bytes=0)
+        assert os.listdir(cache_dir) == []
+    
+    def test_format_cnpj(self):
+        """Testa a formatação do CNPJ (só 14 dígitos ASCII)."""
+        assert self.parser._format_cnpj("12345678000199") == "12.345.678/0001-99"
+        assert self.parser._format_cnpj("1234567800019") == "1234567800019"
+        assert self.parser._format_cnpj("1234567800019²") == "1234567800019²"
+    
+    def test_parse_bytes_invalido(self):
+        """Testa que conteúdo inválido retorna lista vazia."""
+        assert self.parser.parse_bytes(b'<nao-fecha>') == []
+    
+    def test_parse_bytes_recusa_dtd(self):
+        """Testa que XML com DOCTYPE (entidades declaradas) é recusado."""
+        xml = (
+            b'<?xml version="1.0"?>\n<!-- nota -->\n'
+            b'<!DOCTYPE NFe [<!ENTITY x "CERVEJA">]>'
+            b'<NFe xmlns="http://www.portalfiscal.inf.br/nfe"><det><prod>'
+            b'<xProd>&x;</xProd></prod></det></NFe>'
+        )
+        assert self.parser.parse_bytes(xml) == []
 
 
 class TestNCMDatabase:
     """Testes para o banco de dados de NCMs."""
     
-    def setup_method(self):
-        """Inicializa o banco antes de cada teste."""
-        db_path = os.path.join(
-            os.path.dirname(__file__), 
-            '..', 'src', 'database', 'ncm_rules.json'
-        )
-        self.db = NCMDatabase(db_path)
+    @pytest.fixture(autouse=True)
+    def _usar_banco(self, ncm_db):
+        """Usa o banco compartilhado do módulo em cada teste."""
+        self.db = ncm_db
     
     def test_database_loads(self):
         """Testa se o banco de dados carrega."""
         assert self.db is not None
         assert len(self.db.ncm_lista) > 0
     
+    def test_get_ncm_database_compartilhado(self):
+        """Testa que o mesmo arquivo (caminho relativo ou absoluto) dá a mesma instância."""
+        assert get_ncm_database(os.path.abspath(DB_PATH)) is self.db
+        assert get_ncm_database(os.path.relpath(DB_PATH)) is self.db
+    
     def test_cerveja_is_monofasico(self):
         """Testa se cerveja (22030000) é identificada como monofásica."""
         assert self.db.is_monofasico("22030000") == True
@@ -74,6 +245,13 @@ class TestNCMDatabase:
         """Testa se NCM genérico não é monofásico."""
         assert self.db.is_monofasico("99999999") == False
     
+    def test_is_monofasico_por_prefixo(self):
+        """Testa a busca pelos 4 primeiros dígitos e o NCM com pontos."""
+        assert self.db.is_monofasico("2203.00.00") == True
+        assert self.db.is_monofasico("2203") == True
+        assert self.db.is_monofasico("22039999") == True
+        assert self.db.is_monofasico("9999") == False
+    
     def test_identificar_heineken_por_nome(self):
         """Testa identificação de Heineken pelo nome."""
         resultado = self.db.identificar_por_nome("HEINEKEN LONG NECK 355ML")
@@ -91,6 +269,30 @@ class TestNCMDatabase:
         """Testa que comida não é identificada como monofásico."""
         resultado = self.db.identificar_por_nome("ARROZ TIPO 1 5KG")
         assert resultado is None
+
+    def test_identificar_por_nome_memorizado(self):
+        """Testa que o nome repetido reaproveita a keyword já encontrada."""
+        primeiro = self.db.identificar_por_nome("HEINEKEN LONG NECK 355ML")
+        assert "HEINEKEN LONG NECK 355ML" in self.db._identificacoes
+        assert self.db.identificar_por_nome("HEINEKEN LONG NECK 355ML") == primeiro
+        # Nome sem keyword também fica memorizado (como None)
+        assert self.db.identificar_por_nome("ARROZ TIPO 1 5KG") is None
+        assert self.db._identificacoes["ARROZ TIPO 1 5KG"] is None
+
+    def test_keyword_palavra_completa(self, tmp_path):
+        """Testa que keywords curtas (CHA) só batem como palavra completa."""
+        import json
+        with open(self.db.json_path, encoding='utf-8') as f:
+            dados = json.load(f)
+        dados['_keywords_produtos']['cha_pronto'].append('CHA')
+        db_path = tmp_path / 'ncm_rules.json'
+        db_path.write_text(json.dumps(dados), encoding='utf-8')
+        db = NCMDatabase(str(db_path))
+        
+        assert db.identificar_por_nome("CHA GELADO LIMAO 1L")['keyword_encontrada'] == "CHA"
+        assert db.identificar_por_nome("ESPUMANTE CHANDON BRUT") is None
+        # Keyword de categoria anterior tem prioridade sobre a posição no nome
+        assert db.identificar_por_nome("CHA DE CERVEJA")['categoria'] == "cerveja"
     
     def test_verificar_item_ncm_errado(self):
         """Testa verificação de item com NCM errado."""
@@ -104,6 +306,479 @@ class TestNCMDatabase:
         resultado = self.db.verificar_item("22030000", "CERVEJA QUALQUER")
         assert resultado['is_monofasico'] == True
         assert resultado['ncm_atual_correto'] == True
+    
+    def test_buscar_cache_ia_flexivel(self, tmp_path):
+        """Testa a busca parcial e reversa no cache, antes e depois de indexar."""
+        import shutil
+        db_path = tmp_path / 'ncm_rules.json'
+        shutil.copy(self.db.json_path, db_path)
+        db = NCMDatabase(str(db_path))
+        assert db.buscar_cache_ia("VH BCO POR CASAL GARCIA 750ML") is None
+        db.salvar_aprendizado_ia("CASAL GARCIA", False, "22042100", "Wine")
+        
+        # Recém-aprendido (ainda fora do índice)
+        assert db.buscar_cache_ia("VH BCO POR CASAL GARCIA 750ML")['ncm_sugerido'] == "22042100"
+        
+        db._indexar_cache_ia()
+        assert db.buscar_cache_ia("VH BCO POR CASAL GARCIA 750ML")['fonte'] == "cache_ia"
+        assert db.buscar_cache_ia("GARCIA")['ncm_sugerido'] == "22042100"
+        assert db.buscar_cache_ia("ARROZ TIPO 1 5KG") is None
+
+    
+    def test_verificar_itens_igual_verificar_item(self):
+        """Testa que a verificação em lote devolve o mesmo que item a item."""
+        itens = [
+            ("99999999", "CERVEJA HEINEKEN 600ML"),
+            ("22030000", "CERVEJA QUALQUER"),
+            ("99999999", "ARROZ TIPO 1 5KG"),
+            ("99999999", "CERVEJA HEINEKEN 600ML"),
+        ]
+        resultados = self.db.verificar_itens(itens)
+        assert resultados == [self.db.verificar_item(ncm, nome) for ncm, nome in itens]
+        assert resultados[0] is not resultados[3]
+    
+    def test_verificar_item_memoria_limpa_ao_aprender(self, tmp_path):
+        """Testa que o resultado memorizado é refeito após novo aprendizado."""
+        import shutil
+        db_path = tmp_path / 'ncm_rules.json'
+        shutil.copy(self.db.json_path, db_path)
+        db = NCMDatabase(str(db_path))
+        
+        primeiro = db.verificar_item("99999999", "VINHO TINTO SECO")
+        assert primeiro['fonte'] == ""
+        primeiro['fonte'] = "alterado"  # Não pode afetar a memória
+        assert db.verificar_item("99999999", "vinho tinto seco")['fonte'] == ""
+        
+        db.salvar_aprendizado_ia("VINHO TINTO SECO", False, "22042100", "Wine")
+        assert db.verificar_item("99999999", "VINHO TINTO SECO")['fonte'] == "cache_ia"
+    
+    def test_aprendizado_anexado_e_consolidado(self, tmp_path):
+        """Testa que o aprendizado vai para o .learn.jsonl e depois para o JSON."""
+        import json
+        import shutil
+        db_path = tmp_path / 'ncm_rules.json'
+        shutil.copy(self.db.json_path, db_path)
+        original = db_path.read_text(encoding='utf-8')
+        
+        db = NCMDatabase(str(db_path))
+        db.salvar_aprendizado_ia("VINHO TINTO SECO", False, "22042100", "Wine")
+        assert db_path.read_text(encoding='utf-8') == original
+        
+        # Nova instância reaplica o aprendizado ainda não consolidado
+        assert NCMDatabase(str(db_path)).buscar_cache_ia("VINHO TINTO SECO") is not None
+        
+        assert db.consolidar_aprendizado()
+        assert not os.path.exists(db.aprendizado_path)
+        dados = json.loads(db_path.read_text(encoding='utf-8'))
+        assert "VINHO TINTO SECO" in dados['_aprendizado_ia']['produtos']
+    
+    def test_aprendizado_durante_indexacao_nao_se_perde(self, tmp_path, monkeypatch):
+        """Testa que um produto aprendido enquanto o índice é remontado continua na busca flexível."""
+        import shutil
+        import threading
+        import time
+        from src.core import ncm_database as ncm_module
+        db_path = tmp_path / 'ncm_rules.json'
+        shutil.copy(self.db.json_path, db_path)
+        db = NCMDatabase(str(db_path), verbose=False)
+        
+        # Remontagem parada no meio (na construção do autômato)
+        liberar = threading.Event()
+        automato_original = ncm_module.AhoCorasick
+        
+        def automato_lento(padroes=()):
+            liberar.wait(5)
+            return automato_original(padroes)
+        
+        monkeypatch.setattr(ncm_module, 'AhoCorasick', automato_lento)
+        indexacao = threading.Thread(target=db._indexar_cache_ia)
+        indexacao.start()
+        aprendizado = threading.Thread(
+            target=db.salvar_aprendizado_ia,
+            args=("VINHO DURANTE INDICE", False, "22042100", "Wine")
+        )
+        aprendizado.start()
+        time.sleep(0.05)
+        liberar.set()
+        indexacao.join()
+        aprendizado.join()
+        
+        assert db.buscar_cache_ia("CX VINHO DURANTE INDICE 750ML") is not None
+
+    def test_ausencia_de_busca_anterior_ao_aprendizado_nao_vale(self, tmp_path):
+        """Testa que uma busca sem resultado, em andamento durante um aprendizado, não o esconde."""
+        import shutil
+        import threading
+        db_path = tmp_path / 'ncm_rules.json'
+        shutil.copy(self.db.json_path, db_path)
+        db = NCMDatabase(str(db_path), verbose=False)
+        aprendizado = threading.Thread(
+            target=db.salvar_aprendizado_ia,
+            args=("VINHO NOVO", False, "22042100", "Wine")
+        )
+        
+        class AusentesComAprendizado(set):
+            """Outra sessão salva o produto logo antes desta busca memorizar a ausência."""
+            def __len__(self):
+                if aprendizado.ident is None:  # Só na primeira vez
+                    aprendizado.start()
+                    aprendizado.join(0.2)
+                return set.__len__(self)
+        
+        db._cache_ia_ausentes = AusentesComAprendizado()
+        assert db.buscar_cache_ia("CX VINHO NOVO 750ML") is None
+        aprendizado.join()
+        
+        assert db.buscar_cache_ia("CX VINHO NOVO 750ML") is not None
+    
+    def test_aprendizado_pendente_malformado_ignorado(self, tmp_path):
+        """Testa que linhas JSON válidas sem o formato esperado são puladas."""
+        import json
+        import shutil
+        db_path = tmp_path / 'ncm_rules.json'
+        shutil.copy(self.db.json_path, db_path)
+        valido = {"nome": "VINHO TINTO SECO", "is_monofasico": False,
+                  "ncm_sugerido": "22042100", "motivo": "Wine",
+                  "data_aprendizado": "2025-01-01 00:00:00"}
+        linhas = ['[1, 2]', '"texto"', '42', 'null', '{"sem_nome": 1}',
+                  '{"nome": 7}', json.dumps(valido), '{"nome": "INCOMPL']
+        with open(str(db_path) + '.learn.jsonl', 'w', encoding='utf-8') as f:
+            f.write("\n".join(linhas))
+        
+        db = NCMDatabase(str(db_path), verbose=False)
+        assert db._aprendizados_pendentes == 1
+        assert db.buscar_cache_ia("VINHO TINTO SECO") is not None
+    
+    def test_instancia_liberada_sem_referencias(self, tmp_path):
+        """Testa que a consolidação ao sair não mantém a instância viva."""
+        import gc
+        import shutil
+        import weakref
+        db_path = tmp_path / 'ncm_rules.json'
+        shutil.copy(self.db.json_path, db_path)
+        
+        db = NCMDatabase(str(db_path), verbose=False)
+        referencia = weakref.ref(db)
+        del db
+        gc.collect()
+        assert referencia() is None
+        
+    def test_salvar_aprendizados_em_lote(self, tmp_path):
+        """Testa que o lote inteiro vai para o cache e para o .learn.jsonl."""
+        import shutil
+        db_path = tmp_path / 'ncm_rules.json'
+        shutil.copy(self.db.json_path, db_path)
+        
+        db = NCMDatabase(str(db_path), verbose=False)
+        assert db.salvar_aprendizados_ia([
+            ("VINHO TINTO SECO", False, "22042100", "Wine"),
+            ("cerveja artesanal ipa ", True, "22030000", "Beer"),
+        ])
+        with open(db.aprendizado_path, encoding='utf-8') as arquivo:
+            assert len(arquivo.readlines()) == 2
+        
+        recarregado = NCMDatabase(str(db_path), verbose=False)
+        assert recarregado.buscar_cache_ia("VINHO TINTO SECO")['is_monofasico'] is False
+        assert recarregado.buscar_cache_ia("CERVEJA ARTESANAL IPA")['is_monofasico'] is True
+    
+    def test_verbose_false_nao_imprime_andamento(self, tmp_path, capsys):
+        """Testa que verbose=False cala a carga e o aprendizado."""
+        import shutil
+        db_path = tmp_path / 'ncm_rules.json'
+        shutil.copy(self.db.json_path, db_path)
+        capsys.readouterr()
+        
+        db = NCMDatabase(str(db_path), verbose=False)
+        assert db.salvar_aprendizado_ia("VINHO TINTO SECO", False, "22042100", "Wine")
+        assert capsys.readouterr().out == ""
+
+class TestAhoCorasick:
+    """Testes para o autômato de busca de várias palavras."""
+    
+    def test_encontra_todas_as_ocorrencias(self):
+        """Testa ocorrências sobrepostas e padrões dentro de outros."""
+        from src.core.aho_corasick import AhoCorasick
+        automato = AhoCorasick([("CHA", 1), ("CHANDON", 2), ("AND", 3)])
+        ocorrencias = sorted(automato.buscar("CHANDON CHA"))
+        assert ocorrencias == [(0, 3, 1), (0, 7, 2), (2, 5, 3), (8, 11, 1)]
+    
+    def test_padrao_adicionado_depois_da_busca(self):
+        """Testa que o autômato é remontado após novos padrões."""
+        from src.core.aho_corasick import AhoCorasick
+        automato = AhoCorasick([("COCA", 1)])
+        assert list(automato.buscar("COCA COLA")) == [(0, 4, 1)]
+        automato.adicionar("COLA", 2)
+        assert list(automato.buscar("COCA COLA")) == [(0, 4, 1), (5, 9, 2)]
+    
+    def test_buscas_simultaneas_montam_uma_vez(self):
+        """Testa que threads buscando no autômato novo o montam uma única vez."""
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        from src.core.aho_corasick import AhoCorasick
+        padroes = [(f"PRODUTO {i:04d}", i) for i in range(2000)]
+        automato = AhoCorasick(padroes)
+        montagens = []
+        calcular = automato._calcular_links
+        
+        def calcular_contando():
+            montagens.append(1)
+            return calcular()
+        
+        automato._calcular_links = calcular_contando
+        largada = threading.Barrier(8)
+        
+        def buscar(_):
+            largada.wait()
+            return list(automato.buscar("CX PRODUTO 0042 E PRODUTO 1999"))
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            resultados = list(executor.map(buscar, range(8)))
+        
+        assert montagens == [1]
+        assert all(resultado == [(3, 15, 42), (18, 30, 1999)] for resultado in resultados)
+    
+    def test_busca_a_partir_de_posicao(self):
+        """Testa que a busca a partir de uma posição mantém as posições absolutas."""
+        from src.core.aho_corasick import AhoCorasick
+        automato = AhoCorasick([("COCA", 1), ("COLA", 2)])
+        assert list(automato.buscar("COCA COLA", 2)) == [(5, 9, 2)]
+
+
+class TestReportGenerator:
+    """Testes para o gerador de relatórios."""
+    
+    def test_erro_recuperavel_igual_dicionario(self, tmp_path):
+        """Testa que registro e dicionário geram a mesma linha no relatório."""
+        import dataclasses
+        from src.utils.exporter import ErroRecuperavel, ReportGenerator
+        erro = ErroRecuperavel(produto="HEINEKEN 355ML", ncm="22030000", imposto_recuperavel=0.85)
+        exporter = ReportGenerator(output_folder=str(tmp_path))
+        linhas = list(exporter._linhas([erro, dataclasses.asdict(erro)]))
+        assert list(linhas[0]) == list(linhas[1])
+
+
+
+class ErroHTTPFalso(Exception):
+    """Erro da API com status HTTP e cabeçalhos, como os do cliente da OpenAI."""
+    
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Resposta", (), {"status_code": status_code, "headers": headers or {}})()
+
+
+class TestFiscalAuditor:
+    """Testes do agente de IA sem chamar a API (CrewAI substituído nos testes)."""
+    
+    def _auditor(self):
+        """Cria o agente sem __init__ (que exige OPENAI_API_KEY e o CrewAI)."""
+        import queue
+        import threading
+        from src.agents.auditor import FiscalAuditorAgent
+        auditor = FiscalAuditorAgent.__new__(FiscalAuditorAgent)
+        auditor._batch_size = 20
+        auditor._max_lotes_simultaneos = 4
+        auditor._agentes_livres = queue.SimpleQueue()
+        auditor._agentes_livres.put(object())
+        auditor._vereditos = {}
+        auditor._vereditos_lock = threading.Lock()
+        return auditor
+    
+    def _executar_com_respostas(self, monkeypatch, respostas):
+        """
+        Roda _run_task com crew.kickoff() devolvendo (ou levantando) respostas.
+        
+        Returns:
+            tuple: (resultado ou exceção levantada, nº de chamadas, esperas)
+        """
+        import types
+        from src.agents import auditor as auditor_module
+        respostas = iter(respostas)
+        chamadas = []
+        esperas = []
+        
+        class CrewFalso:
+            def __init__(self, **kwargs):
+                pass
+            
+            def kickoff(self):
+                chamadas.append(1)
+                resposta = next(respostas)
+                if isinstance(resposta, Exception):
+                    raise resposta
+                return resposta
+        
+        crewai_falso = types.ModuleType("crewai")
+        crewai_falso.Task = lambda **kwargs: kwargs
+        crewai_falso.Crew = CrewFalso
+        monkeypatch.setitem(sys.modules, "crewai", crewai_falso)
+        monkeypatch.setattr(auditor_module.time, "sleep", esperas.append)
+        
+        try:
+            resultado = self._auditor()._run_task("prompt", "saida")
+        except Exception as e:
+            resultado = e
+        return resultado, len(chamadas), esperas
+    
+    def test_erro_transitorio(self):
+        """Testa quais erros valem nova tentativa."""
+        from src.agents.auditor import _erro_transitorio
+        assert _erro_transitorio(ErroHTTPFalso(429))
+        assert _erro_transitorio(ErroHTTPFalso(503))
+        assert _erro_transitorio(TimeoutError())
+        assert not _erro_transitorio(ErroHTTPFalso(400))
+        assert not _erro_transitorio(ValueError("resposta inválida"))
+    
+    def test_repete_apos_429(self, monkeypatch):
+        """Testa que um 429 seguido de sucesso devolve a resposta."""
+        resultado, chamadas, esperas = self._executar_com_respostas(
+            monkeypatch, [ErroHTTPFalso(429), "resposta"]
+        )
+        assert resultado == "resposta"
+        assert chamadas == 2
+        assert len(esperas) == 1
+    
+    def test_nao_repete_erro_400(self, monkeypatch):
+        """Testa que erros que não são passageiros sobem na primeira falha."""
+        erro = ErroHTTPFalso(400)
+        resultado, chamadas, esperas = self._executar_com_respostas(monkeypatch, [erro, "resposta"])
+        assert resultado is erro
+        assert chamadas == 1
+        assert esperas == []
+    
+    def test_respeita_retry_after(self, monkeypatch):
+        """Testa que o Retry-After da API é o mínimo de espera."""
+        resultado, _, esperas = self._executar_com_respostas(
+            monkeypatch, [ErroHTTPFalso(429, {"retry-after": "7"}), "resposta"]
+        )
+        assert resultado == "resposta"
+        assert esperas == [7.0]
+    
+    def test_ultima_falha_sobe(self, monkeypatch):
+        """Testa que, esgotadas as tentativas, a última exceção chega a quem chamou."""
+        from src.agents.auditor import MAX_TENTATIVAS_API
+        erros = [ErroHTTPFalso(503) for _ in range(MAX_TENTATIVAS_API)]
+        resultado, chamadas, esperas = self._executar_com_respostas(monkeypatch, erros)
+        assert resultado is erros[-1]
+        assert chamadas == MAX_TENTATIVAS_API
+        assert len(esperas) == MAX_TENTATIVAS_API - 1
+    
+    def _analisar_lote(self, responde_lote):
+        """
+        Roda _analyze_lote com _run_task e analyze_item substituídos.
+        
+        Args:
+            responde_lote: Função (lote) -> bool; True se a IA responde
+                           aquele lote no formato certo.
+        
+        Returns:
+            tuple: (resultados, tamanhos dos lotes enviados, itens
+                    analisados um a um)
+        """
+        import json
+        auditor = self._auditor()
+        lotes_enviados = []
+        itens_individuais = []
+        
+        def run_task(lote, expected_output):
+            lotes_enviados.append(len(lote))
+            if responde_lote(lote):
+                return json.dumps([[False, ncm, f"lote {descricao}"] for descricao, ncm, _ in lote])
+            return '[[false, "99999999", "cortado'  # Resposta cortada
+        
+        def analyze_item(descricao, ncm, valor):
+            itens_individuais.append(descricao)
+            return [False, ncm, f"item {descricao}"]
+        
+        auditor._build_batch_prompt = lambda lote: lote
+        auditor._run_task = run_task
+        auditor.analyze_item = analyze_item
+        
+        lote = [(f"PRODUTO {i}", "99999999", 1.0) for i in range(5)]
+        return auditor._analyze_lote(lote), lotes_enviados, itens_individuais
+    
+    def test_lote_invalido_reenviado_em_metades(self):
+        """Testa que um lote em formato inválido é reenviado em duas metades."""
+        resultados, lotes_enviados, itens_individuais = self._analisar_lote(
+            lambda lote: len(lote) < 5
+        )
+        assert lotes_enviados == [5, 2, 3]
+        assert itens_individuais == []
+        assert [motivo for _, _, motivo in resultados] == [f"lote PRODUTO {i}" for i in range(5)]
+    
+    def test_metade_invalida_analisada_item_a_item(self):
+        """Testa que as metades também inválidas vão item a item, na ordem."""
+        resultados, lotes_enviados, itens_individuais = self._analisar_lote(lambda lote: False)
+        assert lotes_enviados == [5, 2, 3]
+        assert sorted(itens_individuais) == [f"PRODUTO {i}" for i in range(5)]
+        assert [motivo for _, _, motivo in resultados] == [f"item PRODUTO {i}" for i in range(5)]
+    
+    def test_resposta_ilegivel_nao_vira_veredito(self):
+        """Testa que um erro de parse não fica memorizado para o produto."""
+        from src.agents.auditor import resultado_com_erro
+        auditor = self._auditor()
+        respostas = iter(['[true, resposta cortada]', '[false, "07019000", "Not monophasic"]'])
+        chamadas = []
+        
+        def run_task(prompt, expected_output):
+            chamadas.append(prompt)
+            return next(respostas)
+        
+        auditor._run_task = run_task
+        
+        primeiro = auditor.analyze_item("BATATA TESTE KG", "07019000", 1.0)
+        segundo = auditor.analyze_item("BATATA TESTE KG", "07019000", 1.0)
+        assert resultado_com_erro(primeiro)
+        assert segundo == [False, "07019000", "Not monophasic"]
+        assert len(chamadas) == 2
+
+
+class TestPipeline:
+    """Testes do fluxo de análise da CLI (src/main.py)."""
+    
+    def test_falha_da_ia_nao_vira_aprendizado(self, tmp_path):
+        """Testa que resultados de erro da IA não entram no cache de aprendizado."""
+        import shutil
+        from collections import Counter
+        from src.main import analyze_pending_ia
+        db_path = tmp_path / 'ncm_rules.json'
+        shutil.copy(DB_PATH, db_path)
+        db = NCMDatabase(str(db_path), verbose=False)
+        
+        class AuditorFalso:
+            def analyze_batch(self, itens, **kwargs):
+                return [
+                    [False, "99999999", "Erro na API: Timeout"],
+                    [False, "07019000", "Not monophasic"],
+                ]
+        
+        pendentes = [
+            ItemNFe(produto="PRODUTO COM FALHA", ncm="99999999", imposto_total=1.0),
+            ItemNFe(produto="BATATA TESTE KG", ncm="07019000", imposto_total=1.0),
+        ]
+        stats = Counter(banco_dados=0, keywords=0, ia=0, ia_economizada=0)
+        analyze_pending_ia(pendentes, db, AuditorFalso(), stats, log=[])
+        
+        assert db.buscar_cache_ia("PRODUTO COM FALHA") is None
+        assert db.buscar_cache_ia("BATATA TESTE KG") is not None
+    
+    def test_consulta_em_lote_respeita_quiet(self, capsys):
+        """Testa que o aviso da consulta em lote vai para o log (calado por --quiet)."""
+        from collections import Counter
+        from src.main import analyze_pending_ia, _descarregar_log
+        
+        class AuditorFalso:
+            def analyze_batch(self, itens, **kwargs):
+                return [[False, "99999999", "Erro na API: Timeout"] for _ in itens]
+        
+        pendentes = [ItemNFe(produto="PRODUTO SEM REGRA", ncm="99999999", imposto_total=1.0)]
+        stats = Counter(banco_dados=0, keywords=0, ia=0, ia_economizada=0)
+        log = []
+        capsys.readouterr()
+        analyze_pending_ia(pendentes, get_ncm_database(DB_PATH), AuditorFalso(), stats, log=log)
+        _descarregar_log(log, quiet=True)
+        
+        assert capsys.readouterr().out == ""
 
 
 # =============================================================================